@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Async (ASGI) serving mode for the Language Agnostic Translator web app
+Exposes the same pages and API routes as web_app.py, but translations await the
+upstream requests on the event loop instead of holding a worker thread, so one
+process can keep thousands of translations in flight.
+
+Run with:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from urllib.parse import parse_qsl
+
+from flask import render_template
+
+import http_pool
+import metrics
+import profiler
+from config import (
+    SUPPORTED_LANGUAGES, COMMANDS, BATCH_MAX_ITEMS, DETECTION_BATCH_MAX_ITEMS, WEBHOOK_PATH,
+    ADMIN_TOKEN, PROFILE_SECONDS
+)
+from translator import get_translator_async, warm_up_in_background
+from web_app import app as flask_app, telegram_webhook
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPError(Exception):
+    """Raised by handlers to answer with a JSON error"""
+
+    def __init__(self, status, error):
+        super().__init__(error)
+        self.status = status
+        self.error = error
+
+
+async def read_json(receive):
+    """Read the whole request body and decode it as a JSON object"""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    try:
+        data = json.loads(body or b'null')
+    except ValueError:
+        raise HTTPError(400, 'Request body must be JSON')
+    if not isinstance(data, dict):
+        raise HTTPError(400, 'Request body must be a JSON object')
+    return data
+
+
+async def send_response(send, status, body, content_type):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type.encode()),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*')
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, payload, status=200):
+    await send_response(send, status, json.dumps(payload).encode(), 'application/json')
+
+
+def render_page(path, template, **context):
+    """Render one of the Flask app's templates outside a Flask request"""
+    with flask_app.test_request_context(path):
+        return render_template(template, **context).encode()
+
+
+def translation_payload(result):
+    """JSON body for a successful TranslationResult, matching /api/translate in web_app.py"""
+    return {
+        'success': True,
+        'translated_text': result.translated_text,
+        'source_language': result.source_lang,
+        'source_name': result.source_name,
+        'target_language': result.target_lang,
+        'target_name': result.target_name,
+        'confidence': result.confidence,
+        'backend': result.backend,
+        'cached': result.cached,
+        'message': result.message
+    }
+
+
+async def api_translate(scope, receive, send):
+    """API endpoint for translation"""
+    data = await read_json(receive)
+    text = str(data.get('text') or '').strip()
+    if not text:
+        raise HTTPError(400, 'Text is required')
+
+    translator = await get_translator_async()
+    result = await translator.translate_text_async(text, data.get('target_lang', 'en'), data.get('source_lang'))
+    if result.success:
+        await send_json(send, translation_payload(result))
+    else:
+        await send_json(send, {'success': False, 'error': result.message}, 400)
+
+
+async def api_translate_stream(scope, receive, send):
+    """API endpoint streaming translated segments as newline-delimited JSON"""
+    data = await read_json(receive)
+    text = str(data.get('text') or '').strip()
+    if not text:
+        raise HTTPError(400, 'Text is required')
+
+    # Anything that can fail with an error response happens before the response starts
+    translator = await get_translator_async()
+    events = translator.translate_stream_async(text, data.get('target_lang', 'en'), data.get('source_lang'))
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'application/x-ndjson'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            (b'access-control-allow-origin', b'*')
+        ]
+    })
+    # From here on a failure is reported as an error event, never a second response start
+    try:
+        async for event in events:
+            await send({'type': 'http.response.body', 'body': (json.dumps(event) + '\n').encode(), 'more_body': True})
+    except Exception as e:
+        logger.error(f"Error streaming translation: {e}")
+        error = {'type': 'error', 'error': f'Request failed: {str(e)}'}
+        await send({'type': 'http.response.body', 'body': (json.dumps(error) + '\n').encode(), 'more_body': True})
+    finally:
+        await events.aclose()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def api_translate_batch(scope, receive, send):
+    """API endpoint for translating many texts in one request"""
+    data = await read_json(receive)
+    items = data.get('texts')
+    target_lang = data.get('target_lang', 'en')
+    default_source = data.get('source_lang')
+
+    if not isinstance(items, list) or not items:
+        raise HTTPError(400, 'texts must be a non-empty list')
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPError(400, f'At most {BATCH_MAX_ITEMS} texts are allowed per batch')
+
+    # Items are plain strings or {"text": ..., "source_lang": ...} objects
+    texts = []
+    source_langs = []
+    for item in items:
+        if isinstance(item, dict):
+            texts.append(str(item.get('text') or '').strip())
+            source_langs.append(item.get('source_lang') or default_source)
+        else:
+            texts.append(str(item or '').strip())
+            source_langs.append(default_source)
+
+    translator = await get_translator_async()
+    translated = await translator.translate_batch_async(texts, target_lang, source_langs)
+
+    results = []
+    for index, result in enumerate(translated):
+        if result.success:
+            payload = translation_payload(result)
+            del payload['confidence'], payload['backend']
+            results.append({'index': index, **payload})
+        else:
+            results.append({'index': index, 'success': False, 'error': result.message})
+
+    await send_json(send, {'success': True, 'count': len(results), 'results': results})
+
+
+async def api_detect(scope, receive, send):
+    """API endpoint for language detection"""
+    data = await read_json(receive)
+    text = str(data.get('text') or '').strip()
+    if not text:
+        raise HTTPError(400, 'Text is required')
+
+    translator = await get_translator_async()
+    lang_code, lang_name = await translator.detect_language_async(text)
+    if lang_code:
+        await send_json(send, {'success': True, 'language_code': lang_code, 'language_name': lang_name, 'text': text})
+    else:
+        await send_json(send, {'success': False, 'error': lang_name}, 400)
+
+
+async def api_detect_batch(scope, receive, send):
+    """API endpoint for detecting the language of many texts in one request"""
+    data = await read_json(receive)
+    texts = data.get('texts')
+    if not isinstance(texts, list) or not texts:
+        raise HTTPError(400, 'texts must be a non-empty list')
+    if len(texts) > DETECTION_BATCH_MAX_ITEMS:
+        raise HTTPError(400, f'At most {DETECTION_BATCH_MAX_ITEMS} texts are allowed per batch')
+
+    loop = asyncio.get_running_loop()
+    translator = await get_translator_async()
+    start = time.perf_counter()
+    detections = await loop.run_in_executor(
+        translator.executor, translator.detect_batch, [str(text or '') for text in texts]
+    )
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for index, (lang_code, lang_name, confidence) in enumerate(detections):
+        if lang_code:
+            results.append({
+                'index': index,
+                'success': True,
+                'language_code': lang_code,
+                'language_name': lang_name,
+                'confidence': confidence
+            })
+        else:
+            results.append({'index': index, 'success': False, 'error': lang_name})
+
+    await send_json(send, {
+        'success': True,
+        'count': len(results),
+        'results': results,
+        'elapsed_seconds': round(elapsed, 4),
+        'texts_per_second': round(len(results) / elapsed, 1) if elapsed else None
+    })
+
+
+async def api_languages(scope, receive, send):
+    """API endpoint to get supported languages"""
+    await send_json(send, {'success': True, 'languages': SUPPORTED_LANGUAGES})
+
+
+async def api_stats(scope, receive, send):
+    """API endpoint for cache, backend health and connection statistics"""
+    stats = (await get_translator_async()).get_stats()
+    if telegram_webhook is not None:
+        stats['telegram'] = telegram_webhook.stats()
+    await send_json(send, {'success': True, 'stats': stats})
+
+
+async def prometheus_metrics(scope, receive, send):
+    """Stage, backend, route and bot handler timings in the Prometheus text format"""
+    await send_response(send, 200, metrics.REGISTRY.render().encode(), metrics.CONTENT_TYPE)
+
+
+async def admin_profile(scope, receive, send):
+    """
+    Sample-profile this worker for ?seconds= and return collapsed stacks (needs ADMIN_TOKEN)
+    Blocked threads are left out unless ?idle=1
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPError(404, 'Not found')
+    headers = dict(scope['headers'])
+    if not profiler.check_admin_token(headers.get(b'authorization', b'').decode()):
+        raise HTTPError(403, 'Invalid admin token')
+    query = dict(parse_qsl(scope.get('query_string', b'').decode()))
+    try:
+        seconds = float(query.get('seconds', PROFILE_SECONDS))
+    except ValueError:
+        raise HTTPError(400, 'seconds must be a number')
+    try:
+        # Sample from a thread so the event loop keeps running (and shows up in the profile)
+        _, stacks = await asyncio.to_thread(profiler.profile, seconds, include_idle=query.get('idle') == '1')
+    except profiler.ProfilerBusy as e:
+        raise HTTPError(409, str(e))
+    await send_response(send, 200, stacks.encode(), 'text/plain; charset=utf-8')
+
+
+async def telegram_webhook_update(scope, receive, send):
+    """Endpoint Telegram delivers bot updates to in webhook mode"""
+    if telegram_webhook is None:
+        raise HTTPError(404, 'Webhook mode is not enabled')
+    headers = dict(scope['headers'])
+    if not telegram_webhook.check_secret(headers.get(b'x-telegram-bot-api-secret-token', b'').decode()):
+        raise HTTPError(403, 'Invalid secret token')
+    await telegram_webhook.afeed(await read_json(receive))
+    await send_json(send, {'success': True})
+
+
+def page(template, **context):
+    """Handler serving a rendered template"""
+    async def handler(scope, receive, send):
+        body = render_page(scope['path'], template, **context)
+        await send_response(send, 200, body, 'text/html; charset=utf-8')
+    return handler
+
+
+ROUTES = {
+    ('GET', '/'): page('index.html', languages=SUPPORTED_LANGUAGES, commands=COMMANDS),
+    ('GET', '/telegram'): page('telegram.html', languages=SUPPORTED_LANGUAGES, commands=COMMANDS),
+    ('GET', '/about'): page('about.html', languages=SUPPORTED_LANGUAGES),
+    ('POST', '/api/translate'): api_translate,
+    ('POST', '/api/translate/stream'): api_translate_stream,
+    ('POST', '/api/translate/batch'): api_translate_batch,
+    ('POST', '/api/detect'): api_detect,
+    ('POST', '/api/detect/batch'): api_detect_batch,
+    ('GET', '/api/languages'): api_languages,
+    ('GET', '/api/stats'): api_stats,
+    ('GET', '/metrics'): prometheus_metrics,
+    ('POST', '/admin/profile'): admin_profile,
+    ('POST', WEBHOOK_PATH): telegram_webhook_update
+}
+PATHS = {path for _, path in ROUTES}
+profiler.register_handlers(ROUTES.values(), 'asgi')
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            profiler.install_signal_handler()
+            # Accept connections at once; the translator is built on a thread meanwhile
+            warm_up_in_background()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if telegram_webhook is not None:
+                await asyncio.to_thread(telegram_webhook.stop)
+            await http_pool.close_async_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    method = 'GET' if scope['method'] == 'HEAD' else scope['method']
+    path = scope['path'].rstrip('/') or '/'
+    handler = ROUTES.get((method, path))
+    start = time.perf_counter()
+    status = 500
+
+    # Wrap send to note the response status for the request metrics
+    async def send(message, send=send):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        await send(message)
+
+    try:
+        if handler is None and path in PATHS:
+            raise HTTPError(405, 'Method not allowed')
+        if handler is None and path.startswith('/api/'):
+            raise HTTPError(404, 'Not found')
+        if handler is None:
+            return await send_response(send, 404, render_page(path, '404.html'), 'text/html; charset=utf-8')
+        await handler(scope, receive, send)
+    except HTTPError as e:
+        await send_json(send, {'success': False, 'error': e.error}, e.status)
+    except Exception as e:
+        logger.error(f"Error handling {method} {path}: {e}")
+        await send_json(send, {'success': False, 'error': f'Request failed: {str(e)}'}, 500)
+    finally:
+        route = path if path in PATHS else 'unmatched'
+        metrics.HTTP_SECONDS.labels(route, metrics.method_label(method), str(status)).observe(
+            time.perf_counter() - start
+        )
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 5000))
+    print(f"🌍 Starting Language Agnostic Web App (async) on port {port}")
+    print(f"🔗 Open http://localhost:{port} in your browser")
+    uvicorn.run(app, host='0.0.0.0', port=port)
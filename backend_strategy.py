@@ -0,0 +1,309 @@
+"""
+Backend strategy engine for the Language Agnostic Translator
+Decides how the configured translation backends are combined for one request:
+
+- sequential: try each backend in order, the next one only after the previous failed
+- hedged: start the next backend once the current one is slower than its usual latency
+- race: start every backend at once and keep the first good answer
+
+Backends whose circuit breaker is open are skipped without being called.
+Every strategy has an async twin (atranslate) for event-loop callers, where
+losing requests are really cancelled.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import metrics
+from circuit_breaker import CircuitBreaker, OPEN
+from config import (
+    TRANSLATION_STRATEGY, HEDGE_PERCENTILE, HEDGE_DELAY, HEDGE_MIN_SAMPLES,
+    BACKEND_WORKERS, LATENCY_WINDOW
+)
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ('sequential', 'hedged', 'race')
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples (nearest-rank)"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class BackendStats:
+    """Rolling latency window and counters for one backend"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+        self.wins = 0
+
+    def record(self, latency, success):
+        with self._lock:
+            self.calls += 1
+            if success:
+                self.latencies.append(latency)
+            else:
+                self.failures += 1
+
+    def record_win(self):
+        with self._lock:
+            self.wins += 1
+
+    def latency_percentile(self, pct):
+        with self._lock:
+            samples = list(self.latencies)
+        return percentile(samples, pct)
+
+    def snapshot(self):
+        with self._lock:
+            samples = list(self.latencies)
+            calls, failures, wins = self.calls, self.failures, self.wins
+        return {
+            'calls': calls,
+            'failures': failures,
+            'wins': wins,
+            'latency_p50': percentile(samples, 50),
+            'latency_p95': percentile(samples, 95)
+        }
+
+
+class BackendStrategy:
+    """Runs a request against an ordered list of backends using one of STRATEGIES"""
+
+    def __init__(self, backends, mode=TRANSLATION_STRATEGY, hedge_percentile=HEDGE_PERCENTILE,
+                 hedge_delay=HEDGE_DELAY, executor=None):
+        if mode not in STRATEGIES:
+            raise ValueError(f"Unknown translation strategy '{mode}', expected one of {', '.join(STRATEGIES)}")
+        self.backends = list(backends)
+        self.mode = mode
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=BACKEND_WORKERS, thread_name_prefix='backend'
+        )
+        self.stats = {backend.name: BackendStats() for backend in self.backends}
+        self.breakers = {backend.name: CircuitBreaker(backend.name) for backend in self.backends}
+        self.hedges_fired = 0
+
+    def translate(self, text, source_lang, target_lang):
+        """
+        Translate text with the configured strategy
+        Returns (translated_text, backend_name), or (None, None) if no backend produced a translation
+        """
+        if self.mode == 'race':
+            return self._race(self.backends, text, source_lang, target_lang)
+        if self.mode == 'hedged':
+            return self._hedged(self.backends, text, source_lang, target_lang)
+        return self._sequential(self.backends, text, source_lang, target_lang)
+
+    def primary_backend(self):
+        """The backend a request is sent to first: the first one whose circuit is not open"""
+        for backend in self.backends:
+            if self.breakers[backend.name].state != OPEN:
+                return backend
+        return self.backends[0] if self.backends else None
+
+    def _call(self, backend, text, source_lang, target_lang):
+        """Run one backend, timing it and treating errors or echoed input as failure"""
+        start = time.perf_counter()
+        try:
+            translated_text = backend.translate(text, source_lang, target_lang)
+        except Exception as e:
+            logger.warning(f"{backend.name} backend failed: {e}")
+            translated_text = None
+        return self._record(backend, text, translated_text, time.perf_counter() - start)
+
+    async def _acall(self, backend, text, source_lang, target_lang):
+        """Async twin of _call; a cancelled call (a losing hedge) is not counted against the backend"""
+        start = time.perf_counter()
+        try:
+            translated_text = await backend.atranslate(text, source_lang, target_lang)
+        except asyncio.CancelledError:
+            self.breakers[backend.name].release_probe()
+            metrics.BACKEND_SECONDS.labels(backend.name, 'cancelled').observe(time.perf_counter() - start)
+            raise
+        except Exception as e:
+            logger.warning(f"{backend.name} backend failed: {e}")
+            translated_text = None
+        return self._record(backend, text, translated_text, time.perf_counter() - start)
+
+    def _record(self, backend, text, translated_text, latency):
+        """Feed one outcome to the backend's stats and breaker, returning the usable translation or None"""
+        # An echoed input is a poor answer but not a backend error
+        self.breakers[backend.name].record(translated_text is not None, latency)
+        success = bool(translated_text) and translated_text != text
+        self.stats[backend.name].record(latency, success)
+        outcome = 'ok' if success else 'error' if translated_text is None else 'unchanged'
+        metrics.BACKEND_SECONDS.labels(backend.name, outcome).observe(latency)
+        return translated_text if success else None
+
+    def _available(self, backend, text=''):
+        """Check the backend's request limit and ask its circuit breaker whether it may be called now"""
+        if not backend.within_limits(text):
+            return False
+        if self.breakers[backend.name].allow_request():
+            return True
+        logger.debug(f"Skipping {backend.name} backend, circuit is open")
+        return False
+
+    def _sequential(self, backends, text, source_lang, target_lang):
+        for backend in backends:
+            if not self._available(backend, text):
+                continue
+            translated_text = self._call(backend, text, source_lang, target_lang)
+            if translated_text:
+                self.stats[backend.name].record_win()
+                return translated_text, backend.name
+        return None, None
+
+    def _race(self, backends, text, source_lang, target_lang):
+        pending = {
+            self.executor.submit(self._call, backend, text, source_lang, target_lang): backend
+            for backend in backends
+            if self._available(backend, text)
+        }
+        return self._first_good(pending, timeout=None)
+
+    def _hedged(self, backends, text, source_lang, target_lang):
+        pending = {}
+        for index, backend in enumerate(backends):
+            if not self._available(backend, text):
+                continue
+            if pending:
+                # Earlier backends are still in flight, so this request is a hedge
+                self.hedges_fired += 1
+            pending[self.executor.submit(self._call, backend, text, source_lang, target_lang)] = backend
+            if index == len(backends) - 1:
+                break
+            # Give the in-flight backends until their usual latency before hedging
+            translated_text, backend_name = self._first_good(pending, timeout=self._hedge_after(backend))
+            if translated_text:
+                return translated_text, backend_name
+        return self._first_good(pending, timeout=None)
+
+    def _hedge_after(self, backend):
+        """Seconds to wait on a backend before firing the hedge request"""
+        stats = self.stats[backend.name]
+        if len(stats.latencies) < HEDGE_MIN_SAMPLES:
+            return self.hedge_delay
+        return stats.latency_percentile(self.hedge_percentile)
+
+    def _first_good(self, pending, timeout):
+        """
+        Wait up to timeout for the first successful future in pending
+        Finished futures are removed from pending; on success the others are cancelled
+        (a call that already started keeps running but its answer is discarded)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while pending:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                backend = pending.pop(future)
+                translated_text = future.result()
+                if translated_text:
+                    for loser, loser_backend in pending.items():
+                        # A call cancelled before it started never records an outcome,
+                        # so hand back the half-open probe _available took for it
+                        if loser.cancel():
+                            self.breakers[loser_backend.name].release_probe()
+                    pending.clear()
+                    self.stats[backend.name].record_win()
+                    return translated_text, backend.name
+        return None, None
+
+    async def atranslate(self, text, source_lang, target_lang):
+        """Async translate with the configured strategy, same return value as translate"""
+        if self.mode == 'race':
+            return await self._arace(self.backends, text, source_lang, target_lang)
+        if self.mode == 'hedged':
+            return await self._ahedged(self.backends, text, source_lang, target_lang)
+        return await self._asequential(self.backends, text, source_lang, target_lang)
+
+    async def _asequential(self, backends, text, source_lang, target_lang):
+        for backend in backends:
+            if not self._available(backend, text):
+                continue
+            translated_text = await self._acall(backend, text, source_lang, target_lang)
+            if translated_text:
+                self.stats[backend.name].record_win()
+                return translated_text, backend.name
+        return None, None
+
+    async def _arace(self, backends, text, source_lang, target_lang):
+        pending = {
+            asyncio.ensure_future(self._acall(backend, text, source_lang, target_lang)): backend
+            for backend in backends
+            if self._available(backend, text)
+        }
+        return await self._afirst_good(pending, timeout=None)
+
+    async def _ahedged(self, backends, text, source_lang, target_lang):
+        pending = {}
+        try:
+            for index, backend in enumerate(backends):
+                if not self._available(backend, text):
+                    continue
+                if pending:
+                    self.hedges_fired += 1
+                pending[asyncio.ensure_future(self._acall(backend, text, source_lang, target_lang))] = backend
+                if index == len(backends) - 1:
+                    break
+                translated_text, backend_name = await self._afirst_good(pending, timeout=self._hedge_after(backend))
+                if translated_text:
+                    return translated_text, backend_name
+            return await self._afirst_good(pending, timeout=None)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _afirst_good(self, pending, timeout):
+        """Async twin of _first_good; losing tasks are cancelled, which aborts their requests"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while pending:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                done, _ = await asyncio.wait(list(pending), timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    return None, None
+                for task in done:
+                    backend = pending.pop(task)
+                    translated_text = task.result()
+                    if translated_text:
+                        for loser in pending:
+                            loser.cancel()
+                        pending.clear()
+                        self.stats[backend.name].record_win()
+                        return translated_text, backend.name
+            return None, None
+        except asyncio.CancelledError:
+            for task in pending:
+                task.cancel()
+            raise
+
+    def get_stats(self):
+        """Return the strategy mode and per-backend latency, outcome and circuit health"""
+        backends = {}
+        for name, stats in self.stats.items():
+            backends[name] = stats.snapshot()
+            backends[name]['circuit'] = self.breakers[name].snapshot()
+        return {
+            'mode': self.mode,
+            'hedges_fired': self.hedges_fired,
+            'backends': backends
+        }
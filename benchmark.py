@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the translation hot path
+Runs the translator, the Flask API and the bot handlers against a local stand-in
+backend with configurable latency and errors, at several concurrency levels, and
+reports throughput and p50/p95/p99 latency. Results can be written as JSON and
+compared with an earlier run to track performance across versions.
+
+    python benchmark.py
+    python benchmark.py --scenarios translate,flask_translate --concurrency 1,16,64
+    python benchmark.py --latency 0.2 --latency-dist lognormal --error-rate 0.02 --output bench.json
+    python benchmark.py --output new.json --compare bench.json
+"""
+
+import os
+
+# Keep the benchmark away from the bots' preference database
+os.environ.setdefault('PREFERENCE_DB', '')
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from backend_strategy import BackendStrategy, percentile
+from circuit_breaker import CircuitBreaker
+from translation_backends import TranslationBackend
+from translation_cache import MemoryCache, TranslationCache
+from translation_memory import TranslationMemory
+from translator import LanguageTranslator, set_translator
+
+# Sample texts per language; a request number is appended so texts miss the cache
+SAMPLE_TEXTS = [
+    "Hello, how are you doing today? I hope everything is going well.",
+    "Hola, ¿cómo estás hoy? Espero que todo vaya bien en el trabajo.",
+    "Bonjour, comment allez-vous aujourd'hui ? J'espère que tout va bien.",
+    "Hallo, wie geht es dir heute? Ich hoffe, dass alles gut läuft.",
+    "Ciao, come stai oggi? Spero che tutto vada bene al lavoro.",
+    "Olá, como você está hoje? Espero que tudo esteja indo bem.",
+    "Привет, как у тебя дела сегодня? Надеюсь, что всё хорошо.",
+    "こんにちは、今日は元気ですか？すべてが順調であることを願っています。",
+]
+TARGET_LANGUAGES = ['en', 'es', 'fr', 'de']
+
+SCENARIOS = ['translate', 'translate_async', 'detect', 'flask_translate', 'flask_detect', 'bot_message']
+
+
+class BenchmarkError(Exception):
+    """Failure injected by the fake backend"""
+
+
+class FakeBackend(TranslationBackend):
+    """
+    Local stand-in for a translation provider
+    Each call waits for a latency drawn from the configured distribution; a share of
+    calls take tail_latency instead, and a share fail with BenchmarkError
+    """
+
+    name = 'fake'
+
+    def __init__(self, latency=0.05, distribution='fixed', error_rate=0.0, tail_rate=0.0, tail_latency=1.0,
+                 seed=None):
+        self.latency = latency
+        self.distribution = distribution
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def _draw(self):
+        """Return (delay, fail) for one call"""
+        self.calls += 1
+        fail = self.random.random() < self.error_rate
+        if self.random.random() < self.tail_rate:
+            return self.tail_latency, fail
+        if self.distribution == 'uniform':
+            delay = self.random.uniform(0, 2 * self.latency)
+        elif self.distribution == 'exponential':
+            delay = self.random.expovariate(1 / self.latency) if self.latency else 0.0
+        elif self.distribution == 'lognormal':
+            # latency is the median; sigma 0.5 gives a p99 around 3.2x the median
+            delay = self.latency * self.random.lognormvariate(0, 0.5)
+        else:
+            delay = self.latency
+        return delay, fail
+
+    def translate(self, text, source_lang, target_lang):
+        delay, fail = self._draw()
+        time.sleep(delay)
+        if fail:
+            raise BenchmarkError("injected backend failure")
+        return f"[{target_lang}] {text}"
+
+    async def atranslate(self, text, source_lang, target_lang):
+        delay, fail = self._draw()
+        await asyncio.sleep(delay)
+        if fail:
+            raise BenchmarkError("injected backend failure")
+        return f"[{target_lang}] {text}"
+
+
+class Workload:
+    """Texts and targets for numbered requests, repeating a share of them to hit the cache"""
+
+    def __init__(self, cache_hit_ratio=0.0, seed=None):
+        self.cache_hit_ratio = cache_hit_ratio
+        self.random = random.Random(seed)
+
+    def text(self, number):
+        sample = SAMPLE_TEXTS[number % len(SAMPLE_TEXTS)]
+        if self.random.random() < self.cache_hit_ratio:
+            return sample
+        return f"{sample} {number}"
+
+    def target(self, number):
+        return TARGET_LANGUAGES[number // len(SAMPLE_TEXTS) % len(TARGET_LANGUAGES)]
+
+
+def _translated(result):
+    """True if a TranslationResult holds a real translation rather than an error or the original text"""
+    if not result.success:
+        return False
+    return result.cached or result.backend is not None or result.source_lang == result.target_lang
+
+
+class _FakeMessage:
+    """Stands in for telegram.Message; replies are recorded instead of sent"""
+
+    def __init__(self, chat_id, text):
+        self.chat_id = chat_id
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+        return SimpleNamespace(text=text)
+
+
+def run_threads(operation, concurrency, requests):
+    """Call operation(number) requests times from concurrency threads; returns (latencies, errors, elapsed)"""
+    numbers = itertools.count()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        while (number := next(numbers)) < requests:
+            start = time.perf_counter()
+            try:
+                ok = operation(number)
+            except Exception:
+                ok = False
+            latency = time.perf_counter() - start
+            with lock:
+                latencies.append(latency)
+                if not ok:
+                    errors.append(number)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return latencies, len(errors), time.perf_counter() - start
+
+
+def run_async(operation, concurrency, requests):
+    """Await operation(number) requests times from concurrency tasks; returns (latencies, errors, elapsed)"""
+    async def main():
+        numbers = itertools.count()
+        latencies = []
+        errors = 0
+
+        async def worker():
+            nonlocal errors
+            while (number := next(numbers)) < requests:
+                start = time.perf_counter()
+                try:
+                    ok = await operation(number)
+                except Exception:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                errors += not ok
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, errors, time.perf_counter() - start
+
+    return asyncio.run(main())
+
+
+class Benchmark:
+    """Builds the translator, web app and bot around a FakeBackend and runs the scenarios"""
+
+    def __init__(self, backend, workload, cache=True, memory=False, breaker=False):
+        self.backend = backend
+        self.workload = workload
+        self.cache_enabled = cache
+        self.breaker_enabled = breaker
+        self.translator = LanguageTranslator(
+            cache=TranslationCache([MemoryCache()] if cache else []),
+            strategy=BackendStrategy([backend]),
+            # The workload's texts differ only by a number, which the translation memory would fill in
+            memory=TranslationMemory() if memory else TranslationMemory(max_entries=0)
+        )
+        self._flask_client = None
+        self._bot = None
+
+    def reset(self):
+        """Start a scenario with empty translation, memory and detection caches and a fresh circuit breaker"""
+        # With the breaker left on, error-rate runs would mostly time its fast rejections,
+        # and an earlier run's failures would carry over; a disabled breaker never opens
+        strategy = self.translator.strategy
+        for backend in strategy.backends:
+            strategy.breakers[backend.name] = (
+                CircuitBreaker(backend.name) if self.breaker_enabled else CircuitBreaker(backend.name, min_calls=math.inf)
+            )
+        self.translator.cache.clear()
+        self.translator.memory.clear()
+        # Otherwise every level after the first gets its detections from the memo
+        if self.translator.detector.cache is not None:
+            self.translator.detector.cache.clear()
+
+    def _client(self):
+        if self._flask_client is None:
+            import web_app
+            # The routes look the shared translator up at request time, so they use ours
+            set_translator(self.translator)
+            self._flask_client = web_app.app
+        return self._flask_client.test_client()
+
+    def _telegram_bot(self):
+        if self._bot is None:
+            from reply_scheduler import ReplyScheduler
+            from telegram_bot import TelegramTranslationBot
+            self._bot = TelegramTranslationBot(self.translator)
+            # Measure the handler, not Telegram's flood limits
+            self._bot.replies = ReplyScheduler(global_rate=1e9, private_rate=1e9, group_rate_per_minute=1e9)
+        return self._bot
+
+    def run(self, scenario, concurrency, requests):
+        """Run one scenario at one concurrency level and return its summary"""
+        workload = self.workload
+
+        if scenario == 'translate':
+            def operation(number):
+                return _translated(self.translator.translate_text(workload.text(number), workload.target(number)))
+            runner = run_threads
+
+        elif scenario == 'translate_async':
+            async def operation(number):
+                result = await self.translator.translate_text_async(workload.text(number), workload.target(number))
+                return _translated(result)
+            runner = run_async
+
+        elif scenario == 'detect':
+            def operation(number):
+                return self.translator.detect_language(workload.text(number))[0] is not None
+            runner = run_threads
+
+        elif scenario in ('flask_translate', 'flask_detect'):
+            clients = threading.local()
+            path = '/api/translate' if scenario == 'flask_translate' else '/api/detect'
+
+            def operation(number):
+                if not hasattr(clients, 'client'):
+                    clients.client = self._client()
+                payload = {'text': workload.text(number), 'target_lang': workload.target(number)}
+                response = clients.client.post(path, json=payload)
+                return response.status_code == 200 and response.get_json().get('success', False)
+            self._client()
+            runner = run_threads
+
+        elif scenario == 'bot_message':
+            bot = self._telegram_bot()
+
+            async def operation(number):
+                # Spread the requests over one private chat per worker
+                chat_id = number % max(1, concurrency) + 1
+                message = _FakeMessage(chat_id, workload.text(number))
+                update = SimpleNamespace(effective_user=SimpleNamespace(id=chat_id), message=message)
+                await bot.handle_message(update, None)
+                return bool(message.replies) and not message.replies[0].startswith('❌')
+            runner = run_async
+
+        else:
+            raise ValueError(f"Unknown scenario '{scenario}', expected one of {', '.join(SCENARIOS)}")
+
+        self.reset()
+        # Warm up connections, thread pools and the detector before measuring
+        runner(operation, concurrency, min(requests, concurrency))
+        self.reset()
+        backend_calls = self.backend.calls
+        latencies, errors, elapsed = runner(operation, concurrency, requests)
+        row = summarize(scenario, concurrency, latencies, errors, elapsed, self.backend.calls - backend_calls)
+        row['circuit_opened'] = self.translator.strategy.breakers[self.backend.name].times_opened
+        return row
+
+
+def summarize(scenario, concurrency, latencies, errors, elapsed, backend_calls):
+    """Throughput and latency figures for one run, latencies in milliseconds"""
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'backend_calls': backend_calls,
+        'elapsed': round(elapsed, 4),
+        'throughput': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(max(latencies, default=None))
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print throughput and p95 changes against a baseline results file"""
+    previous = {(row['scenario'], row['concurrency']): row for row in baseline['results']}
+    print(f"\nCompared with {baseline.get('revision') or 'baseline'} ({baseline.get('timestamp', '?')}):")
+    for row in results:
+        old = previous.get((row['scenario'], row['concurrency']))
+        if not old or not old['throughput'] or not old['p95_ms']:
+            continue
+        throughput = (row['throughput'] / old['throughput'] - 1) * 100
+        p95 = (row['p95_ms'] / old['p95_ms'] - 1) * 100
+        print(f"  {row['scenario']:<16} c={row['concurrency']:<4} throughput {throughput:+7.1f}%   p95 {p95:+7.1f}%")
+
+
+def print_row(row):
+    print(
+        f"{row['scenario']:<16} {row['concurrency']:>5} {row['requests']:>7} {row['errors']:>6} "
+        f"{row['throughput']:>10.1f} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the translation hot path against a fake backend")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"comma-separated, from {', '.join(SCENARIOS)}")
+    parser.add_argument('--concurrency', default='1,8,32', help="comma-separated concurrency levels")
+    parser.add_argument('--requests', type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument('--latency', type=float, default=0.05, help="backend latency in seconds (median or mean)")
+    parser.add_argument('--latency-dist', default='fixed', choices=['fixed', 'uniform', 'exponential', 'lognormal'])
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of backend calls that fail")
+    parser.add_argument('--tail-rate', type=float, default=0.0, help="share of backend calls that take --tail-latency")
+    parser.add_argument('--tail-latency', type=float, default=1.0, help="latency of tail calls in seconds")
+    parser.add_argument('--cache-hit-ratio', type=float, default=0.0, help="share of requests repeating a cached text")
+    parser.add_argument('--no-cache', action='store_true', help="run without the translation cache")
+    parser.add_argument('--memory', action='store_true', help="let the translation memory reuse near-duplicate texts")
+    parser.add_argument('--breaker', action='store_true',
+                        help="keep the circuit breaker on (fresh each run); off by default so errors reach the backend")
+    parser.add_argument('--seed', type=int, default=1, help="random seed for latencies, errors and texts")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    # Injected backend failures would otherwise log a warning each
+    logging.getLogger().setLevel(logging.ERROR)
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario {unknown[0]}, expected one of {', '.join(SCENARIOS)}")
+
+    backend = FakeBackend(args.latency, args.latency_dist, args.error_rate, args.tail_rate, args.tail_latency,
+                          seed=args.seed)
+    benchmark = Benchmark(
+        backend, Workload(args.cache_hit_ratio, seed=args.seed), cache=not args.no_cache, memory=args.memory,
+        breaker=args.breaker
+    )
+
+    print(f"{'scenario':<16} {'conc':>5} {'reqs':>7} {'errors':>6} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    results = []
+    for scenario in scenarios:
+        for concurrency in levels:
+            row = benchmark.run(scenario, concurrency, args.requests)
+            results.append(row)
+            print_row(row)
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'circuit_breaker': 'fresh per run' if args.breaker else 'disabled',
+        'parameters': {
+            key: value for key, value in vars(args).items() if key not in ('output', 'compare')
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
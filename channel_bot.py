@@ -3,8 +3,16 @@ import asyncio
 from telegram import Update, Bot
 from telegram.ext import Application, MessageHandler, filters, ContextTypes
 from telegram.constants import ParseMode
-from translator import LanguageTranslator
-from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID, SUPPORTED_LANGUAGES
+from translator import get_translator_async, warm_up_in_background
+from preference_store import create_preference_store
+from reply_scheduler import get_reply_scheduler, AUTO
+from webhook import application_builder
+from metrics import instrument_handler, start_metrics_server
+from profiler import register_handlers, install_signal_handler
+from config import (
+    TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID, SUPPORTED_LANGUAGES, BOT_MODE, CHANNEL_MAX_TARGETS, CHANNEL_REPLY_MODE,
+    METRICS_PORT
+)
 
 # Set up logging
 logging.basicConfig(
@@ -13,10 +21,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# The only update type the handlers below use; Telegram sends nothing else
+ALLOWED_UPDATES = [Update.CHANNEL_POST]
+
 class ChannelTranslationBot:
-    def __init__(self):
-        self.translator = LanguageTranslator()
-        self.channel_language_preferences = {}  # Store channel language preferences
+    def __init__(self, translator=None):
+        self._translator = translator  # None: the shared translator, built on first use
+        self.channel_language_preferences = create_preference_store('channel')  # Store channel target language lists
+        self.replies = get_reply_scheduler()  # Rate-limited outbound replies
+        
+    async def get_translator(self):
+        """The translator; until the shared one is built, handlers wait for it off the event loop"""
+        return self._translator or await get_translator_async()
         
     async def handle_channel_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle messages in the channel"""
@@ -34,6 +50,8 @@ class ChannelTranslationBot:
             await self.handle_translate_request(message, context)
         elif text.startswith('/detect'):
             await self.handle_detect_request(message, context)
+        elif text.startswith('/autotranslate'):
+            await self.handle_autotranslate_request(message, context)
         else:
             # Auto-translate if enabled for this channel
             await self.auto_translate_message(message, context)
@@ -42,7 +60,7 @@ class ChannelTranslationBot:
         """Handle /translate command in channel"""
         text_parts = message.text.split(' ', 2)
         if len(text_parts) < 3:
-            await message.reply_text(
+            await self.replies.reply(message,
                 "Usage: /translate <target_language> <text>\n"
                 "Example: /translate es Hello, how are you?"
             )
@@ -51,92 +69,187 @@ class ChannelTranslationBot:
         target_lang = text_parts[1].lower()
         text_to_translate = text_parts[2]
         
-        if not self.translator.is_language_supported(target_lang):
-            await message.reply_text(
+        if target_lang not in SUPPORTED_LANGUAGES:
+            await self.replies.reply(message,
                 f"❌ Language code '{target_lang}' is not supported.\n"
                 f"Use /languages to see available options."
             )
             return
         
-        translated_text, message_info = self.translator.translate_text(text_to_translate, target_lang)
+        translator = await self.get_translator()
+        result = await translator.translate_text_async(text_to_translate, target_lang)
         
-        if translated_text:
-            source_lang, source_name = self.translator.detect_language(text_to_translate)
-            target_name = SUPPORTED_LANGUAGES.get(target_lang, target_lang)
-            
+        if result.success:
             response = f"🔄 *Translation:*\n\n"
-            response += f"Original ({source_name}): `{text_to_translate}`\n\n"
-            response += f"Translated to {target_name}: `{translated_text}`"
+            response += f"Original ({result.source_name}): `{text_to_translate}`\n\n"
+            response += f"Translated to {result.target_name}: `{result.translated_text}`"
             
-            await message.reply_text(response, parse_mode=ParseMode.MARKDOWN)
+            await self.replies.reply(message, response, parse_mode=ParseMode.MARKDOWN)
         else:
-            await message.reply_text(f"❌ {message_info}")
+            await self.replies.reply(message, f"❌ {result.message}")
     
     async def handle_detect_request(self, message, context: ContextTypes.DEFAULT_TYPE):
         """Handle /detect command in channel"""
         text_parts = message.text.split(' ', 1)
         if len(text_parts) < 2:
-            await message.reply_text(
+            await self.replies.reply(message,
                 "Usage: /detect <text>\n"
                 "Example: /detect Hello, how are you?"
             )
             return
         
         text = text_parts[1]
-        lang_code, lang_name = self.translator.detect_language(text)
+        translator = await self.get_translator()
+        lang_code, lang_name = await translator.detect_language_async(text)
         
         if lang_code:
-            await message.reply_text(
+            await self.replies.reply(message,
                 f"🔍 *Language Detection:*\n\n"
                 f"Text: `{text}`\n"
                 f"Detected Language: {lang_name} ({lang_code.upper()})",
                 parse_mode=ParseMode.MARKDOWN
             )
         else:
-            await message.reply_text(f"❌ {lang_name}")
+            await self.replies.reply(message, f"❌ {lang_name}")
+    
+    async def handle_autotranslate_request(self, message, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /autotranslate command in channel"""
+        channel_id = message.chat_id
+        codes = [code.lower() for code in message.text.split()[1:]]
+        
+        if not codes:
+            targets = await self.get_channel_languages(channel_id)
+            if targets:
+                names = ', '.join(f"{SUPPORTED_LANGUAGES.get(code, code)} ({code.upper()})" for code in targets)
+                await self.replies.reply(message, f"🌐 Posts are auto-translated to: {names}")
+            else:
+                await self.replies.reply(message,
+                    "Usage: /autotranslate <language> [<language> ...] or /autotranslate off\n"
+                    "Example: /autotranslate es fr de"
+                )
+            return
+        
+        if codes == ['off']:
+            await self.set_channel_languages(channel_id, [])
+            await self.replies.reply(message, "✅ Auto-translation is off for this channel")
+            return
+        
+        unsupported = [code for code in codes if code not in SUPPORTED_LANGUAGES]
+        if unsupported:
+            await self.replies.reply(message,
+                f"❌ Language code '{unsupported[0]}' is not supported.\n"
+                f"Use /languages to see available options."
+            )
+            return
+        
+        if not await self.set_channel_languages(channel_id, codes):
+            await self.replies.reply(message, f"❌ A channel can auto-translate to at most {CHANNEL_MAX_TARGETS} languages")
+            return
+        
+        names = ', '.join(SUPPORTED_LANGUAGES[code] for code in await self.get_channel_languages(channel_id))
+        await self.replies.reply(message, f"✅ Posts will be auto-translated to: {names}")
     
     async def auto_translate_message(self, message, context: ContextTypes.DEFAULT_TYPE):
         """Auto-translate messages in the channel"""
         channel_id = message.chat_id
         
         # Check if auto-translation is enabled for this channel
-        if channel_id not in self.channel_language_preferences:
+        targets = await self.get_channel_languages(channel_id)
+        if not targets:
             return
         
-        target_lang = self.channel_language_preferences[channel_id]
         text = message.text
         
-        # Detect source language
-        source_lang, source_name = self.translator.detect_language(text)
+        # Detect the source once and translate to every target concurrently;
+        # skip targets the post is already written in
+        translator = await self.get_translator()
+        results = await translator.translate_many_async(text, targets)
+        translations = [
+            result for result in results.values() if result.success and result.source_lang != result.target_lang
+        ]
+        if not translations:
+            return
         
-        # Only translate if source language is different from target
-        if source_lang and source_lang != target_lang:
-            translated_text, message_info = self.translator.translate_text(text, target_lang, source_lang)
-            
-            if translated_text:
-                target_name = SUPPORTED_LANGUAGES.get(target_lang, target_lang)
-                
-                response = f"🌐 *Auto Translation:*\n\n"
-                response += f"Original ({source_name}): `{text}`\n\n"
-                response += f"Translated to {target_name}: `{translated_text}`"
-                
-                await message.reply_text(response, parse_mode=ParseMode.MARKDOWN)
+        # Replies are queued behind command replies and not awaited, so the next post
+        # is handled while these wait for their slot
+        if CHANNEL_REPLY_MODE == 'separate':
+            for result in translations:
+                response = f"🌐 *Auto Translation ({result.target_name}):*\n\n`{result.translated_text}`"
+                self.replies.reply(message, response, priority=AUTO, parse_mode=ParseMode.MARKDOWN)
+        else:
+            # Queued back to back as coalescing replies, the scheduler merges them into
+            # as few messages as Telegram's length limit allows
+            response = f"🌐 *Auto Translation:*\n\nOriginal ({translations[0].source_name}): `{text}`"
+            self.replies.reply(message, response, priority=AUTO, coalesce=True, parse_mode=ParseMode.MARKDOWN)
+            for result in translations:
+                response = f"Translated to {result.target_name}: `{result.translated_text}`"
+                self.replies.reply(message, response, priority=AUTO, coalesce=True, parse_mode=ParseMode.MARKDOWN)
+    
+    async def set_channel_languages(self, channel_id, target_langs):
+        """Set the target languages for a channel (an empty list turns auto-translation off)"""
+        targets = list(dict.fromkeys(target_langs))
+        if len(targets) > CHANNEL_MAX_TARGETS:
+            return False
+        if not all(lang in SUPPORTED_LANGUAGES for lang in targets):
+            return False
+        if targets:
+            self.channel_language_preferences[channel_id] = targets
+        else:
+            self.channel_language_preferences.pop(channel_id)
+        return True
     
     async def set_channel_language(self, channel_id, target_lang):
-        """Set the target language for a channel"""
-        if self.translator.is_language_supported(target_lang):
-            self.channel_language_preferences[channel_id] = target_lang
+        """Set the target language for a channel, replacing any others"""
+        return await self.set_channel_languages(channel_id, [target_lang])
+    
+    async def add_channel_language(self, channel_id, target_lang):
+        """Add a target language for a channel"""
+        targets = await self.get_channel_languages(channel_id)
+        if target_lang in targets:
             return True
-        return False
+        return await self.set_channel_languages(channel_id, targets + [target_lang])
+    
+    async def remove_channel_language(self, channel_id, target_lang):
+        """Remove a target language from a channel"""
+        targets = await self.get_channel_languages(channel_id)
+        return await self.set_channel_languages(channel_id, [lang for lang in targets if lang != target_lang])
+    
+    async def get_channel_languages(self, channel_id):
+        """Get the target languages for a channel"""
+        targets = self.channel_language_preferences.get(channel_id) or []
+        # Channels set up before multi-language auto-translation stored a single code
+        return [targets] if isinstance(targets, str) else list(targets)
     
     async def get_channel_language(self, channel_id):
-        """Get the target language for a channel"""
-        return self.channel_language_preferences.get(channel_id)
+        """Get the first target language for a channel, or None if auto-translation is off"""
+        targets = await self.get_channel_languages(channel_id)
+        return targets[0] if targets else None
     
     async def error_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle errors"""
         logger.error(f"Update {update} caused error {context.error}")
 
+def build_application(application=None, translator=None):
+    """Add the bot's handlers to application (a new one by default) and return it"""
+    bot = ChannelTranslationBot(translator)
+    if application is None:
+        application = application_builder().build()
+    
+    # Add message handler for channel posts
+    application.add_handler(MessageHandler(
+        filters.ChatType.CHANNEL, instrument_handler('channel', 'channel_post', bot.handle_channel_message)
+    ))
+    
+    # Add error handler
+    application.add_error_handler(bot.error_handler)
+    
+    # Tag the handlers in profiles
+    register_handlers([
+        bot.handle_channel_message, bot.handle_translate_request, bot.handle_detect_request,
+        bot.handle_autotranslate_request, bot.auto_translate_message
+    ], 'channel bot')
+    return application
+
 def main():
     """Main function to run the channel bot"""
     if not TELEGRAM_BOT_TOKEN:
@@ -147,24 +260,30 @@ def main():
     if not TELEGRAM_CHANNEL_ID:
         logger.warning("TELEGRAM_CHANNEL_ID not set. Channel integration will be limited.")
     
-    # Create bot instance
-    bot = ChannelTranslationBot()
+    if BOT_MODE == 'webhook':
+        print("BOT_MODE is webhook: updates are delivered to the web app (python run_web.py).")
+        print("Add 'channel' to WEBHOOK_BOTS and register the webhook with: python webhook.py set")
+        return
     
-    # Create application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    # Create application with the channel handlers
+    application = build_application()
     
-    # Add message handler for channel posts
-    application.add_handler(MessageHandler(filters.ChatType.CHANNEL, bot.handle_channel_message))
+    # Serve /metrics for Prometheus; in webhook mode the web app serves them
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
     
-    # Add error handler
-    application.add_error_handler(bot.error_handler)
+    # Profile the running bot with PROFILE_SIGNAL (kill -USR2 <pid>)
+    install_signal_handler()
+    
+    # Build the translator while the bot connects to Telegram
+    warm_up_in_background()
     
     # Start the bot
     logger.info("Starting the Channel Translation Bot...")
     print("Channel bot is starting... Press Ctrl+C to stop.")
     
     try:
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
     except KeyboardInterrupt:
         logger.info("Channel bot stopped by user")
         print("Channel bot stopped.")
@@ -0,0 +1,132 @@
+"""
+Circuit breaker for the translation backends
+Tracks a rolling window of outcomes per backend and stops calling a backend
+that keeps failing or responding slowly until a cooldown has passed
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from config import (
+    BREAKER_WINDOW, BREAKER_MIN_CALLS, BREAKER_ERROR_RATE, BREAKER_SLOW_CALL_SECONDS,
+    BREAKER_SLOW_CALL_RATE, BREAKER_COOLDOWN
+)
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Closed: calls flow and outcomes are recorded
+    Open: calls are refused until the cooldown expires
+    Half-open: a single probe call decides between closed and open
+    """
+
+    def __init__(self, name, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 error_rate=BREAKER_ERROR_RATE, slow_call_seconds=BREAKER_SLOW_CALL_SECONDS,
+                 slow_call_rate=BREAKER_SLOW_CALL_RATE, cooldown=BREAKER_COOLDOWN, clock=time.monotonic):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = CLOSED
+        self.opened_at = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._outcomes = deque()  # (timestamp, success, latency)
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """Return True if the backend may be called now"""
+        with self._lock:
+            if self.state == OPEN and self.clock() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+                logger.info(f"Circuit for {self.name} is half-open, sending a probe")
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def release_probe(self):
+        """Give back a half-open probe slot whose call was abandoned without an outcome"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record(self, success, latency):
+        """Record the outcome of a call that allow_request let through"""
+        with self._lock:
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                if success and latency < self.slow_call_seconds:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"Circuit for {self.name} closed")
+                else:
+                    self._open(now)
+                return
+            self._outcomes.append((now, success, latency))
+            self._prune(now)
+            if self.state == CLOSED and self._should_open():
+                self._open(now)
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.times_opened += 1
+        logger.warning(f"Circuit for {self.name} opened for {self.cooldown:g}s")
+
+    def _prune(self, now):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def _rates(self):
+        calls = len(self._outcomes)
+        if not calls:
+            return 0, 0.0, 0.0
+        errors = sum(1 for _, success, _ in self._outcomes if not success)
+        slow = sum(1 for _, _, latency in self._outcomes if latency >= self.slow_call_seconds)
+        return calls, errors / calls, slow / calls
+
+    def _should_open(self):
+        calls, error_rate, slow_rate = self._rates()
+        return calls >= self.min_calls and (error_rate >= self.error_rate or slow_rate >= self.slow_call_rate)
+
+    def health_score(self):
+        """Score from 0 (unusable) to 1 (healthy) based on the rolling window"""
+        with self._lock:
+            if self.state == OPEN:
+                return 0.0
+            self._prune(self.clock())
+            _, error_rate, slow_rate = self._rates()
+        return round((1 - error_rate) * (1 - slow_rate / 2), 3)
+
+    def snapshot(self):
+        """Return the breaker state and rolling window figures"""
+        score = self.health_score()
+        with self._lock:
+            calls, error_rate, slow_rate = self._rates()
+            return {
+                'state': self.state,
+                'health': score,
+                'window_calls': calls,
+                'error_rate': round(error_rate, 3),
+                'slow_call_rate': round(slow_rate, 3),
+                'times_opened': self.times_opened,
+                'rejected': self.rejected
+            }
@@ -7,6 +7,30 @@ load_dotenv()
 # Telegram Bot Configuration
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHANNEL_ID = os.getenv('TELEGRAM_CHANNEL_ID')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')  # Bot API base URL override, e.g. a local stand-in for tests
+
+# Webhook Configuration (BOT_MODE=webhook delivers updates to the web app instead of polling)
+BOT_MODE = os.getenv('BOT_MODE', 'polling')  # 'polling' or 'webhook'
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # public HTTPS base URL of the web app, e.g. https://example.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')  # route receiving the updates
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')  # secret token header value; derived from the bot token if empty
+WEBHOOK_BOTS = os.getenv('WEBHOOK_BOTS', 'private')  # handlers served by the webhook: private, channel or both
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))  # parallel deliveries Telegram may open
+
+# Channel Auto-Translation Configuration
+CHANNEL_MAX_TARGETS = int(os.getenv('CHANNEL_MAX_TARGETS', 10))  # target languages one channel may auto-translate into
+CHANNEL_REPLY_MODE = os.getenv('CHANNEL_REPLY_MODE', 'combined')  # 'combined' (one reply per post) or 'separate' (one per language)
+
+# Reply Scheduling Configuration (keeps the bots under Telegram's flood limits)
+REPLY_GLOBAL_RATE = float(os.getenv('REPLY_GLOBAL_RATE', 30))  # messages per second across all chats
+REPLY_PRIVATE_RATE = float(os.getenv('REPLY_PRIVATE_RATE', 1))  # messages per second to one private chat
+REPLY_GROUP_RATE_PER_MINUTE = float(os.getenv('REPLY_GROUP_RATE_PER_MINUTE', 20))  # messages per minute to one group or channel
+REPLY_MAX_LENGTH = int(os.getenv('REPLY_MAX_LENGTH', 4096))  # Telegram's message limit, caps merged auto-translations
+REPLY_MAX_QUEUE = int(os.getenv('REPLY_MAX_QUEUE', 10000))  # queued replies before new auto-translations are dropped
+
+# Bot Update Processing Configuration
+BOT_CONCURRENT_UPDATES = int(os.getenv('BOT_CONCURRENT_UPDATES', 32))  # updates handled at once across chats (1 = sequential)
+BOT_METRICS_LOG_INTERVAL = float(os.getenv('BOT_METRICS_LOG_INTERVAL', 60))  # seconds between update stats log lines, 0 disables
 
 # Translation Configuration
 DEFAULT_TARGET_LANGUAGE = 'en'  # English as default target
@@ -33,6 +57,96 @@ SUPPORTED_LANGUAGES = {
     'no': 'Norwegian'
 }
 
+# Language Detection Configuration
+DETECTION_SEED = int(os.getenv('DETECTION_SEED', 0))  # fixed langdetect seed for repeatable results
+DETECTION_WARMUP = os.getenv('DETECTION_WARMUP', 'True').lower() == 'true'  # load profiles at startup
+DETECTION_CACHE_SIZE = int(os.getenv('DETECTION_CACHE_SIZE', 5000))  # recent detections kept in memory
+DETECTION_SHORT_TEXT = int(os.getenv('DETECTION_SHORT_TEXT', 200))  # texts up to this length try the script fast path
+DETECTION_SCRIPT_SHARE = float(os.getenv('DETECTION_SCRIPT_SHARE', 0.6))  # letter share a script needs before it decides or narrows detection
+DETECTION_BATCH_CHUNK = int(os.getenv('DETECTION_BATCH_CHUNK', 1000))  # texts scored together in one NumPy pass
+DETECTION_BATCH_MAX_ITEMS = int(os.getenv('DETECTION_BATCH_MAX_ITEMS', 1000))  # texts accepted per /api/detect/batch call
+
+# Translation Cache Configuration
+TRANSLATION_CACHE_SIZE = int(os.getenv('TRANSLATION_CACHE_SIZE', 10000))  # 0 disables the memory tier
+TRANSLATION_CACHE_TTL = int(os.getenv('TRANSLATION_CACHE_TTL', 86400))  # seconds, 0 means no expiry
+TRANSLATION_CACHE_DB = os.getenv('TRANSLATION_CACHE_DB', '')  # SQLite path for the persistent tier
+
+# Translation Memory Configuration (reuses translations of texts differing only in numbers, URLs, @mentions, emoji or names)
+TRANSLATION_MEMORY_SIZE = int(os.getenv('TRANSLATION_MEMORY_SIZE', 100000))  # templates kept in memory, 0 disables it
+TRANSLATION_MEMORY_THRESHOLD = float(os.getenv('TRANSLATION_MEMORY_THRESHOLD', 0))  # 0 reuses exact templates only; above it, names may be swapped (e.g. 0.8)
+TRANSLATION_MEMORY_MAX_CHARS = int(os.getenv('TRANSLATION_MEMORY_MAX_CHARS', 1000))  # longer texts are not remembered
+
+# Async Translation Configuration (used by the Telegram bots)
+TRANSLATION_WORKERS = int(os.getenv('TRANSLATION_WORKERS', 8))  # threads available for blocking translation calls
+TRANSLATION_TIMEOUT = float(os.getenv('TRANSLATION_TIMEOUT', 15))  # seconds a handler waits for one translation
+
+# Request Coalescing Configuration
+SINGLE_FLIGHT = os.getenv('SINGLE_FLIGHT', 'True').lower() == 'true'  # identical concurrent translations share one upstream call
+
+# HTTP Connection Pool Configuration (shared by all translation backends)
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))  # number of hosts kept in the pool
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 20))  # keep-alive connections per host
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 0))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))  # seconds
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))  # seconds
+HTTP_ASYNC_MAX_CONNECTIONS = int(os.getenv('HTTP_ASYNC_MAX_CONNECTIONS', 200))  # open connections per event loop (ASGI/bots)
+
+# Translation Backends (registered names, in the order they are tried)
+TRANSLATION_BACKENDS = os.getenv('TRANSLATION_BACKENDS', 'google,mymemory')  # google, mymemory, googletrans, offline
+
+# Backend Strategy Configuration
+TRANSLATION_STRATEGY = os.getenv('TRANSLATION_STRATEGY', 'sequential')  # sequential, hedged or race
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 95))  # hedge once a backend is slower than this percentile
+HEDGE_DELAY = float(os.getenv('HEDGE_DELAY', 1.0))  # seconds, used until enough latency samples exist
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', 20))
+LATENCY_WINDOW = int(os.getenv('LATENCY_WINDOW', 200))  # latency samples kept per backend
+BACKEND_WORKERS = int(os.getenv('BACKEND_WORKERS', 16))  # threads for hedged/raced backend calls
+
+# Circuit Breaker Configuration (per translation backend)
+BREAKER_WINDOW = float(os.getenv('BREAKER_WINDOW', 60))  # seconds of outcomes considered
+BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', 5))  # calls needed in the window before tripping
+BREAKER_ERROR_RATE = float(os.getenv('BREAKER_ERROR_RATE', 0.5))  # error share that opens the circuit
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv('BREAKER_SLOW_CALL_SECONDS', 5))  # calls slower than this count as slow
+BREAKER_SLOW_CALL_RATE = float(os.getenv('BREAKER_SLOW_CALL_RATE', 0.8))  # slow-call share that opens the circuit
+BREAKER_COOLDOWN = float(os.getenv('BREAKER_COOLDOWN', 30))  # seconds an open circuit waits before a probe
+
+# Long Text Segmentation Configuration
+SEGMENT_MAX_CHARS = int(os.getenv('SEGMENT_MAX_CHARS', 0))  # 0 uses the request limit of the backend tried first
+SEGMENT_MAX_WORKERS = int(os.getenv('SEGMENT_MAX_WORKERS', 4))  # segments of one text translated concurrently
+STREAM_SEGMENT_CHARS = int(os.getenv('STREAM_SEGMENT_CHARS', 300))  # smaller segments reach the browser sooner
+
+# Batch Translation Configuration
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 100))  # texts accepted per /api/translate/batch call
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', 8))  # concurrent upstream translations per batch
+
+# Preference Store Configuration (user and channel language preferences)
+PREFERENCE_DB = os.getenv('PREFERENCE_DB', '')  # SQLite file shared by bot processes; empty (the default) keeps them in memory
+PREFERENCE_FLUSH_INTERVAL = float(os.getenv('PREFERENCE_FLUSH_INTERVAL', 0.5))  # seconds between batched writes
+PREFERENCE_SYNC_INTERVAL = float(os.getenv('PREFERENCE_SYNC_INTERVAL', 2.0))  # seconds between checks for other processes' changes
+
+# Web Server Configuration (production mode runs gunicorn with gunicorn.conf.py)
+WEB_SERVER = os.getenv('WEB_SERVER', 'development')  # 'development' (Flask) or 'production' (gunicorn)
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', (os.cpu_count() or 1) * 2 + 1))  # pre-forked worker processes
+WEB_THREADS = int(os.getenv('WEB_THREADS', 4))  # request threads per worker
+WEB_WORKER_CLASS = os.getenv('WEB_WORKER_CLASS', '')  # empty picks gthread/sync; uvicorn.workers.UvicornWorker serves asgi_app
+WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', 60))  # seconds before a silent worker is killed and replaced
+WEB_GRACEFUL_TIMEOUT = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))  # seconds workers get to finish requests on restart
+WEB_KEEPALIVE = int(os.getenv('WEB_KEEPALIVE', 5))  # seconds to hold idle client connections open
+WEB_MAX_REQUESTS = int(os.getenv('WEB_MAX_REQUESTS', 1000))  # recycle a worker after this many requests (0 = never)
+WEB_MAX_REQUESTS_JITTER = int(os.getenv('WEB_MAX_REQUESTS_JITTER', 100))  # spreads recycling so workers don't restart together
+
+# Metrics Configuration (Prometheus text format at /metrics)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'  # record stage, backend, route and handler timings
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))  # port for the bots' /metrics server in polling mode, 0 disables
+
+# Profiling Configuration (sampling profiles of a live process, see profiler.py)
+PROFILE_SECONDS = float(os.getenv('PROFILE_SECONDS', 30))  # length of a profile started by the signal
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', 120))  # longest profile the admin endpoint accepts
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', 0.01))  # seconds between stack samples
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')  # where collapsed stack files are written
+PROFILE_SIGNAL = os.getenv('PROFILE_SIGNAL', 'SIGUSR2')  # signal that starts a profile, empty disables
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')  # bearer token for /admin endpoints, empty disables them
+
 # Bot Commands
 COMMANDS = {
     'start': 'Start the bot and see available commands',
@@ -0,0 +1,65 @@
+"""
+Gunicorn settings for the production web server
+Every value comes from config.py, so it can be tuned with environment variables:
+    gunicorn -c gunicorn.conf.py
+"""
+
+import gc
+import os
+
+from config import (
+    BOT_MODE, WEB_WORKERS, WEB_THREADS, WEB_WORKER_CLASS, WEB_TIMEOUT, WEB_GRACEFUL_TIMEOUT,
+    WEB_KEEPALIVE, WEB_MAX_REQUESTS, WEB_MAX_REQUESTS_JITTER
+)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = WEB_WORKERS
+threads = WEB_THREADS
+worker_class = WEB_WORKER_CLASS or ('gthread' if WEB_THREADS > 1 else 'sync')
+# The async worker serves the ASGI app; every other worker class serves the Flask app
+wsgi_app = 'asgi_app:app' if 'uvicorn' in worker_class.lower() else 'web_app:app'
+
+# Load the app, the translator and the language profiles once in the master so
+# the workers share those pages copy-on-write instead of each loading their own
+preload_app = True
+
+timeout = WEB_TIMEOUT
+graceful_timeout = WEB_GRACEFUL_TIMEOUT
+keepalive = WEB_KEEPALIVE
+max_requests = WEB_MAX_REQUESTS
+max_requests_jitter = WEB_MAX_REQUESTS_JITTER
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    """
+    Lets each worker be profiled with PROFILE_SIGNAL (send it to the worker, not the master)
+    In webhook mode every worker sends bot replies, so each gets a share of the flood limit
+    """
+    import profiler
+
+    profiler.install_signal_handler()
+    if BOT_MODE == 'webhook':
+        from reply_scheduler import get_reply_scheduler
+
+        get_reply_scheduler().split_between(worker.cfg.workers)
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded and before the first fork"""
+    from translator import get_translator
+
+    # Importing the app no longer builds the translator; build it here, before the fork
+    detector = get_translator().detector
+    # Also builds the n-gram scoring matrix, so it is loaded once rather than per worker
+    detector.warm_up()
+    # Move everything loaded so far out of the collector's reach, so collections
+    # in the workers don't write to (and un-share) the inherited pages
+    gc.freeze()
+    server.log.info(
+        f"Preloaded translator and language profiles; starting {server.cfg.workers} "
+        f"{server.cfg.worker_class_str} workers x {server.cfg.threads} threads"
+    )
+
@@ -0,0 +1,171 @@
+"""
+Shared HTTP session for the translation backends
+Keeps keep-alive connections pooled per host and reports how often they are reused.
+Async callers get an httpx.AsyncClient per event loop with the same limits.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from config import (
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_MAX_RETRIES,
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_ASYNC_MAX_CONNECTIONS
+)
+
+
+class PoolStats:
+    """Counts requests sent and TCP connections opened by the shared session"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.async_requests = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_async_request(self):
+        with self._lock:
+            self.async_requests += 1
+
+    def record_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def snapshot(self):
+        """Return the counters plus derived reuse figures"""
+        with self._lock:
+            requests_sent = self.requests
+            new_connections = self.new_connections
+            async_requests = self.async_requests
+        reused = max(requests_sent - new_connections, 0)
+        return {
+            'requests': requests_sent,
+            'async_requests': async_requests,
+            'new_connections': new_connections,
+            'reused_connections': reused,
+            'reuse_rate': reused / requests_sent if requests_sent else 0.0,
+            'pool_connections': HTTP_POOL_CONNECTIONS,
+            'pool_maxsize': HTTP_POOL_MAXSIZE
+        }
+
+
+_stats = PoolStats()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _stats.record_connection()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _stats.record_connection()
+        return super()._new_conn()
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools record every request and every new connection"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool
+        }
+
+    def send(self, request, **kwargs):
+        _stats.record_request()
+        return super().send(request, **kwargs)
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def _create_session():
+    session = requests.Session()
+    adapter = CountingHTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=HTTP_MAX_RETRIES
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """
+    Return the process-wide pooled session
+    A new session is created after a fork so workers never share sockets
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = _create_session()
+                _session_pid = pid
+    return _session
+
+
+def get(url, **kwargs):
+    """GET through the shared session with the configured default timeouts"""
+    kwargs.setdefault('timeout', (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    return get_session().get(url, **kwargs)
+
+
+# One async client per event loop; httpx clients cannot be shared across loops
+_async_clients = weakref.WeakKeyDictionary()
+
+
+async def _count_async_request(request):
+    _stats.record_async_request()
+
+
+def get_async_client():
+    """Return the pooled httpx.AsyncClient for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        # Imported on first use so importing this module stays cheap; only processes
+        # that make async requests (the ASGI app and the bots) load httpx
+        import httpx
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_POOL_MAXSIZE
+            ),
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            event_hooks={'request': [_count_async_request]}
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def aget(url, **kwargs):
+    """GET through the event loop's shared async client"""
+    return await get_async_client().get(url, **kwargs)
+
+
+async def close_async_client():
+    """Close the running event loop's async client, if one was created"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def get_pool_stats():
+    """Return connection reuse statistics for this process"""
+    return _stats.snapshot()
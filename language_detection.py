@@ -0,0 +1,366 @@
+"""
+Language detection engine for the Language Agnostic Translator
+Wraps langdetect with a fixed seed, an eager profile warm-up, a Unicode-script
+fast path for short texts and a memo cache of recent results.
+Texts are scored against langdetect's n-gram profiles with NumPy, batches together;
+single texts and batches go through the same scoring so they always agree.
+
+Run directly to classify a file of messages, one per line:
+    python language_detection.py messages.txt
+"""
+
+import bisect
+import logging
+import sys
+import threading
+import time
+from importlib.util import find_spec
+from itertools import chain
+
+from langdetect import DetectorFactory, LangDetectException, detect_langs
+from langdetect import detector_factory
+from langdetect.detector import Detector
+from langdetect.detector_factory import init_factory
+from langdetect.lang_detect_exception import ErrorCode
+
+from config import (
+    SUPPORTED_LANGUAGES, DETECTION_SEED, DETECTION_CACHE_SIZE, DETECTION_SHORT_TEXT,
+    DETECTION_SCRIPT_SHARE, DETECTION_BATCH_CHUNK
+)
+from translation_cache import MemoryCache, normalize_text
+
+# NumPy is imported when the scorer is first built, not at startup; without it
+# texts are scored one at a time by langdetect
+HAS_NUMPY = find_spec('numpy') is not None
+
+logger = logging.getLogger(__name__)
+
+# langdetect samples n-grams randomly; a fixed seed makes results repeatable
+DetectorFactory.seed = DETECTION_SEED
+
+# Unicode blocks of the scripts the fast path recognises
+_SCRIPT_BLOCKS = sorted([
+    (0x0370, 0x03FF, 'greek'),
+    (0x0400, 0x04FF, 'cyrillic'),
+    (0x0500, 0x052F, 'cyrillic'),     # Cyrillic Supplement
+    (0x0590, 0x05FF, 'hebrew'),
+    (0x0600, 0x06FF, 'arabic'),
+    (0x0750, 0x077F, 'arabic'),       # Arabic Supplement
+    (0x0900, 0x097F, 'devanagari'),
+    (0x0E00, 0x0E7F, 'thai'),
+    (0x1100, 0x11FF, 'hangul'),       # Hangul Jamo
+    (0x3040, 0x309F, 'kana'),         # Hiragana
+    (0x30A0, 0x30FF, 'kana'),         # Katakana
+    (0x3130, 0x318F, 'hangul'),       # Hangul Compatibility Jamo
+    (0x3400, 0x4DBF, 'han'),          # CJK Extension A
+    (0x4E00, 0x9FFF, 'han'),          # CJK Unified Ideographs
+    (0xAC00, 0xD7AF, 'hangul'),       # Hangul Syllables
+    (0xFB50, 0xFDFF, 'arabic'),       # Arabic Presentation Forms-A
+    (0xFE70, 0xFEFF, 'arabic'),       # Arabic Presentation Forms-B
+])
+_BLOCK_STARTS = [start for start, _, _ in _SCRIPT_BLOCKS]
+
+# Languages written in each script; a script with one language decides it outright,
+# a shared script narrows n-gram scoring to its languages
+SCRIPT_LANGUAGES = {
+    'greek': ('el',),
+    'hebrew': ('he',),
+    'thai': ('th',),
+    'hangul': ('ko',),
+    'kana': ('ja',),
+    'han': ('zh',),
+    'cyrillic': ('ru', 'uk', 'bg'),
+    'arabic': ('ar', 'fa'),
+    'devanagari': ('hi', 'mr', 'ne'),
+}
+
+
+def _script_of(char):
+    """Return the name of char's script, if the fast path recognises it"""
+    index = bisect.bisect_right(_BLOCK_STARTS, ord(char)) - 1
+    if index >= 0:
+        start, end, script = _SCRIPT_BLOCKS[index]
+        if ord(char) <= end:
+            return script
+    return None
+
+
+def detect_script(text, min_share=DETECTION_SCRIPT_SHARE):
+    """
+    Return the script at least min_share of the letters in text are written in,
+    or None if no recognised script dominates
+    """
+    counts = {}
+    letters = 0
+    for char in text:
+        if not char.isalpha():
+            continue
+        letters += 1
+        script = _script_of(char)
+        if script:
+            counts[script] = counts.get(script, 0) + 1
+    if not letters or not counts:
+        return None
+    # Kanji mixed with kana is Japanese
+    if 'kana' in counts and 'han' in counts:
+        counts['kana'] += counts.pop('han')
+    script, count = max(counts.items(), key=lambda item: item[1])
+    return script if count / letters >= min_share else None
+
+
+def _normalize_code(lang_code):
+    """Map langdetect codes such as 'zh-cn' onto the SUPPORTED_LANGUAGES keys"""
+    if lang_code not in SUPPORTED_LANGUAGES:
+        base = lang_code.split('-')[0]
+        if base in SUPPORTED_LANGUAGES:
+            return base
+    return lang_code
+
+
+class NgramProfileScorer:
+    """
+    Naive Bayes scoring of many texts at once over langdetect's n-gram profiles
+    Unlike langdetect's sampled trials every n-gram is used, so results are exact and
+    repeatable. Profiles are kept for SUPPORTED_LANGUAGES and the languages of the
+    shared scripts; each call scores against SUPPORTED_LANGUAGES unless told otherwise
+    """
+
+    # Same smoothing langdetect applies to each n-gram probability
+    ALPHA_WEIGHT = Detector.ALPHA_DEFAULT / Detector.BASE_FREQ
+
+    def __init__(self, languages=None):
+        import numpy as np
+
+        if languages is None:
+            languages = set(SUPPORTED_LANGUAGES).union(*SCRIPT_LANGUAGES.values())
+
+        init_factory()
+        self.factory = detector_factory._factory
+        columns = [i for i, lang in enumerate(self.factory.langlist) if _normalize_code(lang) in languages]
+        self.languages = sorted({_normalize_code(self.factory.langlist[i]) for i in columns})
+        ngrams = list(self.factory.word_lang_prob_map)
+        self.index = {ngram: row for row, ngram in enumerate(ngrams)}
+        probs = np.asarray([self.factory.word_lang_prob_map[ngram] for ngram in ngrams], dtype=np.float32)
+        self.log_probs = np.log(probs[:, columns] + self.ALPHA_WEIGHT)
+        # Folds profile columns (e.g. zh-cn and zh-tw) into one column per supported code
+        self.fold = np.zeros((len(columns), len(self.languages)), dtype=np.float32)
+        for column, i in enumerate(columns):
+            self.fold[column, self.languages.index(_normalize_code(self.factory.langlist[i]))] = 1.0
+        self._masks = {}
+
+    def _column_mask(self, languages):
+        """Boolean mask of the profile columns belonging to languages"""
+        languages = frozenset(languages)
+        mask = self._masks.get(languages)
+        if mask is None:
+            mask = self.fold[:, [i for i, lang in enumerate(self.languages) if lang in languages]].any(axis=1)
+            self._masks[languages] = mask
+        return mask
+
+    def features(self, text):
+        """Return the profile row of every n-gram in text, extracted the way langdetect does"""
+        detector = self.factory.create()
+        detector.append(text)
+        detector.cleaning_text()
+        return [self.index[ngram] for ngram in detector._extract_ngrams()]
+
+    def score(self, texts, languages=SUPPORTED_LANGUAGES):
+        """
+        Return (code, confidence) among languages for each text,
+        or None when a text has no known n-grams
+        """
+        import numpy as np
+
+        mask = self._column_mask(languages)
+        feature_lists = [self.features(text) for text in texts]
+        lengths = np.fromiter((len(features) for features in feature_lists), dtype=np.int64, count=len(texts))
+        nonempty = lengths > 0
+        results = [None] * len(texts)
+        if not nonempty.any() or not mask.any():
+            return results
+
+        rows = np.fromiter(chain.from_iterable(feature_lists), dtype=np.int64, count=int(lengths.sum()))
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))[nonempty]
+        log_likelihood = np.add.reduceat(self.log_probs[rows], offsets, axis=0)
+
+        # Softmax over the allowed languages, then fold variants of the same language together
+        log_likelihood[:, ~mask] = -np.inf
+        log_likelihood -= log_likelihood.max(axis=1, keepdims=True)
+        probs = np.exp(log_likelihood)
+        probs /= probs.sum(axis=1, keepdims=True)
+        probs = probs @ self.fold
+
+        best = probs.argmax(axis=1)
+        for position, text_index in enumerate(np.flatnonzero(nonempty)):
+            results[text_index] = (self.languages[best[position]], float(probs[position, best[position]]))
+        return results
+
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def get_scorer():
+    """Return the process-wide NgramProfileScorer, building it on first use"""
+    global _scorer
+    if _scorer is None:
+        with _scorer_lock:
+            if _scorer is None:
+                start = time.perf_counter()
+                _scorer = NgramProfileScorer()
+                logger.info(f"N-gram profile matrix built in {time.perf_counter() - start:.2f}s")
+    return _scorer
+
+
+class LanguageDetector:
+    """Deterministic, memoized language detection"""
+
+    def __init__(self, cache_size=DETECTION_CACHE_SIZE, short_text=DETECTION_SHORT_TEXT):
+        self.short_text = short_text
+        self.cache = MemoryCache(max_entries=cache_size, ttl=0) if cache_size > 0 else None
+        self._lock = threading.Lock()
+        self.fast_path_hits = 0
+        self.ngram_calls = 0
+        self.batch_texts = 0
+        self.warmed_up = False
+
+    def warm_up(self):
+        """Load the langdetect profiles now rather than on the first request"""
+        if self.warmed_up:
+            return
+        start = time.perf_counter()
+        init_factory()
+        detect_langs("warm up the language profiles")
+        if HAS_NUMPY:
+            get_scorer()
+        self.warmed_up = True
+        logger.info(f"Language profiles loaded in {time.perf_counter() - start:.2f}s")
+
+    def detect(self, text):
+        """
+        Detect the language of text, returning (code, confidence)
+        Raises langdetect's LangDetectException if the text has no detectable features
+        """
+        key = normalize_text(text)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        languages = self._script_languages(key)
+        if languages is not None and len(languages) == 1:
+            result = (languages[0], 1.0)
+            with self._lock:
+                self.fast_path_hits += 1
+        else:
+            result = self._score([key], languages)[0]
+            with self._lock:
+                self.ngram_calls += 1
+            if result is None:
+                raise LangDetectException(ErrorCode.CantDetectError, 'No features in text.')
+
+        if self.cache is not None:
+            self.cache.set(key, result)
+        return result
+
+    def detect_batch(self, texts, chunk_size=DETECTION_BATCH_CHUNK):
+        """
+        Detect the language of many texts, returning (code, confidence) or None per text
+        Cached texts and texts in a single-language script are answered directly; the
+        rest are scored together in chunks, grouped by the languages they may be in
+        """
+        results = [None] * len(texts)
+        pending = {}
+        for position, text in enumerate(texts):
+            key = normalize_text(text or '')
+            if not key:
+                continue
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                results[position] = cached
+                continue
+            languages = self._script_languages(key)
+            if languages is not None and len(languages) == 1:
+                results[position] = (languages[0], 1.0)
+                with self._lock:
+                    self.fast_path_hits += 1
+                continue
+            pending.setdefault(languages, []).append((position, key))
+
+        for languages, items in pending.items():
+            for start in range(0, len(items), chunk_size):
+                chunk = items[start:start + chunk_size]
+                scored = self._score([key for _, key in chunk], languages)
+                for (position, key), result in zip(chunk, scored):
+                    results[position] = result
+                    if result is not None and self.cache is not None:
+                        self.cache.set(key, result)
+
+        with self._lock:
+            self.batch_texts += len(texts)
+        return results
+
+    def _script_languages(self, key):
+        """The languages a short text's script allows, or None to consider all supported languages"""
+        if len(key) > self.short_text:
+            return None
+        script = detect_script(key)
+        return SCRIPT_LANGUAGES[script] if script else None
+
+    def _score(self, keys, languages=None):
+        """Score keys among languages (default SUPPORTED_LANGUAGES), one (code, confidence) or None each"""
+        languages = languages or SUPPORTED_LANGUAGES
+        if HAS_NUMPY:
+            return get_scorer().score(keys, languages)
+        return [self._detect_single(key, languages) for key in keys]
+
+    def _detect_single(self, key, languages):
+        """Fallback without NumPy: langdetect with every language outside languages ruled out"""
+        init_factory()
+        detector = detector_factory._factory.create()
+        detector.set_prior_map({lang: 1.0 for lang in detector.langlist if _normalize_code(lang) in languages})
+        detector.append(key)
+        try:
+            probabilities = detector.get_probabilities()
+        except LangDetectException:
+            return None
+        folded = {}
+        for candidate in probabilities:
+            code = _normalize_code(candidate.lang)
+            folded[code] = folded.get(code, 0.0) + candidate.prob
+        if not folded:
+            return None
+        return max(folded.items(), key=lambda item: item[1])
+
+    def stats(self):
+        """Return fast-path, n-gram and memo cache counters"""
+        return {
+            'warmed_up': self.warmed_up,
+            'fast_path_hits': self.fast_path_hits,
+            'ngram_calls': self.ngram_calls,
+            'batch_texts': self.batch_texts,
+            'vectorized': HAS_NUMPY,
+            'cache': self.cache.stats() if self.cache is not None else None
+        }
+
+
+def main():
+    """Classify every line of a file (or stdin) and report throughput"""
+    source = open(sys.argv[1], encoding='utf-8') if len(sys.argv) > 1 else sys.stdin
+    with source:
+        texts = [line.rstrip('\n') for line in source]
+
+    detector = LanguageDetector(cache_size=0)
+    start = time.perf_counter()
+    results = detector.detect_batch(texts)
+    elapsed = time.perf_counter() - start
+
+    for text, result in zip(texts, results):
+        code, confidence = result if result else ('unknown', 0.0)
+        print(f"{code}\t{confidence:.3f}\t{text}")
+    rate = len(texts) / elapsed if elapsed else 0.0
+    print(f"{len(texts)} texts in {elapsed:.2f}s ({rate:.0f} texts/second)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""
+Hot-path metrics in the Prometheus text format
+Counters and histograms for the translation stages, the backends, language
+detection, the web routes and the bot handlers. Recording is a dict lookup, a
+bisect and a few additions under a lock; with METRICS_ENABLED off every metric
+hands out a shared no-op child.
+
+The web apps serve the metrics at /metrics; the bots in polling mode can serve
+them with start_metrics_server() on METRICS_PORT.
+"""
+
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_ENABLED, SUPPORTED_LANGUAGES
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; request-level latencies and the fast in-process stages
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+FAST_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+# Label values taken from requests are mapped onto fixed sets, so clients cannot
+# create new series (and grow memory and /metrics) without bound
+_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+
+def language_label(lang_code):
+    """A supported language code, 'unknown' when there is none, or 'other'"""
+    if not lang_code:
+        return 'unknown'
+    return lang_code if lang_code in SUPPORTED_LANGUAGES else 'other'
+
+
+def method_label(method):
+    """A standard HTTP method, or 'other'"""
+    return method if method in _METHODS else 'other'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _NoOpChild:
+    """Stands in for every child while metrics are disabled"""
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def time(self):
+        return _Timer(self)
+
+
+_NOOP = _NoOpChild()
+
+
+class _Timer:
+    """Context manager observing the seconds spent in its block"""
+
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values):
+        """The child for one combination of label values; bind it once on hot paths"""
+        if not METRICS_ENABLED:
+            return _NOOP
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self._children.items(), key=lambda item: tuple(map(str, item[0]))):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {_format_number(child.value)}']
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = f'le="{_format_number(bound)}"'
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}')
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f'{self.name}_sum{labels} {_format_number(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """The metrics of one process"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+TRANSLATIONS = Counter(
+    'translator_translations_total', 'Translations by language pair and outcome', ('source', 'target', 'outcome')
+)
+TRANSLATION_SECONDS = Histogram(
+    'translator_translation_seconds', 'End-to-end translation time by language pair', ('source', 'target')
+)
+STAGE_SECONDS = Histogram(
+    'translator_stage_seconds', 'Time spent in each translation stage', ('stage',), buckets=FAST_BUCKETS + (0.25, 1, 5)
+)
+DETECTIONS = Counter('translator_detections_total', 'Language detections by detected language', ('language',))
+BACKEND_SECONDS = Histogram(
+    'translator_backend_request_seconds', 'Translation backend calls by backend and outcome', ('backend', 'outcome')
+)
+HTTP_SECONDS = Histogram(
+    'translator_http_request_seconds', 'Web requests by route, method and status', ('route', 'method', 'status')
+)
+BOT_HANDLER_SECONDS = Histogram(
+    'translator_bot_handler_seconds', 'Bot update handlers by bot, handler and outcome', ('bot', 'handler', 'outcome')
+)
+BOT_REPLY_SECONDS = Histogram(
+    'translator_bot_reply_seconds', 'Telegram sendMessage calls by outcome', ('outcome',)
+)
+BOT_REPLY_QUEUE_SECONDS = Histogram(
+    'translator_bot_reply_queue_seconds', 'Time replies wait in the reply scheduler'
+)
+
+
+def record_translation(result, seconds):
+    """Count one finished translate call and observe its duration"""
+    if not METRICS_ENABLED:
+        return
+    if not result.success:
+        outcome = 'failed'
+    elif result.cached:
+        outcome = 'memory' if result.backend == 'memory' else 'cached'
+    elif result.source_lang == result.target_lang:
+        outcome = 'unchanged'
+    elif result.backend:
+        outcome = 'translated'
+    else:
+        outcome = 'unavailable'
+    source = language_label(result.source_lang)
+    target = language_label(result.target_lang)
+    TRANSLATIONS.labels(source, target, outcome).inc()
+    TRANSLATION_SECONDS.labels(source, target).observe(seconds)
+
+
+def instrument_handler(bot, name, callback):
+    """Wrap an async bot handler so its duration and outcome are recorded"""
+    if not METRICS_ENABLED:
+        return callback
+    succeeded = BOT_HANDLER_SECONDS.labels(bot, name, 'ok')
+    failed = BOT_HANDLER_SECONDS.labels(bot, name, 'error')
+
+    @functools.wraps(callback)
+    async def handler(update, context):
+        start = time.perf_counter()
+        try:
+            result = await callback(update, context)
+        except Exception:
+            failed.observe(time.perf_counter() - start)
+            raise
+        succeeded.observe(time.perf_counter() - start)
+        return result
+
+    return handler
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """
+    Serve /metrics from a background thread (for the bots, which have no web server)
+    Returns the server, or None if the port is unavailable; the bot keeps running either way
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    except OSError as e:
+        logger.warning(f"Could not serve metrics on port {port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+    return server
@@ -0,0 +1,255 @@
+"""
+User and channel preference storage for the Telegram bots
+Preferences live in an in-memory dict so lookups on the message path are plain
+dict reads. The SQLite-backed store writes changes in batches from a background
+thread, and reloads when another bot process has written to the same database.
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import weakref
+
+from config import PREFERENCE_DB, PREFERENCE_FLUSH_INTERVAL, PREFERENCE_SYNC_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Marks a pending delete in the write batch
+_DELETED = object()
+
+# Open SQLite stores, reopened in the child after a fork and closed at exit
+_STORES = weakref.WeakSet()
+
+
+class PreferenceStore:
+    """In-memory preferences; the base for persistent stores and the fallback without one"""
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._data = {}
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(list(self._data))
+
+    def items(self):
+        return list(self._data.items())
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def pop(self, key, default=None):
+        if key not in self._data:
+            return default
+        value = self._data[key]
+        del self[key]
+        return value
+
+    def flush(self):
+        """Write pending changes; nothing to do in memory"""
+
+    def close(self):
+        self.flush()
+
+    def stats(self):
+        return {'backend': 'memory', 'namespace': self.namespace, 'entries': len(self._data)}
+
+
+class SQLitePreferenceStore(PreferenceStore):
+    """
+    Preferences persisted to a SQLite database in WAL mode
+    Writes update the dict at once and are committed in batches every flush_interval
+    seconds. Every sync_interval seconds the store checks PRAGMA data_version and
+    reloads if another process committed changes.
+    Keys and values are stored as JSON, so ids stay ints and values may be lists.
+    A forked child (a gunicorn worker of a preloaded app) gets its own connection
+    and background thread.
+    """
+
+    def __init__(self, namespace, path=PREFERENCE_DB, flush_interval=PREFERENCE_FLUSH_INTERVAL,
+                 sync_interval=PREFERENCE_SYNC_INTERVAL):
+        super().__init__(namespace)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.sync_interval = sync_interval
+        self._pending = {}
+        self._closed = False
+        self.writes = 0
+        self.flushes = 0
+        self.reloads = 0
+        self._open()
+        _STORES.add(self)
+
+    def _open(self):
+        """Connect, load the preferences and start the background thread for this process"""
+        self._lock = threading.Lock()  # guards _pending and the connection
+        self._wake = threading.Event()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS preferences '
+            '(namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+            'PRIMARY KEY (namespace, key)) WITHOUT ROWID'
+        )
+        self._conn.commit()
+        with self._lock:
+            self._reload()
+
+        self._thread = threading.Thread(target=self._run, name=f'preferences-{self.namespace}', daemon=True)
+        self._thread.start()
+
+    def _reopen_after_fork(self):
+        """
+        Runs in a forked child: the parent's connection, lock and thread are unusable
+        here, and the parent still flushes the writes that were pending at the fork
+        """
+        if self._closed:
+            return
+        self._pending = {}
+        self._open()
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._pending[key] = value
+            self.writes += 1
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+            self._pending[key] = _DELETED
+            self.writes += 1
+
+    def _reload(self):
+        """Replace the dict with the database contents, keeping unflushed local changes"""
+        rows = self._conn.execute(
+            'SELECT key, value FROM preferences WHERE namespace = ?', (self.namespace,)
+        ).fetchall()
+        data = {json.loads(key): json.loads(value) for key, value in rows}
+        for key, value in self._pending.items():
+            if value is _DELETED:
+                data.pop(key, None)
+            else:
+                data[key] = value
+        # Swap in a new dict rather than mutating, so readers never see a half-built one
+        self._data = data
+        self._data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        self.reloads += 1
+
+    def flush(self):
+        """Commit all pending changes in one transaction"""
+        with self._lock:
+            if not self._pending or self._closed:
+                return
+            pending, self._pending = self._pending, {}
+            deletes = [(self.namespace, json.dumps(key)) for key, value in pending.items() if value is _DELETED]
+            upserts = [
+                (self.namespace, json.dumps(key), json.dumps(value))
+                for key, value in pending.items() if value is not _DELETED
+            ]
+            try:
+                with self._conn:
+                    self._conn.executemany('DELETE FROM preferences WHERE namespace = ? AND key = ?', deletes)
+                    self._conn.executemany(
+                        'INSERT OR REPLACE INTO preferences (namespace, key, value) VALUES (?, ?, ?)', upserts
+                    )
+                self.flushes += 1
+            except sqlite3.Error as e:
+                logger.warning(f"Could not save {len(pending)} {self.namespace} preferences, will retry: {e}")
+                # Changes made since the batch was taken are newer and win
+                self._pending = {**pending, **self._pending}
+
+    def sync(self):
+        """Reload if another process has committed to the database since the last check"""
+        with self._lock:
+            if self._closed:
+                return
+            if self._conn.execute('PRAGMA data_version').fetchone()[0] != self._data_version:
+                self._reload()
+
+    def _run(self):
+        since_sync = 0.0
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            try:
+                self.flush()
+                since_sync += self.flush_interval
+                if since_sync >= self.sync_interval:
+                    since_sync = 0.0
+                    self.sync()
+            except Exception as e:
+                logger.error(f"Preference store {self.namespace} background error: {e}")
+
+    def close(self):
+        """Flush pending changes and close the database"""
+        if self._closed:
+            return
+        self.flush()
+        with self._lock:
+            self._closed = True
+            self._conn.close()
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'backend': 'sqlite',
+            'namespace': self.namespace,
+            'path': self.path,
+            'entries': len(self._data),
+            'pending_writes': pending,
+            'writes': self.writes,
+            'flushes': self.flushes,
+            'reloads': self.reloads
+        }
+
+
+def _reopen_stores_after_fork():
+    for store in list(_STORES):
+        try:
+            store._reopen_after_fork()
+        except sqlite3.Error as e:
+            logger.error(f"Could not reopen {store.namespace} preferences after fork: {e}")
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reopen_stores_after_fork)
+
+
+@atexit.register
+def _close_stores():
+    """Flush and close the stores still open at exit; _STORES holds them weakly, so closed ones are gone"""
+    for store in list(_STORES):
+        try:
+            store.close()
+        except sqlite3.Error as e:
+            logger.error(f"Could not close {store.namespace} preferences: {e}")
+
+
+def create_preference_store(namespace):
+    """Build the preference store configured in config.py"""
+    if PREFERENCE_DB:
+        try:
+            return SQLitePreferenceStore(namespace)
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent preferences disabled, keeping {namespace} preferences in memory: {e}")
+    return PreferenceStore(namespace)
@@ -0,0 +1,155 @@
+"""
+Sampling profiler for live web and bot processes
+Samples every thread's Python stack at a fixed interval for a number of seconds
+and writes the result as collapsed stacks, the input format of flamegraph.pl and
+speedscope. Frames of web routes and bot handlers are tagged so they stand out.
+
+Start a profile without restarting the process:
+    kill -USR2 <pid>                       # PROFILE_SECONDS, written to PROFILE_DIR
+    curl -X POST -H "Authorization: Bearer $ADMIN_TOKEN" \\
+        "http://localhost:5000/admin/profile?seconds=10" > web.folded
+"""
+
+import hmac
+import inspect
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from config import PROFILE_SECONDS, PROFILE_MAX_SECONDS, PROFILE_INTERVAL, PROFILE_DIR, PROFILE_SIGNAL, ADMIN_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames of threads that are blocked rather than running; left out unless include_idle
+_IDLE_LEAVES = {'wait', 'select', 'poll', 'accept', 'sleep', '_worker', 'serve_forever', 'run_forever'}
+
+# Code objects of web routes and bot handlers -> tag shown after the frame
+_handlers = {}
+# Code object -> frame label, so each function is formatted once
+_labels = {}
+
+# Held while a profile runs; profiles do not overlap
+_running = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is requested while another one is running"""
+
+
+def register_handlers(functions, kind):
+    """Tag the frames of functions (routes or handlers, possibly wrapped) as kind handlers"""
+    for function in functions:
+        function = inspect.unwrap(function)
+        code = getattr(getattr(function, '__func__', function), '__code__', None)
+        if code is not None:
+            _handlers[code] = kind
+            _labels.pop(code, None)
+
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        label = f"{code.co_name} ({os.path.basename(code.co_filename)})"
+        if code in _handlers:
+            label += f" [{_handlers[code]} handler]"
+        _labels[code] = label
+    return label
+
+
+class SamplingProfiler:
+    """Counts how often each stack is seen across all threads but its own"""
+
+    def __init__(self, interval=PROFILE_INTERVAL, include_idle=False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self.samples = 0
+
+    def sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            if not self.include_idle and frame.f_code.co_name in _IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f'thread-{ident}'))
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self, seconds):
+        """Sample for seconds and return self"""
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self.sample()
+            time.sleep(self.interval)
+        return self
+
+    def collapsed(self):
+        """One 'frame;frame;frame count' line per distinct stack"""
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+def profile(seconds=PROFILE_SECONDS, interval=PROFILE_INTERVAL, include_idle=False, directory=PROFILE_DIR):
+    """
+    Profile this process for seconds and write the collapsed stacks to directory
+    Returns (path, collapsed stacks); raises ProfilerBusy if a profile is already running
+    """
+    seconds = max(0.1, min(float(seconds), PROFILE_MAX_SECONDS))
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        logger.info(f"Profiling process {os.getpid()} for {seconds:g}s")
+        profiler = SamplingProfiler(interval, include_idle).run(seconds)
+        stacks = profiler.collapsed()
+    finally:
+        _running.release()
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"profile-{os.getpid()}-{datetime.now():%Y%m%d-%H%M%S}.folded")
+    with open(path, 'w') as f:
+        f.write(stacks)
+    logger.info(f"Profile written to {path} ({profiler.samples} samples, {len(profiler.stacks)} stacks)")
+    return path, stacks
+
+
+def profile_in_background(seconds=PROFILE_SECONDS):
+    """Start a profile on its own thread, e.g. from a signal handler"""
+    def run():
+        try:
+            profile(seconds)
+        except ProfilerBusy:
+            logger.warning("Profile requested while one is running; ignored")
+        except Exception as e:
+            logger.error(f"Profiling failed: {e}")
+
+    threading.Thread(target=run, name='profiler', daemon=True).start()
+
+
+def install_signal_handler(signal_name=PROFILE_SIGNAL):
+    """
+    Profile for PROFILE_SECONDS whenever the process receives signal_name
+    Does nothing where the signal does not exist (Windows) or off the main thread
+    """
+    signum = getattr(signal, signal_name, None) if signal_name else None
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signum, lambda received, frame: profile_in_background())
+    logger.info(f"Send {signal_name} to process {os.getpid()} to profile it for {PROFILE_SECONDS:g}s")
+    return True
+
+
+def check_admin_token(authorization):
+    """True if the Authorization header carries ADMIN_TOKEN; always False while no token is set"""
+    if not ADMIN_TOKEN or not authorization:
+        return False
+    return hmac.compare_digest(authorization, f"Bearer {ADMIN_TOKEN}")
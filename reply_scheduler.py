@@ -0,0 +1,287 @@
+"""
+Outbound reply scheduling for the Telegram bots
+Replies go through token buckets (one for the bot, one per chat) so the bots stay
+under Telegram's flood limits. Command replies are sent before auto-translations,
+and auto-translations queued for the same chat in reply to the same message are
+merged into one message.
+
+The buckets live in one process. When several processes send for the same bot
+token (gunicorn workers in webhook mode), each takes an equal share of the global
+rate with split_between(); a chat's limit is only kept if its updates reach one
+process, so the RetryAfter handling below covers the rest.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict
+
+from telegram.error import RetryAfter
+
+import metrics
+from config import (
+    REPLY_GLOBAL_RATE, REPLY_PRIVATE_RATE, REPLY_GROUP_RATE_PER_MINUTE, REPLY_MAX_LENGTH, REPLY_MAX_QUEUE
+)
+
+logger = logging.getLogger(__name__)
+
+# Lower values are sent first
+COMMAND = 0
+AUTO = 1
+
+# Per-chat buckets kept; beyond this the least recently used idle chats are forgotten
+_TRACKED_CHATS = 10000
+_COALESCE_SEPARATOR = '\n\n'
+
+
+class TokenBucket:
+    """Allows rate sends per second on average with bursts of up to capacity"""
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """Seconds until a token is available (0 if one is available now)"""
+        now = self.clock()
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def take(self):
+        self._refill(self.clock())
+        self.tokens -= 1
+
+    def block(self, seconds):
+        """Refuse tokens for seconds, e.g. after Telegram answered with RetryAfter"""
+        self.blocked_until = self.clock() + seconds
+        self.tokens = 0
+
+
+class _Reply:
+    __slots__ = ('priority', 'seq', 'message', 'text', 'kwargs', 'coalesce', 'future', 'queued_at')
+
+    def __init__(self, priority, seq, message, text, kwargs, coalesce, future):
+        self.priority = priority
+        self.seq = seq
+        self.message = message
+        self.text = text
+        self.kwargs = kwargs
+        self.coalesce = coalesce
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class ReplyScheduler:
+    """
+    Sends queued replies as fast as the buckets allow
+    Each chat has at most one send in flight, so its replies keep their order
+    within a priority.
+    """
+
+    def __init__(self, global_rate=REPLY_GLOBAL_RATE, private_rate=REPLY_PRIVATE_RATE,
+                 group_rate_per_minute=REPLY_GROUP_RATE_PER_MINUTE, max_length=REPLY_MAX_LENGTH,
+                 max_queue=REPLY_MAX_QUEUE, max_chats=_TRACKED_CHATS):
+        self.global_rate = global_rate
+        self.global_bucket = TokenBucket(global_rate, capacity=max(1, int(global_rate)))
+        self.private_rate = private_rate
+        self.group_rate = group_rate_per_minute / 60
+        self.max_length = max_length
+        self.max_queue = max_queue
+        self.max_chats = max_chats
+        self._queues = {}  # chat id -> heap of _Reply
+        self._buckets = OrderedDict()  # chat id -> TokenBucket
+        self._in_flight = set()
+        self._seq = itertools.count()
+        self._wake = None
+        self._task = None
+        self._loop = None
+        self.queued = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.retry_after = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def reply(self, message, text, priority=COMMAND, coalesce=False, **kwargs):
+        """
+        Queue message.reply_text(text, **kwargs) and return a future for the sent Message
+        Await it to wait for delivery; auto-translations can leave it unawaited so the
+        handler returns at once. With coalesce=True the text may be merged with other
+        coalescing replies queued for the same message.
+        """
+        self._ensure_running()
+        future = self._loop.create_future()
+        if self.queued >= self.max_queue and priority != COMMAND:
+            self.dropped += 1
+            logger.warning(f"Reply queue full ({self.queued}), dropping a reply to chat {message.chat_id}")
+            future.set_result(None)
+            return future
+        job = _Reply(priority, next(self._seq), message, text, kwargs, coalesce, future)
+        heapq.heappush(self._queues.setdefault(message.chat_id, []), job)
+        self.queued += 1
+        self._wake.set()
+        return future
+
+    def split_between(self, processes):
+        """Send at 1/processes of the global rate, when that many processes share the bot token"""
+        rate = self.global_rate / max(1, processes)
+        self.global_bucket = TokenBucket(rate, capacity=max(1, int(rate)))
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wake = asyncio.Event()
+            self._task = loop.create_task(self._dispatch())
+
+    def _bucket(self, chat_id):
+        bucket = self._buckets.pop(chat_id, None)
+        if bucket is None:
+            # Negative ids are groups and channels, which have the stricter per-minute limit
+            bucket = TokenBucket(self.group_rate if chat_id < 0 else self.private_rate)
+        self._buckets[chat_id] = bucket
+        self._evict_buckets()
+        return bucket
+
+    def _evict_buckets(self):
+        """
+        Forget least recently used chats until at most max_chats are tracked
+        Chats with queued or in-flight replies, or still waiting for a token, are kept
+        (moved to the recent end), so only buckets that would start out full again are dropped
+        """
+        for _ in range(len(self._buckets) - self.max_chats):
+            chat_id, bucket = next(iter(self._buckets.items()))
+            if chat_id in self._queues or chat_id in self._in_flight or bucket.delay() > 0:
+                self._buckets.move_to_end(chat_id)
+            else:
+                del self._buckets[chat_id]
+
+    def _next_chat(self):
+        """Return (chat id or None, seconds to wait): the best ready chat, or how long until one is ready"""
+        best = None
+        wait = None
+        for chat_id, queue in self._queues.items():
+            if chat_id in self._in_flight:
+                continue
+            delay = self._bucket(chat_id).delay()
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+            elif best is None or queue[0] < self._queues[best][0]:
+                best = chat_id
+        return best, wait
+
+    async def _dispatch(self):
+        while True:
+            chat_id, wait = self._next_chat()
+            if chat_id is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            global_wait = self.global_bucket.delay()
+            if global_wait > 0:
+                await asyncio.sleep(global_wait)
+                continue
+
+            self.global_bucket.take()
+            self._bucket(chat_id).take()
+            jobs = self._take_jobs(chat_id)
+            self._in_flight.add(chat_id)
+            self._loop.create_task(self._send(chat_id, jobs))
+
+    def _take_jobs(self, chat_id):
+        """
+        Pop the chat's next reply, merged with the following coalescing replies that fit
+        and answer the same message, since the merged text is sent as one reply to it
+        """
+        queue = self._queues[chat_id]
+        jobs = [heapq.heappop(queue)]
+        first = jobs[0]
+        if first.coalesce:
+            length = len(first.text)
+            while (queue and queue[0].coalesce and queue[0].message.message_id == first.message.message_id
+                   and queue[0].kwargs == first.kwargs):
+                length += len(_COALESCE_SEPARATOR) + len(queue[0].text)
+                if length > self.max_length:
+                    break
+                jobs.append(heapq.heappop(queue))
+        if not queue:
+            del self._queues[chat_id]
+        self.queued -= len(jobs)
+        return jobs
+
+    async def _send(self, chat_id, jobs):
+        first = jobs[0]
+        text = _COALESCE_SEPARATOR.join(job.text for job in jobs)
+        start = time.perf_counter()
+        metrics.BOT_REPLY_QUEUE_SECONDS.observe(start - first.queued_at)
+        try:
+            sent = await first.message.reply_text(text, **first.kwargs)
+            metrics.BOT_REPLY_SECONDS.labels('ok').observe(time.perf_counter() - start)
+            self.sent += 1
+            self.coalesced += len(jobs) - 1
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_result(sent)
+        except RetryAfter as e:
+            # Put the replies back and hold the chat until Telegram allows it again
+            self.retry_after += 1
+            metrics.BOT_REPLY_SECONDS.labels('retry_after').observe(time.perf_counter() - start)
+            logger.warning(f"Flood limit hit for chat {chat_id}, retrying in {e.retry_after}s")
+            self._bucket(chat_id).block(float(e.retry_after))
+            for job in jobs:
+                heapq.heappush(self._queues.setdefault(chat_id, []), job)
+            self.queued += len(jobs)
+        except Exception as e:
+            self.failed += 1
+            metrics.BOT_REPLY_SECONDS.labels('error').observe(time.perf_counter() - start)
+            logger.error(f"Could not send reply to chat {chat_id}: {e}")
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(e)
+                    # Nobody may be awaiting an auto-translation reply
+                    job.future.exception()
+        finally:
+            self._in_flight.discard(chat_id)
+            self._wake.set()
+
+    def stats(self):
+        """Queue depth and send counters"""
+        return {
+            'queued': self.queued,
+            'chats_waiting': len(self._queues),
+            'in_flight': len(self._in_flight),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'retry_after': self.retry_after,
+            'dropped': self.dropped,
+            'failed': self.failed
+        }
+
+
+_scheduler = None
+
+
+def get_reply_scheduler():
+    """The process-wide scheduler; the flood limits apply to the bot token, not to each bot"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ReplyScheduler()
+    return _scheduler
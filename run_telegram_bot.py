@@ -6,6 +6,10 @@ Telegram Bot Runner - Ensures correct Python interpreter
 import sys
 import os
 import subprocess
+from importlib.util import find_spec
+
+# Modules the bot needs; checked without importing them (the bot itself does not need flask)
+REQUIRED_MODULES = ['telegram', 'requests', 'deep_translator', 'langdetect', 'bs4']
 
 def check_python_version():
     """Check if Python version is compatible"""
@@ -19,16 +23,13 @@ def check_python_version():
 
 def check_dependencies():
     """Check if required packages are installed"""
-    try:
-        import telegram
-        import flask
-        from translator import LanguageTranslator
-        print("✅ All required packages are installed")
-        return True
-    except ImportError as e:
-        print(f"❌ Missing package: {e}")
+    missing = [name for name in REQUIRED_MODULES if find_spec(name) is None]
+    if missing:
+        print(f"❌ Missing package: {', '.join(missing)}")
         print("Please run: pip install -r requirements.txt")
         return False
+    print("✅ All required packages are installed")
+    return True
 
 def main():
     """Main function to run the Telegram bot"""
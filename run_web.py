@@ -3,42 +3,60 @@
 Web application launcher for the Language Agnostic Translator
 """
 
+import argparse
 import os
 import sys
+from importlib.util import find_spec
 from dotenv import load_dotenv
 
+# Modules the web app needs; checked without importing them, which would double the startup time
+REQUIRED_MODULES = ['flask', 'flask_cors', 'requests', 'deep_translator', 'langdetect', 'bs4']
+
 def check_environment():
     """Check if environment is properly set up"""
     load_dotenv()
     
     # Check if required packages are installed
-    try:
-        import flask
-        import flask_cors
-        from translator import LanguageTranslator
-        print("✅ All required packages are installed")
-        return True
-    except ImportError as e:
-        print(f"❌ Missing package: {e}")
+    missing = [name for name in REQUIRED_MODULES if find_spec(name) is None]
+    if missing:
+        print(f"❌ Missing package: {', '.join(missing)}")
         print("Please run: pip install -r requirements.txt")
         return False
+    print("✅ All required packages are installed")
+    return True
+
+def run_production():
+    """Run the app under gunicorn with the settings in gunicorn.conf.py"""
+    try:
+        from gunicorn.app.wsgiapp import WSGIApplication
+    except ImportError as e:
+        # gunicorn needs a Unix-like OS; on Windows use the development server
+        print(f"❌ Production server unavailable: {e}")
+        sys.exit(1)
+    
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+    print(f"🚀 Starting production server (gunicorn, {config_path})")
+    sys.argv = ['gunicorn', '-c', config_path]
+    WSGIApplication("%(prog)s [OPTIONS] [APP_MODULE]").run()
 
 def main():
     """Main function to run the web application"""
+    parser = argparse.ArgumentParser(description="Language Agnostic Translator web application")
+    parser.add_argument('--production', action='store_true',
+                        help="run the multi-worker gunicorn server instead of Flask's development server")
+    args = parser.parse_args()
+    
     print("🌍 Language Agnostic Translator - Web Application")
     print("=" * 50)
     
     if not check_environment():
         sys.exit(1)
     
-    # Test translator
-    try:
-        from translator import LanguageTranslator
-        translator = LanguageTranslator()
-        print("✅ Translator initialized successfully")
-    except Exception as e:
-        print(f"❌ Translator error: {e}")
-        sys.exit(1)
+    from config import WEB_SERVER
+    if args.production or WEB_SERVER == 'production':
+        # The translator is created once in the gunicorn master, before the workers fork
+        run_production()
+        return
     
     # Get configuration
     port = int(os.environ.get('PORT', 5000))
@@ -51,6 +69,11 @@ def main():
     
     try:
         from web_app import app
+        from profiler import install_signal_handler
+        from translator import warm_up_in_background
+        install_signal_handler()
+        # The translator is built while the server starts; the first request waits for it if needed
+        warm_up_in_background()
         app.run(host='0.0.0.0', port=port, debug=debug)
     except KeyboardInterrupt:
         print("\n👋 Web application stopped by user")
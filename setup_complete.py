@@ -110,7 +110,7 @@ def test_components():
     try:
         from translator import LanguageTranslator
         translator = LanguageTranslator()
-        result, msg = translator.translate_text("Hello world", "es")
+        result = translator.translate_text("Hello world", "es")
         print("✅ Translator working")
     except Exception as e:
         print(f"❌ Translator error: {e}")
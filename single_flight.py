@@ -0,0 +1,98 @@
+"""
+Request coalescing for identical concurrent translations
+While a call for a key is in flight, later callers with the same key wait for
+that call's result instead of starting their own upstream request.
+"""
+
+import asyncio
+import threading
+import weakref
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces calls from threads (the Flask request threads and the worker pools)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.joined = 0
+
+    def do(self, key, fn, *args):
+        """
+        Run fn(*args) unless a call for key is already in flight, in which case wait for it
+        Returns (value, joined); joined is True when the value came from another caller's call.
+        An exception raised by the shared call is raised in every waiting caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.joined += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn(*args)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def stats(self):
+        """Return how many calls went upstream and how many joined one in flight"""
+        with self._lock:
+            return {'in_flight': len(self._calls), 'leaders': self.leaders, 'joined': self.joined}
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces coroutine calls on an event loop (the bots and the ASGI app)
+    The shared call runs as its own task, so a caller that times out or is cancelled
+    does not cancel the call for the others still waiting on it
+    """
+
+    def __init__(self):
+        # In-flight tasks per event loop; a task can only be awaited on its own loop
+        self._tasks = weakref.WeakKeyDictionary()
+        self.leaders = 0
+        self.joined = 0
+
+    async def do(self, key, fn, *args):
+        """Async twin of SingleFlight.do; fn(*args) must return an awaitable"""
+        tasks = self._tasks.setdefault(asyncio.get_running_loop(), {})
+        task = tasks.get(key)
+        joined = task is not None
+        if joined:
+            self.joined += 1
+        else:
+            self.leaders += 1
+            task = tasks[key] = asyncio.ensure_future(fn(*args))
+            task.add_done_callback(lambda done: tasks.pop(key) if tasks.get(key) is done else None)
+        return await asyncio.shield(task), joined
+
+    def stats(self):
+        """Return how many calls went upstream and how many joined one in flight"""
+        return {
+            'in_flight': sum(len(tasks) for tasks in self._tasks.values()),
+            'leaders': self.leaders,
+            'joined': self.joined
+        }
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Startup-time report for the entry points
+Starts a fresh interpreter per run and measures how long importing each entry
+module takes, how long until the shared translator is ready, and the wall time of
+the whole process. Also lists the packages that cost the most import time, from
+python -X importtime, so regressions in the import graph are easy to spot.
+
+    python startup.py
+    python startup.py --targets web_app,telegram_bot --repeats 10 --top 15
+    python startup.py --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+TARGETS = ['web_app', 'asgi_app', 'telegram_bot', 'channel_bot']
+
+# Runs in the child: import the target, then build the shared translator
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+imported = time.perf_counter()
+from translator import get_translator
+get_translator()
+ready = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'ready_ms': (ready - start) * 1000}))
+"""
+
+
+def _package_import_times(stderr):
+    """Microseconds of import self time per top-level package, from -X importtime output"""
+    packages = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        if self_us.strip().isdigit():
+            packages[name.strip().split('.')[0]] += int(self_us)
+    return packages
+
+
+def measure(target, importtime=False):
+    """Run the probe for target once in a new process; returns (timings dict, package import times)"""
+    env = dict(os.environ)
+    # Keep the bots away from the preference database and the web app out of webhook mode
+    env.setdefault('PREFERENCE_DB', '')
+    env['BOT_MODE'] = 'polling'
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', _PROBE, target]
+    start = time.perf_counter()
+    completed = subprocess.run(
+        command, capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    process_ms = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {target} failed:\n{completed.stderr.strip()}")
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    timings['process_ms'] = process_ms
+    return timings, _package_import_times(completed.stderr) if importtime else Counter()
+
+
+def report(target, repeats, top):
+    """Median timings of repeats runs, plus the slowest packages of one -X importtime run"""
+    runs = [measure(target)[0] for _ in range(repeats)]
+    _, packages = measure(target, importtime=True)
+    row = {'target': target, 'repeats': repeats}
+    for key in ('import_ms', 'ready_ms', 'process_ms'):
+        row[key] = round(statistics.median(run[key] for run in runs), 1)
+    row['slowest_packages'] = [
+        {'package': package, 'ms': round(us / 1000, 1)} for package, us in packages.most_common(top)
+    ]
+    return row
+
+
+def interpreter_ms(repeats):
+    """Median wall time of an interpreter that imports nothing, the floor for every target"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(times), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start times of the web app and bots")
+    parser.add_argument('--targets', default=','.join(TARGETS), help=f"comma-separated modules, default {','.join(TARGETS)}")
+    parser.add_argument('--repeats', type=int, default=5, help="fresh processes per target; the median is reported")
+    parser.add_argument('--top', type=int, default=8, help="slowest packages to list per target")
+    parser.add_argument('--output', help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    targets = [name.strip() for name in args.targets.split(',') if name.strip()]
+    baseline = interpreter_ms(args.repeats)
+    print(f"Bare interpreter: {baseline:.1f} ms\n")
+    print(f"{'target':<14} {'import ms':>10} {'ready ms':>10} {'process ms':>11}   slowest packages (ms)")
+    rows = []
+    for target in targets:
+        row = report(target, args.repeats, args.top)
+        rows.append(row)
+        slowest = ', '.join(f"{item['package']} {item['ms']:g}" for item in row['slowest_packages'])
+        print(f"{target:<14} {row['import_ms']:>10.1f} {row['ready_ms']:>10.1f} {row['process_ms']:>11.1f}   {slowest}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': sys.version.split()[0],
+                'interpreter_ms': baseline,
+                'results': rows
+            }, f, indent=2)
+        print(f"\nReport written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,8 +3,13 @@ import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
 from telegram.constants import ParseMode
-from translator import LanguageTranslator
-from config import TELEGRAM_BOT_TOKEN, SUPPORTED_LANGUAGES, COMMANDS
+from translator import get_translator_async, warm_up_in_background
+from preference_store import create_preference_store
+from reply_scheduler import get_reply_scheduler
+from webhook import application_builder
+from metrics import instrument_handler, start_metrics_server
+from profiler import register_handlers, install_signal_handler
+from config import TELEGRAM_BOT_TOKEN, SUPPORTED_LANGUAGES, COMMANDS, BOT_MODE, METRICS_PORT
 
 # Set up logging
 logging.basicConfig(
@@ -13,10 +18,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# The only update type the handlers below use; Telegram sends nothing else
+ALLOWED_UPDATES = [Update.MESSAGE]
+
 class TelegramTranslationBot:
-    def __init__(self):
-        self.translator = LanguageTranslator()
-        self.user_preferences = {}  # Store user language preferences
+    def __init__(self, translator=None):
+        self._translator = translator  # None: the shared translator, built on first use
+        self.user_preferences = create_preference_store('user')  # Store user language preferences
+        self.replies = get_reply_scheduler()  # Rate-limited outbound replies
+        
+    async def get_translator(self):
+        """The translator; until the shared one is built, handlers wait for it off the event loop"""
+        return self._translator or await get_translator_async()
         
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
@@ -31,7 +44,7 @@ I can help you:
 
 Use /help to see all available commands.
         """
-        await update.message.reply_text(welcome_message)
+        await self.replies.reply(update.message, welcome_message)
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /help command"""
@@ -45,7 +58,7 @@ Use /help to see all available commands.
         help_text += "• Use /detect to identify the language of text\n"
         help_text += "• Use /languages to see all supported languages"
         
-        await update.message.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
+        await self.replies.reply(update.message, help_text, parse_mode=ParseMode.MARKDOWN)
     
     async def languages_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /languages command"""
@@ -55,12 +68,12 @@ Use /help to see all available commands.
         
         languages_text += "\nUse /set_lang <code> to set your preferred language."
         
-        await update.message.reply_text(languages_text, parse_mode=ParseMode.MARKDOWN)
+        await self.replies.reply(update.message, languages_text, parse_mode=ParseMode.MARKDOWN)
     
     async def set_lang_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /set_lang command"""
         if not context.args:
-            await update.message.reply_text(
+            await self.replies.reply(update.message,
                 "Please specify a language code. Use /languages to see available options.\n"
                 "Example: /set_lang es"
             )
@@ -69,43 +82,44 @@ Use /help to see all available commands.
         lang_code = context.args[0].lower()
         user_id = update.effective_user.id
         
-        if self.translator.is_language_supported(lang_code):
+        if lang_code in SUPPORTED_LANGUAGES:
             self.user_preferences[user_id] = lang_code
             lang_name = SUPPORTED_LANGUAGES[lang_code]
-            await update.message.reply_text(
+            await self.replies.reply(update.message,
                 f"✅ Your preferred language has been set to {lang_name} ({lang_code.upper()})"
             )
         else:
-            await update.message.reply_text(
+            await self.replies.reply(update.message,
                 f"❌ Language code '{lang_code}' is not supported. Use /languages to see available options."
             )
     
     async def detect_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /detect command"""
         if not context.args:
-            await update.message.reply_text(
+            await self.replies.reply(update.message,
                 "Please provide text to detect the language.\n"
                 "Example: /detect Hello, how are you?"
             )
             return
         
         text = " ".join(context.args)
-        lang_code, lang_name = self.translator.detect_language(text)
+        translator = await self.get_translator()
+        lang_code, lang_name = await translator.detect_language_async(text)
         
         if lang_code:
-            await update.message.reply_text(
+            await self.replies.reply(update.message,
                 f"🔍 *Language Detection Result:*\n\n"
                 f"Text: `{text}`\n"
                 f"Detected Language: {lang_name} ({lang_code.upper()})",
                 parse_mode=ParseMode.MARKDOWN
             )
         else:
-            await update.message.reply_text(f"❌ {lang_name}")
+            await self.replies.reply(update.message, f"❌ {lang_name}")
     
     async def translate_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /translate command"""
         if len(context.args) < 2:
-            await update.message.reply_text(
+            await self.replies.reply(update.message,
                 "Please provide text and target language.\n"
                 "Example: /translate Hello, how are you? es"
             )
@@ -114,24 +128,25 @@ Use /help to see all available commands.
         target_lang = context.args[-1].lower()
         text = " ".join(context.args[:-1])
         
-        if not self.translator.is_language_supported(target_lang):
-            await update.message.reply_text(
+        if target_lang not in SUPPORTED_LANGUAGES:
+            await self.replies.reply(update.message,
                 f"❌ Language code '{target_lang}' is not supported. Use /languages to see available options."
             )
             return
         
-        translated_text, message = self.translator.translate_text(text, target_lang)
+        translator = await self.get_translator()
+        result = await translator.translate_text_async(text, target_lang)
         
-        if translated_text:
-            await update.message.reply_text(
+        if result.success:
+            await self.replies.reply(update.message,
                 f"🔄 *Translation Result:*\n\n"
                 f"Original: `{text}`\n\n"
-                f"Translated: `{translated_text}`\n\n"
-                f"_{message}_",
+                f"Translated: `{result.translated_text}`\n\n"
+                f"_{result.message}_",
                 parse_mode=ParseMode.MARKDOWN
             )
         else:
-            await update.message.reply_text(f"❌ {message}")
+            await self.replies.reply(update.message, f"❌ {result.message}")
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle regular text messages"""
@@ -142,29 +157,56 @@ Use /help to see all available commands.
         target_lang = self.user_preferences.get(user_id, 'en')
         
         # Translate the message
-        translated_text, message = self.translator.translate_text(text, target_lang)
+        translator = await self.get_translator()
+        result = await translator.translate_text_async(text, target_lang)
         
-        if translated_text:
-            # Detect source language
-            source_lang, source_name = self.translator.detect_language(text)
-            
+        if result.success:
             response = f"🔄 *Translation:*\n\n"
-            response += f"Original ({source_name}): `{text}`\n\n"
-            response += f"Translated: `{translated_text}`\n\n"
-            response += f"_{message}_"
+            response += f"Original ({result.source_name}): `{text}`\n\n"
+            response += f"Translated: `{result.translated_text}`\n\n"
+            response += f"_{result.message}_"
             
-            await update.message.reply_text(response, parse_mode=ParseMode.MARKDOWN)
+            await self.replies.reply(update.message, response, parse_mode=ParseMode.MARKDOWN)
         else:
-            await update.message.reply_text(f"❌ {message}")
+            await self.replies.reply(update.message, f"❌ {result.message}")
     
     async def error_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle errors"""
         logger.error(f"Update {update} caused error {context.error}")
         if update and update.effective_message:
-            await update.effective_message.reply_text(
+            await self.replies.reply(update.effective_message,
                 "❌ An error occurred while processing your request. Please try again."
             )
 
+def build_application(application=None, translator=None):
+    """Add the bot's handlers to application (a new one by default) and return it"""
+    bot = TelegramTranslationBot(translator)
+    if application is None:
+        application = application_builder().build()
+    
+    # Add command handlers
+    application.add_handler(CommandHandler("start", instrument_handler('private', 'start', bot.start_command)))
+    application.add_handler(CommandHandler("help", instrument_handler('private', 'help', bot.help_command)))
+    application.add_handler(CommandHandler("languages", instrument_handler('private', 'languages', bot.languages_command)))
+    application.add_handler(CommandHandler("set_lang", instrument_handler('private', 'set_lang', bot.set_lang_command)))
+    application.add_handler(CommandHandler("detect", instrument_handler('private', 'detect', bot.detect_command)))
+    application.add_handler(CommandHandler("translate", instrument_handler('private', 'translate', bot.translate_command)))
+    
+    # Add message handler for regular text
+    application.add_handler(MessageHandler(
+        filters.TEXT & ~filters.COMMAND, instrument_handler('private', 'message', bot.handle_message)
+    ))
+    
+    # Add error handler
+    application.add_error_handler(bot.error_handler)
+    
+    # Tag the handlers in profiles
+    register_handlers([
+        bot.start_command, bot.help_command, bot.languages_command, bot.set_lang_command,
+        bot.detect_command, bot.translate_command, bot.handle_message
+    ], 'private bot')
+    return application
+
 def main():
     """Main function to run the bot"""
     if not TELEGRAM_BOT_TOKEN:
@@ -172,32 +214,30 @@ def main():
         print("Please set your TELEGRAM_BOT_TOKEN in the .env file")
         return
     
-    # Create bot instance
-    bot = TelegramTranslationBot()
+    if BOT_MODE == 'webhook':
+        print("BOT_MODE is webhook: updates are delivered to the web app (python run_web.py).")
+        print("Register the webhook once with: python webhook.py set")
+        return
     
-    # Create application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    # Create application with the bot's handlers
+    application = build_application()
     
-    # Add command handlers
-    application.add_handler(CommandHandler("start", bot.start_command))
-    application.add_handler(CommandHandler("help", bot.help_command))
-    application.add_handler(CommandHandler("languages", bot.languages_command))
-    application.add_handler(CommandHandler("set_lang", bot.set_lang_command))
-    application.add_handler(CommandHandler("detect", bot.detect_command))
-    application.add_handler(CommandHandler("translate", bot.translate_command))
+    # Serve /metrics for Prometheus; in webhook mode the web app serves them
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
     
-    # Add message handler for regular text
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_message))
+    # Profile the running bot with PROFILE_SIGNAL (kill -USR2 <pid>)
+    install_signal_handler()
     
-    # Add error handler
-    application.add_error_handler(bot.error_handler)
+    # Build the translator while the bot connects to Telegram
+    warm_up_in_background()
     
     # Start the bot
     logger.info("Starting the Language Agnostic Translator Bot...")
     print("Bot is starting... Press Ctrl+C to stop.")
     
     try:
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
         print("Bot stopped.")
@@ -32,15 +32,760 @@ def test_translator():
         print(f"✅ Language detection: {lang} - {name}")
         
         # Test translation
-        result, msg = translator.translate_text("Hello world", "es")
-        print(f"✅ Translation: {result}")
-        print(f"✅ Message: {msg}")
+        result = translator.translate_text("Hello world", "es")
+        print(f"✅ Translation: {result.translated_text}")
+        print(f"✅ Message: {result.message}")
         
         return True
     except Exception as e:
         print(f"❌ Translator error: {e}")
         return False
 
+def test_circuit_breaker():
+    """Test that a failing backend is skipped once its circuit opens"""
+    print("\n🔄 Testing circuit breaker...")
+    try:
+        import time
+        from backend_strategy import BackendStrategy
+        from circuit_breaker import CircuitBreaker, OPEN, CLOSED
+        from translation_backends import TranslationBackend
+        
+        class FakeBackend(TranslationBackend):
+            def __init__(self, name, fail):
+                self.name = name
+                self.fail = fail
+                self.calls = 0
+            
+            def translate(self, text, source_lang, target_lang):
+                self.calls += 1
+                if self.fail:
+                    raise RuntimeError("rate limited")
+                return f"{self.name}: {text}"
+        
+        now = [0.0]
+        broken = FakeBackend("broken", fail=True)
+        healthy = FakeBackend("healthy", fail=False)
+        strategy = BackendStrategy([broken, healthy], mode='sequential')
+        strategy.breakers['broken'] = CircuitBreaker('broken', min_calls=3, cooldown=10, clock=lambda: now[0])
+        
+        for _ in range(5):
+            result, backend = strategy.translate("Hello", "en", "es")
+            if backend != "healthy":
+                print(f"❌ Expected fallback to healthy backend, got {backend}")
+                return False
+        
+        if broken.calls != 3 or strategy.breakers['broken'].state != OPEN:
+            print(f"❌ Circuit did not open (calls={broken.calls})")
+            return False
+        print("✅ Circuit opened and the broken backend was skipped")
+        
+        # After the cooldown a successful probe closes the circuit
+        now[0] = 11
+        broken.fail = False
+        result, backend = strategy.translate("Hello", "en", "es")
+        if backend != "broken" or strategy.breakers['broken'].state != CLOSED:
+            print("❌ Circuit did not close after a successful probe")
+            return False
+        print("✅ Circuit closed after a successful probe")
+        
+        # A hedge whose backend is skipped because its circuit is open was never fired
+        class SlowBackend(FakeBackend):
+            def translate(self, text, source_lang, target_lang):
+                time.sleep(0.05)
+                return super().translate(text, source_lang, target_lang)
+        
+        strategy = BackendStrategy([SlowBackend("slow", fail=False), broken], mode='hedged', hedge_delay=0.01)
+        strategy.breakers['broken'] = CircuitBreaker('broken', cooldown=10, clock=lambda: 0.0)
+        strategy.breakers['broken']._open(0.0)
+        result, backend = strategy.translate("Hello", "en", "es")
+        if backend != "slow" or strategy.hedges_fired != 0:
+            print(f"❌ Counted {strategy.hedges_fired} hedges although the hedge backend was skipped")
+            return False
+        print("✅ Skipped hedge backends are not counted as fired hedges")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Circuit breaker error: {e}")
+        return False
+
+def test_single_flight():
+    """Test that identical concurrent calls share one upstream call"""
+    print("\n🔄 Testing request coalescing...")
+    try:
+        import threading
+        import time
+        from single_flight import SingleFlight
+        
+        flight = SingleFlight()
+        calls = []
+        
+        def slow_translate(text):
+            calls.append(text)
+            time.sleep(0.2)
+            return text.upper()
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do("key", slow_translate, "hello")))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        if len(calls) != 1 or {value for value, _ in results} != {"HELLO"}:
+            print(f"❌ Expected one shared call, got {len(calls)}")
+            return False
+        print(f"✅ 10 concurrent calls shared 1 upstream call ({flight.stats()['joined']} joined)")
+        return True
+    except Exception as e:
+        print(f"❌ Request coalescing error: {e}")
+        return False
+
+def test_translation_memory():
+    """Test that near-duplicate texts reuse a stored translation"""
+    print("\n🔄 Testing translation memory...")
+    try:
+        from translation_memory import TranslationMemory
+        
+        memory = TranslationMemory(max_entries=100, threshold=0.8)
+        memory.add("Order 25 ships to @bob today 🎉", "Die Bestellung 25 wird heute an @bob versandt 🎉", 'en', 'de', 'google')
+        memory.add("John joined the group today, say hello!", "John a rejoint le groupe aujourd'hui, dites bonjour !", 'en', 'fr', 'google')
+        
+        placeholders = memory.lookup("Order 35 ships to @carol today 🚀", 'en', 'de')
+        name = memory.lookup("Mary joined the group today, say hello!", 'en', 'fr')
+        different = memory.lookup("John left the group today, say hello!", 'en', 'fr')
+        
+        if not placeholders or placeholders[0] != "Die Bestellung 35 wird heute an @carol versandt 🚀":
+            print(f"❌ Placeholder-only difference not reused: {placeholders}")
+            return False
+        if not name or not name[0].startswith("Mary a rejoint"):
+            print(f"❌ Name-only difference not reused: {name}")
+            return False
+        if different is not None:
+            print(f"❌ Text with a different word was reused: {different}")
+            return False
+        print(f"✅ Translation memory reused 2 near-duplicates ({memory.stats()['fuzzy_hits']} fuzzy)")
+        return True
+    except Exception as e:
+        print(f"❌ Translation memory error: {e}")
+        return False
+
+def test_translation_cache():
+    """Test the cache tiers: LRU eviction, TTL expiry, the SQLite round-trip and failing tiers"""
+    print("\n🔄 Testing translation cache...")
+    try:
+        import sqlite3
+        import tempfile
+        import time
+        from translation_cache import MemoryCache, SQLiteCache, TranslationCache, make_cache_key
+        
+        lru = MemoryCache(max_entries=2, ttl=0)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')  # 'b' is now the least recently used
+        lru.set('c', 3)
+        if lru.get('b') is not None or lru.get('a') != 1 or lru.evictions != 1:
+            print("❌ LRU tier did not evict the least recently used entry")
+            return False
+        
+        expiring = MemoryCache(max_entries=10, ttl=0.05)
+        expiring.set('a', 1)
+        time.sleep(0.1)
+        if expiring.get('a') is not None or expiring.expirations != 1:
+            print("❌ Expired entry was still served")
+            return False
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.db')
+            value = {'translated_text': 'Hola', 'backend': 'google'}
+            key = make_cache_key(' Hello   world ', 'es')
+            SQLiteCache(path, ttl=0).set(key, value)
+            
+            # A new process would open the file again; its hits fill the memory tier
+            memory = MemoryCache(max_entries=10, ttl=0)
+            cache = TranslationCache([memory, SQLiteCache(path, ttl=0)])
+            if cache.get(make_cache_key('Hello world', 'es')) != value or memory.get(key) != value:
+                print("❌ SQLite tier did not round-trip the entry into the memory tier")
+                return False
+            
+            expired = SQLiteCache(path, ttl=0.05)
+            expired.set('old', value)
+            time.sleep(0.1)
+            if expired.get('old') is not None:
+                print("❌ SQLite tier served an expired entry")
+                return False
+            
+            # A locked or corrupt tier is treated as a miss, not an error
+            class BrokenTier:
+                name = 'broken'
+                
+                def get(self, *args):
+                    raise sqlite3.OperationalError("database is locked")
+                
+                set = get
+            
+            memory = MemoryCache(max_entries=10, ttl=0)
+            memory.set(key, value)
+            if TranslationCache([BrokenTier()]).get(key) is not None or TranslationCache([BrokenTier(), memory]).get(key) != value:
+                print("❌ A failing cache tier broke the lookup")
+                return False
+        
+        print("✅ LRU eviction, TTL expiry, SQLite round-trip and failing tiers work")
+        return True
+    except Exception as e:
+        print(f"❌ Translation cache error: {e}")
+        return False
+
+def test_breaker_probe_release():
+    """Test that a half-open probe is handed back when its raced call is cancelled before starting"""
+    print("\n🔄 Testing probe release for cancelled calls...")
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+        from backend_strategy import BackendStrategy
+        from circuit_breaker import CircuitBreaker, HALF_OPEN
+        from translation_backends import TranslationBackend
+        
+        class FakeBackend(TranslationBackend):
+            def __init__(self, name):
+                self.name = name
+                self.calls = 0
+            
+            def translate(self, text, source_lang, target_lang):
+                self.calls += 1
+                return f"{self.name}: {text}"
+        
+        now = [0.0]
+        fast = FakeBackend("fast")
+        probed = FakeBackend("probed")
+        # One worker, so the probed call is still queued when the fast one wins
+        strategy = BackendStrategy([fast, probed], mode='race', executor=ThreadPoolExecutor(max_workers=1))
+        breaker = CircuitBreaker('probed', min_calls=1, cooldown=10, clock=lambda: now[0])
+        strategy.breakers['probed'] = breaker
+        breaker.record(False, 0)
+        now[0] = 11
+        
+        result, backend = strategy.translate("Hello", "en", "es")
+        if backend != "fast" or probed.calls != 0:
+            print(f"❌ Expected the fast backend to win before the probe ran, got {backend}")
+            return False
+        if breaker.state != HALF_OPEN or not breaker.allow_request():
+            print("❌ The cancelled probe was never handed back")
+            return False
+        print("✅ Cancelled probe handed back, the next request may probe again")
+        
+        strategy.executor.shutdown()
+        return True
+    except Exception as e:
+        print(f"❌ Probe release error: {e}")
+        return False
+
+def test_segmentation():
+    """Test that long texts are split within each backend's own request limit"""
+    print("\n🔄 Testing text segmentation...")
+    try:
+        from text_segmentation import segment_text
+        from translator import LanguageTranslator
+        from backend_strategy import BackendStrategy
+        from translation_backends import GoogleBackend, MyMemoryBackend
+        
+        texts = [
+            "First sentence. Second one!  Third?\n\nNew paragraph here. " * 40,
+            "Привет, мир. Как дела? " * 60,
+            "x" * 1234 + " tail",
+            "短い文です。" * 200,
+        ]
+        for text in texts:
+            for n in (1, 7, 100, 500):
+                segments = segment_text(text, n)
+                if ''.join(segments) != text or max(len(segment) for segment in segments) > n:
+                    print(f"❌ segment_text broke a text at {n} characters")
+                    return False
+                segments = segment_text(text, max_bytes=n)
+                if ''.join(segments) != text or max(len(s.encode('utf-8')) for s in segments) > max(n, 3):
+                    print(f"❌ segment_text broke a text at {n} bytes")
+                    return False
+        print("✅ Segments join back into the text and stay within the limit")
+        
+        # Each backend gets segments sized for its own limit
+        translator = LanguageTranslator()
+        google, mymemory = GoogleBackend(), MyMemoryBackend()
+        translator.strategy = BackendStrategy([google, mymemory], mode='sequential')
+        if translator._segment_limits() != (5000, None):
+            print(f"❌ Google got {translator._segment_limits()} instead of its own limit")
+            return False
+        translator.strategy = BackendStrategy([mymemory], mode='sequential')
+        if translator._segment_limits() != (None, 500) or mymemory.within_limits("Привет " * 50):
+            print("❌ MyMemory's limit is not counted in bytes")
+            return False
+        print("✅ Segments follow the primary backend's limit, in bytes for MyMemory")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Segmentation error: {e}")
+        return False
+
+def test_async_stream():
+    """Test that the async stream yields the same events as the blocking one"""
+    print("\n🔄 Testing async translation stream...")
+    try:
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        import metrics
+        from translator import LanguageTranslator
+        from backend_strategy import BackendStrategy
+        from translation_backends import create_backend
+        from translation_cache import TranslationCache, MemoryCache
+        from translation_memory import TranslationMemory
+        
+        memories = []
+        
+        def make_translator():
+            memories.append(TranslationMemory(max_entries=100, threshold=0.8))
+            translator = LanguageTranslator(
+                cache=TranslationCache([MemoryCache()]), executor=ThreadPoolExecutor(max_workers=1), memory=memories[-1]
+            )
+            translator.strategy = BackendStrategy([create_backend('offline')], mode='sequential')
+            return translator
+        
+        async def collect(translator, text):
+            return [event async for event in translator.translate_stream_async(text, 'es', 'en')]
+        
+        text = "Hello there my friend. " * 40
+        recorded = []
+        record_translation = metrics.record_translation
+        metrics.record_translation = lambda result, seconds: recorded.append(result)
+        try:
+            expected = list(make_translator().translate_stream(text, 'es', 'en'))
+            events = asyncio.run(collect(make_translator(), text))
+        finally:
+            metrics.record_translation = record_translation
+        
+        def by_index(events):
+            return sorted((event['index'], event['text']) for event in events if event['type'] == 'segment')
+        
+        if events[0] != expected[0] or events[-1] != expected[-1] or by_index(events) != by_index(expected):
+            print("❌ Async stream events differ from the blocking stream")
+            return False
+        print(f"✅ Async stream yielded {len(events) - 2} segments matching the blocking stream")
+        
+        if len(recorded) != 2 or not all(result.backend == 'offline' for result in recorded):
+            print(f"❌ Streams were not counted in the translation metrics: {recorded}")
+            return False
+        if any(memory.lookup(text, 'en', 'es') is None for memory in memories):
+            print("❌ Streamed translations were not added to the translation memory")
+            return False
+        print("✅ Both streams were counted and stored in the translation memory")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Async stream error: {e}")
+        return False
+
+def test_preference_store():
+    """Test that bot preferences survive a restart and reach other bot processes"""
+    print("\n🔄 Testing preference persistence...")
+    try:
+        import gc
+        import os
+        import tempfile
+        import preference_store
+        from preference_store import SQLitePreferenceStore
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'preferences.db')
+            store = SQLitePreferenceStore('users', path=path, flush_interval=60, sync_interval=60)
+            other = SQLitePreferenceStore('users', path=path, flush_interval=60, sync_interval=60)
+            store[42] = 'es'
+            store[-100123] = ['fr', 'de']
+            store[7] = 'it'
+            del store[7]
+            store.flush()
+            
+            # Another process sees committed changes once it syncs
+            other.sync()
+            if other.get(42) != 'es' or other.get(-100123) != ['fr', 'de'] or 7 in other:
+                print(f"❌ Other store did not pick up the changes: {other.items()}")
+                return False
+            print("✅ Flushed preferences reached another store")
+            
+            # Unflushed changes are written on close and reloaded after a restart
+            store[43] = 'ja'
+            store.close()
+            other.close()
+            restarted = SQLitePreferenceStore('users', path=path, flush_interval=60, sync_interval=60)
+            channels = SQLitePreferenceStore('channels', path=path, flush_interval=60, sync_interval=60)
+            preferences = dict(restarted.items())
+            restarted.close()
+            channels.close()
+            if preferences != {42: 'es', -100123: ['fr', 'de'], 43: 'ja'} or len(channels):
+                print(f"❌ Preferences after restart: {preferences}")
+                return False
+            print("✅ Preferences survived a restart, with int ids and list values intact")
+            
+            # Closed stores are not kept alive by the exit hook
+            del store, other, restarted, channels
+            gc.collect()
+            if any(store.path == path for store in preference_store._STORES):
+                print("❌ Closed stores are still referenced")
+                return False
+            print("✅ Closed stores were released")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Preference store error: {e}")
+        return False
+
+def test_preference_store_fork():
+    """Test that a store built before a fork keeps saving in the forked worker"""
+    print("\n🔄 Testing preference store after fork...")
+    try:
+        import os
+        import tempfile
+        import time
+        from preference_store import SQLitePreferenceStore
+        
+        if not hasattr(os, 'fork'):
+            print("✅ Skipped, os.fork is not available")
+            return True
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'preferences.db')
+            store = SQLitePreferenceStore('users', path=path, flush_interval=0.02, sync_interval=60)
+            pid = os.fork()
+            if pid == 0:
+                # Worker: leave without atexit, so only the background thread can save the write
+                store[1] = 'es'
+                time.sleep(0.3)
+                os._exit(0)
+            os.waitpid(pid, 0)
+            store.sync()
+            saved = store.get(1)
+            store.close()
+            if saved != 'es':
+                print("❌ The forked worker's write was never saved")
+                return False
+            print("✅ The forked worker saved its write with its own connection and thread")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Preference store fork error: {e}")
+        return False
+
+def test_update_ordering():
+    """Test that updates run concurrently across chats but in arrival order within a chat"""
+    print("\n🔄 Testing per-chat update ordering...")
+    try:
+        import asyncio
+        from datetime import datetime
+        from telegram import Chat, Message, Update
+        from update_processor import ChatOrderedUpdateProcessor
+        
+        async def run():
+            processor = ChatOrderedUpdateProcessor(max_running=3, log_interval=0)
+            handled = {1: [], 2: [], 3: []}
+            running = [0, 0]  # now, most at once
+            
+            async def handle(chat_id, number):
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+                # Earlier updates take longer, so they would finish last if a chat were not serialised
+                await asyncio.sleep(0.002 * (6 - number))
+                handled[chat_id].append(number)
+                running[0] -= 1
+            
+            jobs = []
+            # A chat's updates arrive back to back, so they would fill every slot if not serialised
+            for chat_id in handled:
+                for number in range(6):
+                    chat = Chat(id=chat_id, type=Chat.PRIVATE)
+                    message = Message(message_id=number, date=datetime.now(), chat=chat, text=str(number))
+                    update = Update(update_id=number * 10 + chat_id, message=message)
+                    jobs.append(processor.process_update(update, handle(chat_id, number)))
+            await asyncio.gather(*jobs)
+            return processor, handled, running[1]
+        
+        processor, handled, most_running = asyncio.run(run())
+        if any(numbers != list(range(6)) for numbers in handled.values()):
+            print(f"❌ Updates within a chat ran out of order: {handled}")
+            return False
+        if most_running != 3 or processor.stats()['processed'] != 18 or processor.stats()['busy_chats']:
+            print(f"❌ Expected 3 chats at once and 18 processed, got {most_running} and {processor.stats()}")
+            return False
+        print("✅ Chats ran concurrently and each chat's updates kept their order")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Update ordering error: {e}")
+        return False
+
+def test_reply_scheduler():
+    """Test that replies are merged only per message and sent within the rate limits"""
+    print("\n🔄 Testing reply scheduler...")
+    try:
+        import asyncio
+        import time
+        from reply_scheduler import ReplyScheduler, AUTO
+        
+        class FakeMessage:
+            def __init__(self, chat_id, message_id):
+                self.chat_id = chat_id
+                self.message_id = message_id
+                self.replies = []
+            
+            async def reply_text(self, text, **kwargs):
+                self.replies.append((time.monotonic(), text))
+                return text
+        
+        async def coalescing():
+            scheduler = ReplyScheduler(global_rate=100, group_rate_per_minute=6000)
+            post_a, post_b = FakeMessage(-100, 1), FakeMessage(-100, 2)
+            futures = [scheduler.reply(post_a, text, priority=AUTO, coalesce=True) for text in ("a-es", "a-fr")]
+            futures += [scheduler.reply(post_b, text, priority=AUTO, coalesce=True) for text in ("b-es", "b-fr")]
+            await asyncio.gather(*futures)
+            return post_a, post_b, scheduler
+        
+        post_a, post_b, scheduler = asyncio.run(coalescing())
+        if [text for _, text in post_a.replies] != ["a-es\n\na-fr"] or [text for _, text in post_b.replies] != ["b-es\n\nb-fr"]:
+            print(f"❌ Replies merged across posts: {post_a.replies} / {post_b.replies}")
+            return False
+        print("✅ Replies were merged per post and sent to the right post")
+        
+        async def rate_limited():
+            scheduler = ReplyScheduler(global_rate=20, private_rate=20)
+            chat = FakeMessage(1, 1)
+            others = [FakeMessage(chat_id, 1) for chat_id in range(2, 32)]
+            start = time.monotonic()
+            await asyncio.gather(*[scheduler.reply(chat, str(n)) for n in range(4)])
+            chat_seconds = time.monotonic() - start
+            start = time.monotonic()
+            await asyncio.gather(*[scheduler.reply(message, "hi") for message in others])
+            return chat_seconds, time.monotonic() - start
+        
+        chat_seconds, global_seconds = asyncio.run(rate_limited())
+        # 4 replies to one chat at 20/s need 3 refills; a burst of 20 plus 10 more at 20/s takes about 0.5s
+        if chat_seconds < 0.14 or global_seconds < 0.4:
+            print(f"❌ Replies were sent too fast: {chat_seconds:.3f}s per chat, {global_seconds:.3f}s overall")
+            return False
+        split = ReplyScheduler(global_rate=30)
+        split.split_between(3)
+        if split.global_bucket.rate != 10:
+            print(f"❌ Three workers should each send at 10/s, got {split.global_bucket.rate}")
+            return False
+        print(f"✅ Rate limits held ({chat_seconds:.2f}s for 4 replies to a chat, {global_seconds:.2f}s for 30 chats)")
+        
+        # Per-chat buckets stay bounded, but a busy chat keeps its bucket
+        bounded = ReplyScheduler(max_chats=10)
+        bounded._in_flight.add(1)
+        for chat_id in range(1, 1001):
+            bounded._bucket(chat_id)
+        if len(bounded._buckets) > 10 or 1 not in bounded._buckets:
+            print(f"❌ {len(bounded._buckets)} chat buckets tracked with a limit of 10")
+            return False
+        print("✅ Idle chat buckets were evicted and the busy chat was kept")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Reply scheduler error: {e}")
+        return False
+
+def test_fan_out_cache():
+    """Test that fan-out translations share cache entries with auto-detected translate_text calls"""
+    print("\n🔄 Testing fan-out cache keys...")
+    try:
+        import asyncio
+        from translator import LanguageTranslator
+        from backend_strategy import BackendStrategy
+        from translation_backends import create_backend
+        from translation_cache import TranslationCache, MemoryCache
+        
+        translator = LanguageTranslator(cache=TranslationCache([MemoryCache()]))
+        translator.strategy = BackendStrategy([create_backend('offline')], mode='sequential')
+        detections = []
+        detect = translator._detect
+        translator._detect = lambda text: detections.append(text) or detect(text)
+        
+        text = "The weather is lovely today and we are going to the beach"
+        translator.translate_text(text, 'es')
+        first = asyncio.run(translator.translate_many_async(text, ['es', 'fr']))
+        second = asyncio.run(translator.translate_many_async(text, ['es', 'fr']))
+        if not first['es'].cached or first['fr'].cached or len(detections) != 2:
+            print(f"❌ The fan-out missed translate_text's cache entry ({len(detections)} detections)")
+            return False
+        if not all(result.cached and result.source_lang == 'en' for result in second.values()) or len(detections) != 2:
+            print(f"❌ A repeated fan-out was not served from the cache ({len(detections)} detections)")
+            return False
+        print("✅ Fan-out reused auto-detected cache entries and cached its own under the same key")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Fan-out cache error: {e}")
+        return False
+
+def test_metric_labels():
+    """Test that client-supplied languages and methods cannot create new metric series"""
+    print("\n🔄 Testing metric label values...")
+    try:
+        import metrics
+        from translator import TranslationResult
+        
+        if not metrics.METRICS_ENABLED:
+            print("✅ Skipped, metrics are disabled")
+            return True
+        before = len(metrics.TRANSLATIONS._children)
+        for number in range(50):
+            result = TranslationResult(None, "unsupported", f"zz{number}", f"yy{number}")
+            metrics.record_translation(result, 0.01)
+        metrics.record_translation(TranslationResult("hola", "", "en", "es", backend="offline"), 0.01)
+        labels = set(metrics.TRANSLATIONS._children)
+        if len(labels) - before > 2 or ('other', 'other', 'failed') not in labels or ('en', 'es', 'translated') not in labels:
+            print(f"❌ Unexpected translation series: {sorted(labels)}")
+            return False
+        if metrics.method_label('BREW') != 'other' or metrics.method_label('POST') != 'POST':
+            print("❌ Unknown HTTP methods are not mapped to 'other'")
+            return False
+        print("✅ Unsupported languages and methods share the 'other' series")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Metric labels error: {e}")
+        return False
+
+def test_translation_memory_names():
+    """Test that names are only swapped into stored translations when a threshold is set"""
+    print("\n🔄 Testing translation memory name swapping...")
+    try:
+        from translation_memory import TranslationMemory
+        
+        # The default reuses exact templates only: a different name is a miss
+        memory = TranslationMemory(max_entries=100)
+        memory.add("John is ready for the trip", "John est prêt pour le voyage", 'en', 'fr', 'google')
+        if memory.lookup("Mary is ready for the trip", 'en', 'fr') is not None:
+            print("❌ The default memory swapped a name")
+            return False
+        print("✅ By default a different name goes to the backend")
+        
+        # The trade-off of a threshold: the name is swapped but the agreement is not
+        memory = TranslationMemory(max_entries=100, threshold=0.8)
+        memory.add("John is ready for the trip", "John est prêt pour le voyage", 'en', 'fr', 'google')
+        swapped = memory.lookup("Mary is ready for the trip", 'en', 'fr')
+        if not swapped or swapped[0] != "Mary est prêt pour le voyage":
+            print(f"❌ Name swapping with a threshold changed: {swapped}")
+            return False
+        print("✅ With a threshold the name is swapped, keeping the old agreement (prêt, not prête)")
+        return True
+    except Exception as e:
+        print(f"❌ Translation memory name error: {e}")
+        return False
+
+def test_batch_cache():
+    """Test that batch translations share cache entries with auto-detected translate_text calls"""
+    print("\n📦 Testing batch cache keys...")
+    try:
+        import asyncio
+        from translator import LanguageTranslator
+        from backend_strategy import BackendStrategy
+        from translation_backends import create_backend
+        from translation_cache import TranslationCache, MemoryCache
+        
+        translator = LanguageTranslator(cache=TranslationCache([MemoryCache()]))
+        translator.strategy = BackendStrategy([create_backend('offline')], mode='sequential')
+        
+        text = "The weather is lovely today and we are going to the beach"
+        other = "Good morning, how are you doing this fine day?"
+        translator.translate_text(text, 'es')
+        results = translator.translate_batch([text, other, text], 'es')
+        if not results[0].cached or results[1].cached or results[0] is not results[2]:
+            print("❌ The batch missed translate_text's cache entry or translated a duplicate twice")
+            return False
+        if not translator.translate_text(other, 'es').cached:
+            print("❌ translate_text missed the batch's cache entry")
+            return False
+        results = asyncio.run(translator.translate_batch_async([other, text], 'es'))
+        if not all(result.cached for result in results):
+            print("❌ The async batch missed the shared cache entries")
+            return False
+        print("✅ Batches reused auto-detected cache entries and cached their own under the same key")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Batch cache error: {e}")
+        return False
+
+def test_detection_consistency():
+    """Test that single and batch detection agree and shared scripts are not decided by script alone"""
+    print("\n🔍 Testing detection consistency...")
+    try:
+        from language_detection import LanguageDetector
+        
+        texts = ["Olá, tudo bem?", "God morgon, hur mår du?", "ok", "Добрий день, як справи?", "سلام دنیا"]
+        single = [LanguageDetector(cache_size=0).detect(text) for text in texts]
+        batch = LanguageDetector(cache_size=0).detect_batch(texts)
+        if [lang for lang, _ in single] != [lang for lang, _ in batch]:
+            print(f"❌ Single and batch detection disagree: {single} vs {batch}")
+            return False
+        print("✅ Single and batch detection agree")
+        
+        (uk, uk_confidence), (fa, fa_confidence) = single[3:]
+        if (uk, fa) != ('uk', 'fa') or uk_confidence == 1.0 or fa_confidence == 1.0:
+            print(f"❌ Shared scripts were decided by script alone: {single[3:]}")
+            return False
+        if LanguageDetector(cache_size=0).detect("안녕하세요") != ('ko', 1.0):
+            print("❌ Hangul text missed the script fast path")
+            return False
+        print("✅ Shared scripts are scored among their languages, single-language scripts decide alone")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Detection consistency error: {e}")
+        return False
+
+def test_asgi_stream_errors():
+    """Test that a failure mid-stream ends the NDJSON body instead of starting a second response"""
+    print("\n🌊 Testing ASGI stream errors...")
+    try:
+        import asyncio
+        import json
+        import translator
+        from asgi_app import app
+        
+        class FailingTranslator:
+            async def translate_stream_async(self, text, target_lang=None, source_lang=None):
+                yield {'type': 'start'}
+                raise RuntimeError("backend exploded")
+        
+        async def request():
+            sent = []
+            
+            async def receive():
+                return {'type': 'http.request', 'body': json.dumps({'text': 'Hello'}).encode()}
+            
+            async def send(message):
+                sent.append(message)
+            
+            await app({'type': 'http', 'method': 'POST', 'path': '/api/translate/stream'}, receive, send)
+            return sent
+        
+        previous = translator._shared
+        translator.set_translator(FailingTranslator())
+        try:
+            sent = asyncio.run(request())
+        finally:
+            translator.set_translator(previous)
+        
+        starts = [message for message in sent if message['type'] == 'http.response.start']
+        events = [json.loads(line) for message in sent[1:] for line in message.get('body', b'').splitlines()]
+        if len(starts) != 1 or sent[-1].get('more_body') or events[-1]['type'] != 'error':
+            print(f"❌ Unexpected stream messages: {sent}")
+            return False
+        print("✅ A mid-stream failure was sent as an error event in the same response")
+        
+        return True
+    except Exception as e:
+        print(f"❌ ASGI stream error: {e}")
+        return False
+
 def test_config():
     """Test configuration"""
     print("\n🔄 Testing configuration...")
@@ -68,6 +813,7 @@ def test_bot_creation():
     """Test bot creation without starting"""
     print("\n🔄 Testing bot creation...")
     try:
+        import asyncio
         from telegram_bot import TelegramTranslationBot
         from channel_bot import ChannelTranslationBot
         
@@ -79,6 +825,20 @@ def test_bot_creation():
         channel_bot = ChannelTranslationBot()
         print("✅ Channel bot created successfully")
         
+        # set_channel_language replaces the targets, add_channel_language appends
+        async def channel_languages():
+            await channel_bot.set_channel_languages(-100, ['es', 'fr'])
+            await channel_bot.set_channel_language(-100, 'de')
+            replaced = await channel_bot.get_channel_languages(-100)
+            await channel_bot.add_channel_language(-100, 'fr')
+            return replaced, await channel_bot.get_channel_languages(-100), await channel_bot.get_channel_language(-100)
+        
+        replaced, added, first = asyncio.run(channel_languages())
+        if replaced != ['de'] or added != ['de', 'fr'] or first != 'de':
+            print(f"❌ Channel languages: set {replaced}, added {added}, first {first}")
+            return False
+        print("✅ Channel languages can be set, added to and read")
+        
         return True
     except Exception as e:
         print(f"❌ Bot creation error: {e}")
@@ -112,6 +872,23 @@ def main():
     tests = [
         test_imports,
         test_translator,
+        test_circuit_breaker,
+        test_single_flight,
+        test_translation_memory,
+        test_translation_cache,
+        test_breaker_probe_release,
+        test_segmentation,
+        test_async_stream,
+        test_preference_store,
+        test_preference_store_fork,
+        test_update_ordering,
+        test_reply_scheduler,
+        test_fan_out_cache,
+        test_metric_labels,
+        test_translation_memory_names,
+        test_batch_cache,
+        test_detection_consistency,
+        test_asgi_stream_errors,
         test_config,
         test_bot_creation,
         test_environment
@@ -0,0 +1,95 @@
+"""
+Text segmentation for long translations
+Splits text on paragraph and sentence boundaries into pieces that fit a backend's
+request limit, counted in characters or UTF-8 bytes, keeping every character so
+the pieces join back into the original
+"""
+
+import re
+
+# Cut after sentence punctuation plus its whitespace, after CJK full stops, or after line breaks
+_BOUNDARY_RE = re.compile(r'(?<=[.!?])\s+|(?<=[。！？])\s*|\n\s*')
+_WORD_RE = re.compile(r'\S+\s*|\s+')
+
+
+def _units(text):
+    """Split text into sentence/paragraph units, each keeping its trailing whitespace"""
+    units = []
+    start = 0
+    for match in _BOUNDARY_RE.finditer(text):
+        end = match.end()
+        if end > start:
+            units.append(text[start:end])
+            start = end
+    if start < len(text):
+        units.append(text[start:])
+    return units
+
+
+def within_limits(text, max_chars=None, max_bytes=None):
+    """Whether text has at most max_chars characters and max_bytes UTF-8 bytes (None means no limit)"""
+    if max_chars and len(text) > max_chars:
+        return False
+    return not max_bytes or len(text) * 4 <= max_bytes or len(text.encode('utf-8')) <= max_bytes
+
+
+def _prefix(word, max_chars, max_bytes):
+    """Longest prefix of word within the limits, at least one character"""
+    prefix = word[:max_chars] if max_chars else word
+    if max_bytes:
+        prefix = prefix.encode('utf-8')[:max_bytes].decode('utf-8', 'ignore')
+    return prefix or word[:1]
+
+
+def _split_long(unit, max_chars, max_bytes):
+    """Split a unit over the limits on word boundaries, cutting words only as a last resort"""
+    pieces = []
+    current = ''
+    for word in _WORD_RE.findall(unit):
+        while not within_limits(word, max_chars, max_bytes):
+            if current:
+                pieces.append(current)
+                current = ''
+            prefix = _prefix(word, max_chars, max_bytes)
+            pieces.append(prefix)
+            word = word[len(prefix):]
+        if current and not within_limits(current + word, max_chars, max_bytes):
+            pieces.append(current)
+            current = ''
+        current += word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def segment_text(text, max_chars=None, max_bytes=None):
+    """
+    Split text into segments of at most max_chars characters and max_bytes UTF-8 bytes
+    Segments are packed greedily from whole sentences; ''.join(segments) == text
+    """
+    if within_limits(text, max_chars, max_bytes):
+        return [text]
+    segments = []
+    current = ''
+    for unit in _units(text):
+        if within_limits(unit, max_chars, max_bytes):
+            pieces = [unit]
+        else:
+            pieces = _split_long(unit, max_chars, max_bytes)
+        for piece in pieces:
+            if current and not within_limits(current + piece, max_chars, max_bytes):
+                segments.append(current)
+                current = ''
+            current += piece
+    if current:
+        segments.append(current)
+    return segments
+
+
+def split_whitespace(segment):
+    """Return (leading whitespace, body, trailing whitespace) of a segment"""
+    body = segment.strip()
+    if not body:
+        return segment, '', ''
+    start = segment.index(body)
+    return segment[:start], body, segment[start + len(body):]
@@ -0,0 +1,173 @@
+"""
+Translation backends for the Language Agnostic Translator
+Every provider implements TranslationBackend and registers itself under a name,
+so deployments can pick and order providers with TRANSLATION_BACKENDS
+"""
+
+import asyncio
+import logging
+from functools import lru_cache
+
+import http_pool
+from config import TRANSLATION_BACKENDS
+from text_segmentation import within_limits
+
+logger = logging.getLogger(__name__)
+
+# Registered backend classes by name
+BACKENDS = {}
+
+
+def register_backend(cls):
+    """Class decorator that makes a backend selectable by its name"""
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+def create_backend(name):
+    """Instantiate the backend registered under name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown translation backend '{name}', expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+def create_backends(names=TRANSLATION_BACKENDS):
+    """
+    Instantiate backends in the given order (a list or comma-separated string)
+    Backends that are unknown or whose dependencies are missing are skipped with a warning
+    """
+    if isinstance(names, str):
+        names = [name.strip() for name in names.split(',') if name.strip()]
+    backends = []
+    for name in names:
+        try:
+            backends.append(create_backend(name))
+        except (ValueError, ImportError) as e:
+            logger.warning(f"Translation backend '{name}' unavailable: {e}")
+    if not backends:
+        raise ValueError(f"No usable translation backends in {names}")
+    return backends
+
+
+# Google only knows Chinese by script variant
+_GOOGLE_ALIASES = {'zh': 'zh-CN', 'zh-cn': 'zh-CN', 'zh-tw': 'zh-TW'}
+
+
+@lru_cache(maxsize=None)
+def _google_language_codes(source_lang, target_lang):
+    """Validate and map language codes the way deep_translator's GoogleTranslator does"""
+    from deep_translator import GoogleTranslator
+    translator = GoogleTranslator(
+        source=_GOOGLE_ALIASES.get(source_lang, source_lang),
+        target=_GOOGLE_ALIASES.get(target_lang, target_lang)
+    )
+    return translator.source, translator.target
+
+
+class TranslationBackend:
+    """Base class for translation providers"""
+
+    name = 'base'
+    max_chars = None  # longest text the provider accepts in one request, None if unlimited
+    max_bytes = None  # the same limit in UTF-8 bytes, for providers that count bytes
+
+    def within_limits(self, text):
+        """Whether text fits in one request to this provider"""
+        return within_limits(text, self.max_chars, self.max_bytes)
+
+    def translate(self, text, source_lang, target_lang):
+        """Return the translated text, or None if the backend had no answer"""
+        raise NotImplementedError
+
+    async def atranslate(self, text, source_lang, target_lang):
+        """Async translate; runs translate in a worker thread unless the backend has native async I/O"""
+        return await asyncio.to_thread(self.translate, text, source_lang, target_lang)
+
+
+@register_backend
+class GoogleBackend(TranslationBackend):
+    """Google Translate's mobile page, parsed the way deep_translator does"""
+
+    name = 'google'
+    max_chars = 5000
+
+    def __init__(self):
+        # Imported here so importing the module stays cheap until a backend is built
+        from bs4 import BeautifulSoup
+        from deep_translator.constants import BASE_URLS
+        self.url = BASE_URLS['GOOGLE_TRANSLATE']
+        self.soup = BeautifulSoup
+
+    def translate(self, text, source_lang, target_lang):
+        response = http_pool.get(self.url, params=self._params(text, source_lang, target_lang))
+        return self._parse(response)
+
+    async def atranslate(self, text, source_lang, target_lang):
+        response = await http_pool.aget(self.url, params=self._params(text, source_lang, target_lang))
+        return self._parse(response)
+
+    def _params(self, text, source_lang, target_lang):
+        source_code, target_code = _google_language_codes(source_lang, target_lang)
+        return {'sl': source_code, 'tl': target_code, 'q': text.strip()}
+
+    def _parse(self, response):
+        response.raise_for_status()
+        soup = self.soup(response.text, 'html.parser')
+        element = soup.find('div', {'class': 't0'}) or soup.find('div', {'class': 'result-container'})
+        return element.get_text(strip=True) if element else None
+
+
+@register_backend
+class MyMemoryBackend(TranslationBackend):
+    """MyMemory translation API"""
+
+    name = 'mymemory'
+    max_bytes = 500  # the API counts the query in bytes, so 500 ASCII characters but 250 Cyrillic ones
+    URL = "https://api.mymemory.translated.net/get"
+
+    def translate(self, text, source_lang, target_lang):
+        response = http_pool.get(self.URL, params=self._params(text, source_lang, target_lang))
+        return self._parse(response)
+
+    async def atranslate(self, text, source_lang, target_lang):
+        response = await http_pool.aget(self.URL, params=self._params(text, source_lang, target_lang))
+        return self._parse(response)
+
+    def _params(self, text, source_lang, target_lang):
+        return {'q': text, 'langpair': f"{source_lang}|{target_lang}"}
+
+    def _parse(self, response):
+        if response.status_code == 200:
+            data = response.json()
+            if data.get('responseStatus') == 200:
+                return data['responseData']['translatedText']
+        return None
+
+
+@register_backend
+class GoogletransBackend(TranslationBackend):
+    """googletrans client (optional dependency, also used by TranslationService)"""
+
+    name = 'googletrans'
+    max_chars = 5000
+
+    def __init__(self):
+        from googletrans import Translator
+        self.client = Translator()
+
+    def translate(self, text, source_lang, target_lang):
+        result = self.client.translate(text, dest=target_lang, src=source_lang or 'auto')
+        return result.text
+
+
+@register_backend
+class OfflineBackend(TranslationBackend):
+    """Local stub that needs no network; tags the text with the target language"""
+
+    name = 'offline'
+
+    def translate(self, text, source_lang, target_lang):
+        return f"[{target_lang}] {text}"
+
+    async def atranslate(self, text, source_lang, target_lang):
+        return self.translate(text, source_lang, target_lang)
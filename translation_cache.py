@@ -0,0 +1,240 @@
+"""
+Translation cache for the Language Agnostic Translator
+Provides an in-process LRU/TTL tier and an optional SQLite tier that survives restarts
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from config import TRANSLATION_CACHE_SIZE, TRANSLATION_CACHE_TTL, TRANSLATION_CACHE_DB
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Normalize text for cache lookups (Unicode NFC, collapsed whitespace)"""
+    text = unicodedata.normalize('NFC', text)
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def make_cache_key(text, target_lang, source_lang=None):
+    """Build the cache key for a (text, source, target) triple"""
+    return f"{source_lang or 'auto'}|{target_lang}|{normalize_text(text)}"
+
+
+class MemoryCache:
+    """In-process LRU cache with per-entry TTL and size-bounded eviction"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=TRANSLATION_CACHE_SIZE, ttl=TRANSLATION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entries"""
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return hit/miss counters for this tier"""
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+
+class SQLiteCache:
+    """
+    Persistent cache tier backed by a SQLite database file
+    The connection is reopened after a fork, so a cache created before gunicorn
+    forks its workers is safe to use in each of them
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path=TRANSLATION_CACHE_DB, ttl=TRANSLATION_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connect()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        self._conn_pid = os.getpid()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS translations '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)'
+        )
+        self._conn.commit()
+
+    @property
+    def _db(self):
+        """The connection for this process; callers hold self._lock"""
+        if self._conn_pid != os.getpid():
+            # Never touch the parent's connection from a forked child
+            self._connect()
+        return self._conn
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT value, expires_at FROM translations WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= time.time():
+                self._db.execute('DELETE FROM translations WHERE key = ?', (key,))
+                self._db.commit()
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value):
+        """Store value under key"""
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO translations (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), expires_at)
+            )
+            self._db.commit()
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._db.execute('DELETE FROM translations')
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+
+    def stats(self):
+        """Return hit/miss counters for this tier"""
+        return {
+            'entries': len(self),
+            'path': self.path,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+class TranslationCache:
+    """Multi-tier cache; lookups go fastest tier first and hits are promoted upwards"""
+
+    def __init__(self, tiers):
+        self.tiers = list(tiers)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value for key from the first tier that has it; a failing tier counts as a miss"""
+        for index, tier in enumerate(self.tiers):
+            try:
+                value = tier.get(key)
+            except Exception as e:
+                logger.warning(f"Cache tier {tier.name} read failed: {e}")
+                continue
+            if value is not None:
+                for upper in self.tiers[:index]:
+                    try:
+                        upper.set(key, value)
+                    except Exception as e:
+                        logger.warning(f"Cache tier {upper.name} write failed: {e}")
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        """Store value in every tier"""
+        for tier in self.tiers:
+            try:
+                tier.set(key, value)
+            except Exception as e:
+                logger.warning(f"Cache tier {tier.name} write failed: {e}")
+
+    def clear(self):
+        """Remove all entries from every tier"""
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self):
+        """Return overall and per-tier hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'tiers': {tier.name: tier.stats() for tier in self.tiers}
+        }
+
+
+def create_translation_cache():
+    """Build the cache configured in config.py"""
+    tiers = []
+    if TRANSLATION_CACHE_SIZE > 0:
+        tiers.append(MemoryCache())
+    if TRANSLATION_CACHE_DB:
+        try:
+            tiers.append(SQLiteCache())
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent translation cache disabled: {e}")
+    return TranslationCache(tiers)
@@ -0,0 +1,331 @@
+"""
+Translation memory for the Language Agnostic Translator
+Reuses earlier translations for texts that differ only in numbers, URLs,
+@mentions, emoji or names, which the exact cache cannot match.
+
+Texts are stored as templates with those values masked out. A text whose template
+was translated before is filled in without an upstream call. With a non-zero
+TRANSLATION_MEMORY_THRESHOLD, a MinHash LSH index over the templates' words also
+finds near-duplicates; one is reused when it is at least that similar and every
+differing word is a capitalized name that the stored translation kept unchanged.
+Swapping names is off by default because the rest of the translation may agree
+with the old name's gender. Lookups cost a dict probe and a few band lookups
+however many entries are stored.
+"""
+
+import logging
+import random
+import re
+import threading
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from config import TRANSLATION_MEMORY_SIZE, TRANSLATION_MEMORY_THRESHOLD, TRANSLATION_MEMORY_MAX_CHARS
+from language_detection import HAS_NUMPY
+from translation_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+_EMOJI = '\U0001F300-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\u231A-\u23FF\U0001F1E6-\U0001F1FF'
+_PLACEHOLDER_RE = re.compile(
+    r'(?P<url>(?:https?://|www\.)\S*[^\s.,;:!?)\]\'"])'
+    r'|(?P<mention>@\w+)'
+    rf'|(?P<emoji>[{_EMOJI}][{_EMOJI}\uFE0F\u200D]*)'
+    r'|(?P<number>(?<![\w.,:])\d+(?:[.,:]\d+)*(?![\w]))'
+)
+# Private-use characters standing for each kind of masked value in a template
+_MARKERS = {'url': '\uE000', 'mention': '\uE001', 'emoji': '\uE002', 'number': '\uE003'}
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+# MinHash signature of _BANDS x _ROWS multiply-shift hashes; templates sharing any band are candidates
+_BANDS = 8
+_ROWS = 4
+_MASK64 = (1 << 64) - 1
+_MULTIPLIERS = [random.Random(seed).getrandbits(64) | 1 for seed in range(_BANDS * _ROWS)]
+# Candidates verified per lookup, and entries kept per band bucket
+_MAX_CANDIDATES = 8
+_MAX_BUCKET = 32
+
+
+def _plural_class(number):
+    """
+    The digits plural rules look at, so '1 message' and '5 messages' get separate
+    templates while 25 and 35 share one
+    """
+    if not number.isdigit():
+        return -1
+    n = int(number)
+    if n < 20:
+        return n
+    return 100 + n % 100 if n % 100 < 20 else 200 + n % 10
+
+
+def mask(text):
+    """Split text into (template, values, plural classes) with URLs, mentions, emoji and numbers masked"""
+    values = []
+    classes = []
+
+    def replace(match):
+        kind = match.lastgroup
+        values.append(match.group())
+        if kind == 'number':
+            classes.append(_plural_class(match.group()))
+        return _MARKERS[kind]
+
+    template = _PLACEHOLDER_RE.sub(replace, text)
+    return template, values, tuple(classes)
+
+
+def _fill(parts, values):
+    return ''.join(part if isinstance(part, str) else values[part] for part in parts)
+
+
+def _is_name(token):
+    return token[:1].isupper() and token.isalpha()
+
+
+@lru_cache(maxsize=None)
+def _multiplier_array():
+    import numpy as np
+    return np.array(_MULTIPLIERS, dtype=np.uint64)[:, None]
+
+
+def _minhash(words):
+    hashes = [hash(word) & _MASK64 for word in set(words)]
+    if HAS_NUMPY:
+        import numpy as np
+        # uint64 products wrap around, which is the mod 2**64 the hash family needs
+        products = _multiplier_array() * np.array(hashes, dtype=np.uint64)
+        return tuple((products >> np.uint64(32)).min(axis=1).tolist())
+    return tuple(min(((a * h) & _MASK64) >> 32 for h in hashes) for a in _MULTIPLIERS)
+
+
+class TranslationMemory:
+    """
+    Size-bounded store of translated templates, evicting the least recently used
+    A max_entries of 0 disables it
+    """
+
+    def __init__(self, max_entries=TRANSLATION_MEMORY_SIZE, threshold=TRANSLATION_MEMORY_THRESHOLD,
+                 max_chars=TRANSLATION_MEMORY_MAX_CHARS):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.max_chars = max_chars
+        # (source, target, template, plural classes) -> (translated parts, backend); plain
+        # tuples of strings, which the garbage collector stops tracking
+        self._entries = OrderedDict()
+        self._buckets = {}  # band hash -> key, or a list of keys once several share the band
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.unstorable = 0
+        self.evictions = 0
+
+    def _usable(self, text):
+        return self.max_entries > 0 and text and len(text) <= self.max_chars
+
+    def _bands(self, key, tokens):
+        """LSH band hashes of a template's words, scoped to its language pair"""
+        words = [token.lower() for token in tokens if token[0].isalnum()]
+        if not words or self.threshold <= 0:
+            return ()
+        signature = _minhash(words)
+        return [
+            hash((key[0], key[1], band, signature[band * _ROWS:(band + 1) * _ROWS]))
+            for band in range(_BANDS)
+        ]
+
+    def lookup(self, text, source_lang, target_lang):
+        """
+        Return (translated_text, backend, similarity) from a stored translation of an
+        equivalent text, or None
+        """
+        if not self._usable(text):
+            return None
+        template, values, classes = mask(normalize_text(text))
+        key = (source_lang, target_lang, template, classes)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+        if entry is not None:
+            parts, backend = entry
+            return _fill(parts, values), backend, 1.0
+
+        tokens = _TOKEN_RE.findall(template)
+        bands = self._bands(key, tokens)
+        match = self._fuzzy(key, tokens, bands) if bands else None
+        if match is not None:
+            parts, backend, similarity = match
+            return _fill(parts, values), backend, similarity
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _fuzzy(self, key, tokens, bands):
+        votes = {}
+        with self._lock:
+            for band in bands:
+                keys = self._buckets.get(band)
+                if keys is None:
+                    continue
+                for candidate in (keys if isinstance(keys, list) else (keys,)):
+                    votes[candidate] = votes.get(candidate, 0) + 1
+            candidates = sorted(votes, key=votes.get, reverse=True)[:_MAX_CANDIDATES]
+            entries = [(candidate, self._entries.get(candidate)) for candidate in candidates]
+
+        for candidate, entry in entries:
+            # Same language pair, and numbers in the same plural classes so the wording carries over
+            if entry is None or candidate[:2] != key[:2] or candidate[3] != key[3]:
+                continue
+            stored_tokens = _TOKEN_RE.findall(candidate[2])
+            matcher = SequenceMatcher(None, stored_tokens, tokens, autojunk=False)
+            similarity = matcher.ratio()
+            if similarity < self.threshold:
+                continue
+            parts = self._substitute(stored_tokens, entry[0], matcher.get_opcodes(), tokens)
+            if parts is not None:
+                with self._lock:
+                    self.fuzzy_hits += 1
+                return parts, entry[1], similarity
+        return None
+
+    @staticmethod
+    def _substitute(stored_tokens, parts, opcodes, tokens):
+        """The stored translation with its names swapped for the new text's, or None if other words differ"""
+        names = {}
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                continue
+            if tag != 'replace' or i2 - i1 != j2 - j1:
+                return None
+            for old, new in zip(stored_tokens[i1:i2], tokens[j1:j2]):
+                if not (_is_name(old) and _is_name(new)) or names.setdefault(old, new) != new:
+                    return None
+
+        parts = list(parts)
+        for old, new in names.items():
+            # Every occurrence of the name must have been kept as is, and changed everywhere
+            if old in tokens:
+                return None
+            pattern = re.compile(rf'(?<!\w){re.escape(old)}(?!\w)')
+            literal = [index for index, part in enumerate(parts) if isinstance(part, str)]
+            if sum(len(pattern.findall(parts[index])) for index in literal) != stored_tokens.count(old):
+                return None
+            for index in literal:
+                parts[index] = pattern.sub(lambda match: new, parts[index])
+        return parts
+
+    def add(self, text, translated_text, source_lang, target_lang, backend):
+        """
+        Remember a translation; returns False if the masked values could not be found
+        in the translation (e.g. a number the backend reformatted)
+        """
+        if not self._usable(text) or not translated_text:
+            return False
+        template, values, classes = mask(normalize_text(text))
+        parts = self._translated_template(values, translated_text)
+        if parts is None:
+            with self._lock:
+                self.unstorable += 1
+            return False
+
+        key = (source_lang, target_lang, template, classes)
+        bands = self._bands(key, _TOKEN_RE.findall(template))
+        evicted = []
+        with self._lock:
+            known = key in self._entries
+            self._entries[key] = (tuple(parts), backend)
+            self._entries.move_to_end(key)
+            if not known:
+                for band in bands:
+                    self._index(band, key)
+            self.stored += 1
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+                self.evictions += 1
+
+        # Recomputing the evicted templates' bands is cheaper than storing them per entry
+        for old_key in evicted:
+            old_bands = self._bands(old_key, _TOKEN_RE.findall(old_key[2]))
+            with self._lock:
+                for band in old_bands:
+                    self._unindex(band, old_key)
+        return True
+
+    def _index(self, band, key):
+        """Add key to a band bucket; callers hold self._lock"""
+        keys = self._buckets.get(band)
+        if keys is None:
+            self._buckets[band] = key
+        elif isinstance(keys, list):
+            keys.append(key)
+            if len(keys) > _MAX_BUCKET:
+                del keys[0]
+        else:
+            self._buckets[band] = [keys, key]
+
+    def _unindex(self, band, key):
+        """Remove key from a band bucket; callers hold self._lock"""
+        keys = self._buckets.get(band)
+        if keys == key:
+            del self._buckets[band]
+        elif isinstance(keys, list) and key in keys:
+            keys.remove(key)
+            if len(keys) == 1:
+                self._buckets[band] = keys[0]
+
+    @staticmethod
+    def _translated_template(values, translated_text):
+        """
+        Split translated_text into literal strings and value indexes, or None if a
+        value does not appear exactly once
+        """
+        if len(set(values)) != len(values):
+            return None
+        indexes = {value: index for index, value in enumerate(values)}
+        parts = []
+        found = set()
+        position = 0
+        for match in _PLACEHOLDER_RE.finditer(translated_text):
+            index = indexes.get(match.group())
+            if index is None:
+                continue
+            if index in found:
+                return None
+            found.add(index)
+            parts.append(translated_text[position:match.start()])
+            parts.append(index)
+            position = match.end()
+        if len(found) != len(values):
+            return None
+        parts.append(translated_text[position:])
+        return parts
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return entry and hit counters"""
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'threshold': self.threshold,
+            'exact_hits': self.exact_hits,
+            'fuzzy_hits': self.fuzzy_hits,
+            'misses': self.misses,
+            'stored': self.stored,
+            'unstorable': self.unstorable,
+            'evictions': self.evictions
+        }
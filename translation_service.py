@@ -1,6 +1,7 @@
-from googletrans import Translator, LANGUAGES
+from googletrans import LANGUAGES
 import logging
 from config import SUPPORTED_LANGUAGES
+from translation_backends import create_backend
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -8,7 +9,9 @@ logger = logging.getLogger(__name__)
 
 class TranslationService:
     def __init__(self):
-        self.translator = Translator()
+        # Share the googletrans client registered as the 'googletrans' backend
+        self.backend = create_backend('googletrans')
+        self.translator = self.backend.client
     
     def detect_language(self, text):
         """Detect the language of the input text"""
@@ -1,99 +1,710 @@
+import asyncio
 import logging
-from deep_translator import GoogleTranslator
-from langdetect import detect, LangDetectException
-from config import SUPPORTED_LANGUAGES, DEFAULT_TARGET_LANGUAGE
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Optional
+from langdetect import LangDetectException
+from config import (
+    SUPPORTED_LANGUAGES, DEFAULT_TARGET_LANGUAGE, TRANSLATION_WORKERS, TRANSLATION_TIMEOUT,
+    BATCH_MAX_WORKERS, DETECTION_WARMUP, SEGMENT_MAX_CHARS, SEGMENT_MAX_WORKERS, STREAM_SEGMENT_CHARS,
+    SINGLE_FLIGHT
+)
+from language_detection import LanguageDetector
+from translation_cache import create_translation_cache, make_cache_key
+from translation_memory import TranslationMemory
+from translation_backends import create_backends
+from backend_strategy import BackendStrategy
+from single_flight import SingleFlight, AsyncSingleFlight
+from text_segmentation import segment_text, split_whitespace, within_limits
+import http_pool
+import metrics
 import json
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Stage timers, bound once so recording on the hot path stays cheap
+_CACHE_LOOKUP_SECONDS = metrics.STAGE_SECONDS.labels('cache_lookup')
+_DETECT_SECONDS = metrics.STAGE_SECONDS.labels('detect')
+_UPSTREAM_SECONDS = metrics.STAGE_SECONDS.labels('upstream')
+_SEGMENTS_SECONDS = metrics.STAGE_SECONDS.labels('segments')
+_CACHE_WRITE_SECONDS = metrics.STAGE_SECONDS.labels('cache_write')
+_MEMORY_LOOKUP_SECONDS = metrics.STAGE_SECONDS.labels('memory_lookup')
+
+
+@dataclass
+class TranslationResult:
+    """Outcome of a single translate_text call"""
+    translated_text: Optional[str]
+    message: str
+    source_lang: Optional[str] = None
+    target_lang: Optional[str] = None
+    confidence: Optional[float] = None
+    backend: Optional[str] = None
+    cached: bool = False
+    
+    @property
+    def success(self):
+        return self.translated_text is not None
+    
+    @property
+    def source_name(self):
+        return SUPPORTED_LANGUAGES.get(self.source_lang, self.source_lang)
+    
+    @property
+    def target_name(self):
+        return SUPPORTED_LANGUAGES.get(self.target_lang, self.target_lang)
+
+
 class LanguageTranslator:
-    def __init__(self):
-        self.translator = GoogleTranslator()
-        
+    def __init__(self, cache=None, executor=None, strategy=None, detector=None, memory=None):
+        self.cache = cache if cache is not None else create_translation_cache()
+        # Reuses translations of texts that differ only in numbers, URLs, mentions, emoji or names
+        self.memory = memory if memory is not None else TranslationMemory()
+        self.detector = detector or LanguageDetector()
+        if DETECTION_WARMUP:
+            self.detector.warm_up()
+        self.strategy = strategy or BackendStrategy(create_backends())
+        # Identical concurrent translations share one upstream call
+        self.inflight = SingleFlight() if SINGLE_FLIGHT else None
+        self.async_inflight = AsyncSingleFlight() if SINGLE_FLIGHT else None
+        # Bounded pool that runs blocking translation calls for async callers
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=TRANSLATION_WORKERS, thread_name_prefix='translator'
+        )
+    
     def detect_language(self, text):
         """
         Detect the language of the given text
         """
+        lang_code, _, message = self._detect(text)
+        if lang_code is None:
+            return None, message
+        return lang_code, SUPPORTED_LANGUAGES.get(lang_code, lang_code)
+    
+    def _detect(self, text):
+        """
+        Detect the language of text, returning (code, confidence, error message)
+        """
         try:
             if not text or not text.strip():
-                return None, "Text is empty or invalid"
+                return None, None, "Text is empty or invalid"
             
-            detected_lang = detect(text)
-            language_name = SUPPORTED_LANGUAGES.get(detected_lang, detected_lang)
-            return detected_lang, language_name
+            with _DETECT_SECONDS.time():
+                lang_code, confidence = self.detector.detect(text)
+            metrics.DETECTIONS.labels(lang_code or 'unknown').inc()
+            return lang_code, confidence, None
         except LangDetectException as e:
             logger.error(f"Language detection error: {e}")
-            return None, f"Could not detect language: {str(e)}"
+            return None, None, f"Could not detect language: {str(e)}"
         except Exception as e:
             logger.error(f"Unexpected error in language detection: {e}")
-            return None, f"Error detecting language: {str(e)}"
+            return None, None, f"Error detecting language: {str(e)}"
+    
+    def detect_batch(self, texts):
+        """
+        Detect the language of many texts at once
+        Returns a (lang_code, language_name, confidence) tuple per text, with
+        lang_code None and an error message in place of the name when detection failed
+        """
+        results = []
+        for detection in self.detector.detect_batch(texts):
+            if detection is None:
+                results.append((None, "Could not detect language", None))
+            else:
+                lang_code, confidence = detection
+                results.append((lang_code, SUPPORTED_LANGUAGES.get(lang_code, lang_code), confidence))
+        return results
     
     def translate_text(self, text, target_lang=None, source_lang=None):
         """
-        Translate text to target language
+        Translate text to target language and return a TranslationResult
         """
+        start = time.perf_counter()
+        result = self._translate(text, target_lang, source_lang)
+        metrics.record_translation(result, time.perf_counter() - start)
+        return result
+    
+    def _translate(self, text, target_lang, source_lang):
         try:
-            if not text or not text.strip():
-                return None, "Text is empty or invalid"
-            
-            if target_lang is None:
-                target_lang = DEFAULT_TARGET_LANGUAGE
+            prepared = self._prepare_translation(text, target_lang, source_lang)
+            if isinstance(prepared, TranslationResult):
+                return prepared
+            result, cache_key = prepared
             
-            # Detect source language if not provided
+            # Try the backends with the configured strategy (sequential, hedged or race);
+            # texts over the backend's request limit are translated segment by segment
+            limits = self._segment_limits()
+            failed_segments = 0
+            if not within_limits(text, *limits):
+                translated_text, backend_name, failed_segments = self._translate_segments(
+                    text, result.source_lang, result.target_lang, limits
+                )
+            else:
+                translated_text, backend_name, joined = self._upstream(text, result.source_lang, result.target_lang)
+                # The caller whose request went upstream caches the result for everyone
+                if joined:
+                    cache_key = None
+            return self._finish_translation(result, cache_key, text, translated_text, backend_name, failed_segments)
+        
+        except Exception as e:
+            logger.error(f"Translation error: {e}")
+            return TranslationResult(None, f"Translation failed: {str(e)}")
+    
+    def _prepare_translation(self, text, target_lang, source_lang):
+        """
+        Validate the input, check the cache and detect the source language
+        Returns a finished TranslationResult, or (result, cache_key) when the text still needs translating
+        """
+        if not text or not text.strip():
+            return TranslationResult(None, "Text is empty or invalid")
+        
+        if target_lang is None:
+            target_lang = DEFAULT_TARGET_LANGUAGE
+        
+        # Serve repeated texts from the cache
+        cache_key = make_cache_key(text, target_lang, source_lang)
+        with _CACHE_LOOKUP_SECONDS.time():
+            cached = self.cache.get(cache_key)
+        if cached is not None:
+            return TranslationResult(target_lang=target_lang, cached=True, **cached)
+        
+        # Detect source language if not provided (an empty value means auto-detect)
+        confidence = None
+        if not source_lang:
+            source_lang, confidence, _ = self._detect(text)
             if source_lang is None:
-                source_lang, _ = self.detect_language(text)
-                if source_lang is None:
-                    return None, "Could not detect source language"
+                return TranslationResult(None, "Could not detect source language")
+        
+        result = TranslationResult(None, "", source_lang, target_lang, confidence)
+        
+        # Don't translate if source and target are the same
+        if source_lang == target_lang:
+            result.translated_text = text
+            result.message = f"Text is already in {result.target_name}"
+            return result
+        
+        # Fill in the translation of an equivalent text from the translation memory
+        with _MEMORY_LOOKUP_SECONDS.time():
+            remembered = self.memory.lookup(text, source_lang, target_lang)
+        if remembered is not None:
+            result.translated_text = remembered[0]
+            result.message = f"Translated from {result.source_name} to {result.target_name}"
+            result.backend = 'memory'
+            result.cached = True
+            self._cache_translation(cache_key, result)
+            return result
+        
+        return result, cache_key
+    
+    def _finish_translation(self, result, cache_key, text, translated_text, backend_name, failed_segments=0):
+        """
+        Fill in result from the backends' answer and cache it when complete (and cache_key is set)
+        """
+        if translated_text:
+            result.translated_text = translated_text
+            result.message = f"Translated from {result.source_name} to {result.target_name}"
+            result.backend = backend_name
+            # Partially translated texts are not cached so a later request can complete them
+            if cache_key is not None and not failed_segments:
+                self._cache_translation(cache_key, result)
+                self.memory.add(text, translated_text, result.source_lang, result.target_lang, backend_name)
+            return result
+        
+        # If all methods fail, return original text with message
+        result.translated_text = text
+        result.message = f"Translation service unavailable. Text appears to be in {result.source_name}"
+        return result
+    
+    def translate_batch(self, texts, target_lang=None, source_langs=None, max_workers=BATCH_MAX_WORKERS):
+        """
+        Translate many texts and return their TranslationResults in input order
+        Identical inputs are translated once; texts without a source language are
+        detected by translate_text, so they share its 'auto' cache entries
+        """
+        keys, unique = self._batch_inputs(texts, target_lang, source_langs)
+        workers = max(1, min(max_workers, len(unique)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') as pool:
+            results = dict(zip(unique, pool.map(
+                lambda key: self.translate_text(unique[key][0], target_lang, unique[key][1]), unique
+            )))
+        return [results[key] for key in keys]
+    
+    async def translate_batch_async(self, texts, target_lang=None, source_langs=None, max_concurrency=BATCH_MAX_WORKERS):
+        """
+        Async twin of translate_batch, with at most max_concurrency translations in flight
+        """
+        keys, unique = self._batch_inputs(texts, target_lang, source_langs)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def translate(text, source_lang):
+            async with semaphore:
+                return await self.translate_text_async(text, target_lang, source_lang)
+        
+        translated = await asyncio.gather(*(translate(text, source_lang) for text, source_lang in unique.values()))
+        results = dict(zip(unique, translated))
+        return [results[key] for key in keys]
+    
+    @staticmethod
+    def _batch_inputs(texts, target_lang, source_langs):
+        """
+        Return (cache key per input, {cache key: (text, source_lang)}) for deduplicating a batch
+        """
+        if source_langs is None:
+            source_langs = [None] * len(texts)
+        keys = []
+        unique = {}
+        for text, source_lang in zip(texts, source_langs):
+            key = make_cache_key(text or '', target_lang or DEFAULT_TARGET_LANGUAGE, source_lang)
+            keys.append(key)
+            unique.setdefault(key, (text, source_lang or None))
+        return keys, unique
+    
+    def _upstream(self, text, source_lang, target_lang):
+        """
+        Translate text with the backends, joining an identical call already in flight
+        Returns (translated_text, backend_name, joined)
+        """
+        with _UPSTREAM_SECONDS.time():
+            if self.inflight is None:
+                return (*self.strategy.translate(text, source_lang, target_lang), False)
+            (translated_text, backend_name), joined = self.inflight.do(
+                make_cache_key(text, target_lang, source_lang), self.strategy.translate, text, source_lang, target_lang
+            )
+        return translated_text, backend_name, joined
+    
+    async def _aupstream(self, text, source_lang, target_lang):
+        """
+        Async twin of _upstream, coalescing calls made on the same event loop
+        """
+        with _UPSTREAM_SECONDS.time():
+            if self.async_inflight is None:
+                return (*await self.strategy.atranslate(text, source_lang, target_lang), False)
+            (translated_text, backend_name), joined = await self.async_inflight.do(
+                make_cache_key(text, target_lang, source_lang), self.strategy.atranslate, text, source_lang, target_lang
+            )
+        return translated_text, backend_name, joined
+    
+    def _segment_limits(self):
+        """
+        Longest text sent upstream in one request, as (max_chars, max_bytes): SEGMENT_MAX_CHARS,
+        or the request limit of the backend the strategy tries first
+        """
+        if SEGMENT_MAX_CHARS:
+            return SEGMENT_MAX_CHARS, None
+        backend = self.strategy.primary_backend()
+        if backend is None:
+            return None, None
+        return backend.max_chars, backend.max_bytes
+    
+    def _translate_segment(self, body, source_lang, target_lang):
+        """
+        Translate one whitespace-stripped segment through the cache
+        Returns (translated_body, backend_name); translated_body is None on failure
+        """
+        if not body:
+            return body, None
+        cache_key = make_cache_key(body, target_lang, source_lang)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached['translated_text'], cached['backend']
+        translated_body, backend_name, joined = self._upstream(body, source_lang, target_lang)
+        if translated_body and not joined:
+            self._cache_segment(cache_key, translated_body, source_lang, target_lang, backend_name)
+        return translated_body, backend_name
+    
+    def _cache_segment(self, cache_key, translated_body, source_lang, target_lang, backend_name):
+        """
+        Cache one translated segment so identical sentences are reused across texts
+        """
+        result = TranslationResult(translated_body, "", source_lang, target_lang, backend=backend_name)
+        result.message = f"Translated from {result.source_name} to {result.target_name}"
+        self._cache_translation(cache_key, result)
+    
+    def _translate_segments(self, text, source_lang, target_lang, limits):
+        """
+        Translate a long text in sentence-aligned segments, concurrently and through the cache
+        Returns (translated_text, backend names, failed segment count), keeping the original
+        whitespace between segments; segments that fail stay untranslated, and
+        (None, None, count) is returned if every segment failed
+        """
+        segments = [split_whitespace(segment) for segment in segment_text(text, *limits)]
+        
+        def translate(body):
+            return self._translate_segment(body, source_lang, target_lang)
+        
+        workers = max(1, min(SEGMENT_MAX_WORKERS, len(segments)))
+        with _SEGMENTS_SECONDS.time(), ThreadPoolExecutor(max_workers=workers, thread_name_prefix='segment') as pool:
+            translations = list(pool.map(translate, [body for _, body, _ in segments]))
+        return self._join_segments(segments, translations)
+    
+    def _join_segments(self, segments, translations):
+        """
+        Reassemble translated segments with their original whitespace
+        """
+        if not any(backend_name for _, backend_name in translations):
+            return None, None, len(segments)
+        
+        parts = []
+        failed = 0
+        for (leading, body, trailing), (translated_body, _) in zip(segments, translations):
+            if body and not translated_body:
+                failed += 1
+            parts.append(leading + (translated_body or body) + trailing)
+        if failed:
+            logger.warning(f"{failed} of {len(segments)} segments could not be translated")
+        backend_names = sorted({backend_name for _, backend_name in translations if backend_name})
+        return ''.join(parts), ','.join(backend_names), failed
+    
+    def translate_stream(self, text, target_lang=None, source_lang=None):
+        """
+        Translate text segment by segment, yielding events as segments complete
+        Yields a 'start' event, one 'segment' event per segment (in completion order,
+        tagged with its index) and a final 'done' event; an 'error' event ends the
+        stream early if the text cannot be translated at all
+        """
+        start = time.perf_counter()
+        try:
+            prepared = self._prepare_stream(text, target_lang, source_lang)
+            if isinstance(prepared, TranslationResult):
+                metrics.record_translation(prepared, time.perf_counter() - start)
+                yield from self._finished_stream(prepared)
+                return
+            result, cache_key, segments = prepared
+            yield self._stream_start(result, len(segments))
             
-            # Don't translate if source and target are the same
-            if source_lang == target_lang:
-                return text, f"Text is already in {SUPPORTED_LANGUAGES.get(target_lang, target_lang)}"
+            translations = [None] * len(segments)
+            workers = max(1, min(SEGMENT_MAX_WORKERS, len(segments)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='stream') as pool:
+                futures = {
+                    pool.submit(self._translate_segment, body, result.source_lang, result.target_lang): index
+                    for index, (_, body, _) in enumerate(segments)
+                }
+                for future in as_completed(futures):
+                    index = futures[future]
+                    translations[index] = future.result()
+                    yield self._segment_event(segments, index, translations[index])
+            
+            done = self._stream_done(result, cache_key, text, segments, translations)
+            metrics.record_translation(result, time.perf_counter() - start)
+            yield done
+        
+        except Exception as e:
+            logger.error(f"Streaming translation error: {e}")
+            result = TranslationResult(None, f"Translation failed: {str(e)}", target_lang=target_lang)
+            metrics.record_translation(result, time.perf_counter() - start)
+            yield {'type': 'error', 'error': result.message}
+    
+    def _prepare_stream(self, text, target_lang, source_lang):
+        """
+        Run the same checks as translate_text (cache, detection, translation memory) for a stream
+        Returns a finished TranslationResult when the stream ends here, otherwise
+        (result, cache_key, whitespace-split segments)
+        """
+        prepared = self._prepare_translation(text, target_lang, source_lang)
+        if isinstance(prepared, TranslationResult):
+            return prepared
+        result, cache_key = prepared
+        
+        max_chars, max_bytes = self._segment_limits()
+        max_chars = min(filter(None, [max_chars, STREAM_SEGMENT_CHARS]))
+        segments = [split_whitespace(segment) for segment in segment_text(text, max_chars, max_bytes)]
+        return result, cache_key, segments
+    
+    def _finished_stream(self, result):
+        """
+        Build the events for a result that needs no upstream call: an error, or a cached,
+        remembered or same-language text sent as a single segment
+        """
+        if not result.success:
+            return [{'type': 'error', 'error': result.message}]
+        return [
+            self._stream_start(result, 1),
+            {'type': 'segment', 'index': 0, 'text': result.translated_text, 'backend': result.backend},
+            {'type': 'done', 'success': True, 'message': result.message, 'cached': result.cached}
+        ]
+    
+    @staticmethod
+    def _segment_event(segments, index, translation):
+        """
+        Build the event for one translated segment, keeping its original whitespace
+        """
+        leading, body, trailing = segments[index]
+        translated_body, backend_name = translation
+        text = leading + (translated_body or body) + trailing
+        return {'type': 'segment', 'index': index, 'text': text, 'backend': backend_name}
+    
+    def _stream_done(self, result, cache_key, text, segments, translations):
+        """
+        Build the last event of a translation stream, finishing result like translate_text
+        (cache and translation memory are only written if no segment failed)
+        """
+        translated_text, backend_name, failed = self._join_segments(segments, translations)
+        self._finish_translation(result, cache_key, text, translated_text, backend_name, failed)
+        if translated_text is None:
+            return {'type': 'done', 'success': False, 'message': result.message}
+        return {'type': 'done', 'success': True, 'message': result.message, 'cached': False}
+    
+    async def translate_stream_async(self, text, target_lang=None, source_lang=None):
+        """
+        Async twin of translate_stream
+        Segments are awaited on the event loop like translate_text_async, so an open
+        stream holds no worker thread while it waits on the backends
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            prepared = await loop.run_in_executor(
+                self.executor, self._prepare_stream, text, target_lang, source_lang
+            )
+            if isinstance(prepared, TranslationResult):
+                metrics.record_translation(prepared, time.perf_counter() - start)
+                for event in self._finished_stream(prepared):
+                    yield event
+                return
+            result, cache_key, segments = prepared
+            yield self._stream_start(result, len(segments))
             
-            # Try multiple translation methods
-            translated_text = None
+            semaphore = asyncio.Semaphore(SEGMENT_MAX_WORKERS)
+            translations = [None] * len(segments)
             
-            # Method 1: Try GoogleTranslator
-            try:
-                translator = GoogleTranslator(source=source_lang, target=target_lang)
-                translated_text = translator.translate(text)
-                if translated_text and translated_text != text:
-                    source_lang_name = SUPPORTED_LANGUAGES.get(source_lang, source_lang)
-                    target_lang_name = SUPPORTED_LANGUAGES.get(target_lang, target_lang)
-                    return translated_text, f"Translated from {source_lang_name} to {target_lang_name}"
-            except Exception as e:
-                logger.warning(f"GoogleTranslator failed: {e}")
+            async def translate(index, body):
+                return index, await self._atranslate_segment(body, result.source_lang, result.target_lang, semaphore)
             
-            # Method 2: Try MyMemory API as fallback
+            tasks = [asyncio.ensure_future(translate(index, body)) for index, (_, body, _) in enumerate(segments)]
             try:
-                url = "https://api.mymemory.translated.net/get"
-                params = {
-                    'q': text,
-                    'langpair': f"{source_lang}|{target_lang}"
-                }
-                response = requests.get(url, params=params, timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('responseStatus') == 200:
-                        translated_text = data['responseData']['translatedText']
-                        if translated_text and translated_text != text:
-                            source_lang_name = SUPPORTED_LANGUAGES.get(source_lang, source_lang)
-                            target_lang_name = SUPPORTED_LANGUAGES.get(target_lang, target_lang)
-                            return translated_text, f"Translated from {source_lang_name} to {target_lang_name}"
-            except Exception as e:
-                logger.warning(f"MyMemory API failed: {e}")
+                for next_done in asyncio.as_completed(tasks):
+                    index, translation = await next_done
+                    translations[index] = translation
+                    yield self._segment_event(segments, index, translation)
+            finally:
+                # A client that disconnects mid-stream cancels the segments still in flight
+                for task in tasks:
+                    task.cancel()
             
-            # If all methods fail, return original text with message
-            if not translated_text or translated_text == text:
-                return text, f"Translation service unavailable. Text appears to be in {SUPPORTED_LANGUAGES.get(source_lang, source_lang)}"
+            done = await loop.run_in_executor(
+                self.executor, self._stream_done, result, cache_key, text, segments, translations
+            )
+            metrics.record_translation(result, time.perf_counter() - start)
+            yield done
+        
+        except Exception as e:
+            logger.error(f"Streaming translation error: {e}")
+            result = TranslationResult(None, f"Translation failed: {str(e)}", target_lang=target_lang)
+            metrics.record_translation(result, time.perf_counter() - start)
+            yield {'type': 'error', 'error': result.message}
+    
+    def _stream_start(self, result, segment_count):
+        """
+        Build the first event of a translation stream
+        """
+        return {
+            'type': 'start',
+            'source_language': result.source_lang,
+            'source_name': result.source_name,
+            'target_language': result.target_lang,
+            'target_name': result.target_name,
+            'confidence': result.confidence,
+            'segments': segment_count
+        }
+    
+    async def translate_text_async(self, text, target_lang=None, source_lang=None, timeout=TRANSLATION_TIMEOUT):
+        """
+        Translate text without blocking the event loop
+        Cache lookups and detection run in the executor; upstream requests are awaited
+        on the event loop, so in-flight translations do not hold a thread
+        """
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._translate_async(text, target_lang, source_lang), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Translation timed out after {timeout}s")
+            result = TranslationResult(None, f"Translation timed out after {timeout:g} seconds", target_lang=target_lang)
+        metrics.record_translation(result, time.perf_counter() - start)
+        return result
+    
+    async def _translate_async(self, text, target_lang, source_lang):
+        loop = asyncio.get_running_loop()
+        try:
+            prepared = await loop.run_in_executor(
+                self.executor, self._prepare_translation, text, target_lang, source_lang
+            )
+            if isinstance(prepared, TranslationResult):
+                return prepared
+            result, cache_key = prepared
             
-            return translated_text, f"Translated from {SUPPORTED_LANGUAGES.get(source_lang, source_lang)} to {SUPPORTED_LANGUAGES.get(target_lang, target_lang)}"
-                
+            limits = self._segment_limits()
+            failed_segments = 0
+            if not within_limits(text, *limits):
+                translated_text, backend_name, failed_segments = await self._atranslate_segments(
+                    text, result.source_lang, result.target_lang, limits
+                )
+            else:
+                translated_text, backend_name, joined = await self._aupstream(
+                    text, result.source_lang, result.target_lang
+                )
+                if joined:
+                    cache_key = None
+            return await loop.run_in_executor(
+                self.executor, self._finish_translation,
+                result, cache_key, text, translated_text, backend_name, failed_segments
+            )
+        
         except Exception as e:
             logger.error(f"Translation error: {e}")
-            return None, f"Translation failed: {str(e)}"
+            return TranslationResult(None, f"Translation failed: {str(e)}")
+    
+    async def _atranslate_segments(self, text, source_lang, target_lang, limits):
+        """
+        Async twin of _translate_segments, with at most SEGMENT_MAX_WORKERS segments in flight
+        """
+        segments = [split_whitespace(segment) for segment in segment_text(text, *limits)]
+        semaphore = asyncio.Semaphore(SEGMENT_MAX_WORKERS)
+        with _SEGMENTS_SECONDS.time():
+            translations = await asyncio.gather(*(
+                self._atranslate_segment(body, source_lang, target_lang, semaphore) for _, body, _ in segments
+            ))
+        return self._join_segments(segments, translations)
+    
+    async def _atranslate_segment(self, body, source_lang, target_lang, semaphore):
+        """
+        Async twin of _translate_segment; semaphore bounds the upstream requests in flight
+        """
+        if not body:
+            return body, None
+        loop = asyncio.get_running_loop()
+        cache_key = make_cache_key(body, target_lang, source_lang)
+        cached = await loop.run_in_executor(self.executor, self.cache.get, cache_key)
+        if cached is not None:
+            return cached['translated_text'], cached['backend']
+        async with semaphore:
+            translated_body, backend_name, joined = await self._aupstream(body, source_lang, target_lang)
+        if translated_body and not joined:
+            await loop.run_in_executor(
+                self.executor, self._cache_segment,
+                cache_key, translated_body, source_lang, target_lang, backend_name
+            )
+        return translated_body, backend_name
+    
+    async def translate_many_async(self, text, target_langs, source_lang=None, timeout=TRANSLATION_TIMEOUT):
+        """
+        Translate text to several target languages, returning {target: TranslationResult}
+        The source is detected once and the targets are translated concurrently, so the
+        whole fan-out takes about as long as the slowest single translation
+        """
+        targets = list(dict.fromkeys(target_langs))
+        if source_lang:
+            results = await asyncio.gather(
+                *(self.translate_text_async(text, target, source_lang, timeout) for target in targets)
+            )
+            return dict(zip(targets, results))
+        
+        # Texts translated with auto-detection before are cached under the 'auto' key
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        cached = await loop.run_in_executor(self.executor, self._cached_results, text, targets)
+        for result in cached.values():
+            metrics.record_translation(result, time.perf_counter() - start)
+        remaining = [target for target in targets if target not in cached]
+        if not remaining:
+            return cached
+        
+        try:
+            source_lang, confidence, message = await asyncio.wait_for(
+                loop.run_in_executor(self.executor, self._detect, text), timeout
+            )
+        except asyncio.TimeoutError:
+            source_lang, message = None, f"Language detection timed out after {timeout:g} seconds"
+        if source_lang is None:
+            message = message or "Could not detect source language"
+            return {target: cached.get(target) or TranslationResult(None, message) for target in targets}
+        
+        results = await asyncio.gather(
+            *(self.translate_text_async(text, target, source_lang, timeout) for target in remaining)
+        )
+        for target, result in zip(remaining, results):
+            if result.confidence is None:
+                result.confidence = confidence
+            # Also cache it the way an auto-detected translate_text would, so the next
+            # fan-out or translate_text of this text skips detection
+            if result.success and result.backend and not result.cached:
+                await loop.run_in_executor(self.executor, self._cache_translation, make_cache_key(text, target), result)
+            cached[target] = result
+        return {target: cached[target] for target in targets}
+    
+    def _cached_results(self, text, targets):
+        """
+        Return {target: TranslationResult} for the targets cached under the auto-detect key
+        """
+        results = {}
+        for target in targets:
+            with _CACHE_LOOKUP_SECONDS.time():
+                entry = self.cache.get(make_cache_key(text, target))
+            if entry is not None:
+                results[target] = TranslationResult(target_lang=target, cached=True, **entry)
+        return results
+    
+    async def detect_language_async(self, text, timeout=TRANSLATION_TIMEOUT):
+        """
+        Detect the language of text without blocking the event loop
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, self.detect_language, text)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Language detection timed out after {timeout}s")
+            return None, f"Language detection timed out after {timeout:g} seconds"
+    
+    def _cache_translation(self, cache_key, result):
+        """
+        Store a successful translation in the cache
+        """
+        with _CACHE_WRITE_SECONDS.time():
+            self.cache.set(cache_key, {
+                'translated_text': result.translated_text,
+                'message': result.message,
+                'source_lang': result.source_lang,
+                'confidence': result.confidence,
+                'backend': result.backend
+            })
+    
+    def get_cache_stats(self):
+        """
+        Get translation cache hit/miss statistics
+        """
+        return self.cache.stats()
+    
+    def get_backend_stats(self):
+        """
+        Get per-backend latency and outcome statistics
+        """
+        return self.strategy.get_stats()
+    
+    def get_connection_stats(self):
+        """
+        Get HTTP connection pool reuse statistics
+        """
+        return http_pool.get_pool_stats()
+    
+    def get_stats(self):
+        """
+        Get cache, backend health, connection and coalescing statistics in one report
+        """
+        return {
+            'cache': self.get_cache_stats(),
+            'memory': self.memory.stats(),
+            'detection': self.detector.stats(),
+            'backends': self.get_backend_stats(),
+            'connections': self.get_connection_stats(),
+            'coalescing': {
+                'threads': self.inflight.stats() if self.inflight else None,
+                'async': self.async_inflight.stats() if self.async_inflight else None
+            }
+        }
     
     def get_supported_languages(self):
         """
@@ -106,3 +717,46 @@ class LanguageTranslator:
         Check if language code is supported
         """
         return lang_code in SUPPORTED_LANGUAGES
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_translator():
+    """
+    The process-wide LanguageTranslator, created on first use
+    The web app, the bots and the webhook all share it, so its caches, pools and
+    detector profiles are built once per process
+    """
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                start = time.perf_counter()
+                _shared = LanguageTranslator()
+                logger.info(f"Translator ready in {(time.perf_counter() - start) * 1000:.0f}ms")
+    return _shared
+
+
+async def get_translator_async():
+    """get_translator for event-loop callers; while the translator is being built they wait in a worker thread"""
+    if _shared is not None:
+        return _shared
+    return await asyncio.to_thread(get_translator)
+
+
+def translator_ready():
+    """True once the shared translator has been built"""
+    return _shared is not None
+
+
+def set_translator(translator):
+    """Make translator the instance get_translator() returns (benchmarks, tests)"""
+    global _shared
+    _shared = translator
+
+
+def warm_up_in_background():
+    """Build the shared translator on a daemon thread so a server can start listening first"""
+    threading.Thread(target=get_translator, name='translator-warmup', daemon=True).start()
@@ -0,0 +1,131 @@
+"""
+Concurrent update processing for the Telegram bots
+Updates from different chats are handled concurrently, up to a global limit, while
+updates from the same chat run one at a time in arrival order so replies within a
+chat never overtake each other.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from backend_strategy import percentile
+from config import BOT_CONCURRENT_UPDATES, BOT_METRICS_LOG_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Admission bound for the base class; the running limit is applied after the chat lock below
+_MAX_ADMITTED = 100000
+# Chats whose wait times are kept for stats()
+_TRACKED_CHATS = 1000
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Runs at most max_running updates at once, serialised per chat
+    The chat lock is taken before a global slot, so a busy chat only queues behind
+    itself and never holds slots that other chats could use
+    """
+
+    def __init__(self, max_running=BOT_CONCURRENT_UPDATES, log_interval=BOT_METRICS_LOG_INTERVAL, window=1000):
+        super().__init__(_MAX_ADMITTED)
+        self.max_running = max_running
+        self.log_interval = log_interval
+        self._slots = asyncio.BoundedSemaphore(max_running)
+        self._chat_locks = {}  # chat id -> [lock, updates holding or waiting for it]
+        self._waits = deque(maxlen=window)
+        self._chat_waits = OrderedDict()  # chat id -> [updates, total wait, max wait]
+        self._log_task = None
+        self.admitted = 0
+        self.finished = 0
+        self.running = 0
+        self.failed = 0
+
+    async def initialize(self):
+        if self.log_interval > 0:
+            self._log_task = asyncio.create_task(self._log_stats())
+
+    async def shutdown(self):
+        if self._log_task is not None:
+            self._log_task.cancel()
+            self._log_task = None
+
+    async def do_process_update(self, update, coroutine):
+        chat = update.effective_chat if isinstance(update, Update) else None
+        chat_id = chat.id if chat else None
+        queued_at = time.perf_counter()
+        self.admitted += 1
+        try:
+            if chat_id is None:
+                await self._run(chat_id, queued_at, coroutine)
+                return
+            entry = self._chat_locks.setdefault(chat_id, [asyncio.Lock(), 0])
+            entry[1] += 1
+            try:
+                # asyncio.Lock wakes waiters first-in first-out, which keeps the chat's order
+                async with entry[0]:
+                    await self._run(chat_id, queued_at, coroutine)
+            finally:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._chat_locks[chat_id]
+        finally:
+            self.finished += 1
+
+    async def _run(self, chat_id, queued_at, coroutine):
+        async with self._slots:
+            self._record_wait(chat_id, time.perf_counter() - queued_at)
+            self.running += 1
+            try:
+                await coroutine
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.running -= 1
+
+    def _record_wait(self, chat_id, wait):
+        self._waits.append(wait)
+        if chat_id is None:
+            return
+        stats = self._chat_waits.pop(chat_id, None) or [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += wait
+        stats[2] = max(stats[2], wait)
+        self._chat_waits[chat_id] = stats
+        if len(self._chat_waits) > _TRACKED_CHATS:
+            self._chat_waits.popitem(last=False)
+
+    def stats(self, top=5):
+        """Queue depth, concurrency and wait time figures, with the chats that waited longest"""
+        waits = list(self._waits)
+        slowest = sorted(self._chat_waits.items(), key=lambda item: item[1][2], reverse=True)[:top]
+        return {
+            'max_running': self.max_running,
+            'running': self.running,
+            'waiting': self.admitted - self.finished - self.running,
+            'busy_chats': len(self._chat_locks),
+            'processed': self.finished,
+            'failed': self.failed,
+            'wait_p50': percentile(waits, 50),
+            'wait_p95': percentile(waits, 95),
+            'wait_max': max(waits, default=None),
+            'slowest_chats': [
+                {'chat_id': chat_id, 'updates': count, 'avg_wait': total / count, 'max_wait': longest}
+                for chat_id, (count, total, longest) in slowest
+            ]
+        }
+
+    async def _log_stats(self):
+        while True:
+            await asyncio.sleep(self.log_interval)
+            stats = self.stats(top=0)
+            if stats['processed'] or stats['waiting']:
+                logger.info(
+                    f"Updates: {stats['running']} running, {stats['waiting']} waiting, "
+                    f"{stats['processed']} processed, wait p95 {stats['wait_p95'] or 0:.3f}s"
+                )
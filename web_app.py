@@ -5,11 +5,18 @@ Provides a web interface for translation and language detection
 """
 
 import os
+import sys
 import json
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+import time
+from flask import Flask, Response, g, render_template, request, jsonify, redirect, url_for, stream_with_context
 from flask_cors import CORS
-from translator import LanguageTranslator
-from config import SUPPORTED_LANGUAGES, COMMANDS
+from translator import get_translator
+import metrics
+import profiler
+from config import (
+    SUPPORTED_LANGUAGES, COMMANDS, BATCH_MAX_ITEMS, DETECTION_BATCH_MAX_ITEMS, WEB_SERVER, BOT_MODE, WEBHOOK_PATH,
+    ADMIN_TOKEN, PROFILE_SECONDS
+)
 import logging
 
 # Set up logging
@@ -20,8 +27,29 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-# Initialize translator
-translator = LanguageTranslator()
+# The translator is built on first use (see get_translator), so importing the app stays fast
+
+# In webhook mode the Telegram bots receive their updates through this app
+telegram_webhook = None
+if BOT_MODE == 'webhook':
+    from webhook import create_webhook, SECRET_HEADER
+    # The bots use the shared translator too, so its caches and pools serve both
+    telegram_webhook = create_webhook()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Observe the request's duration by route; streamed bodies are timed to the first byte"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_SECONDS.labels(route, metrics.method_label(request.method), str(response.status_code)).observe(
+            time.perf_counter() - start
+        )
+    return response
 
 @app.route('/')
 def index():
@@ -45,33 +73,26 @@ def api_translate():
                 'error': 'Text is required'
             }), 400
         
-        # Translate text
-        translated_text, message = translator.translate_text(text, target_lang, source_lang)
+        # Translate text (detection happens inside translate_text when needed)
+        result = get_translator().translate_text(text, target_lang, source_lang)
         
-        if translated_text:
-            # Detect source language if not provided
-            if not source_lang:
-                detected_lang, detected_name = translator.detect_language(text)
-                source_lang = detected_lang
-                source_name = detected_name
-            else:
-                source_name = SUPPORTED_LANGUAGES.get(source_lang, source_lang)
-            
-            target_name = SUPPORTED_LANGUAGES.get(target_lang, target_lang)
-            
+        if result.success:
             return jsonify({
                 'success': True,
-                'translated_text': translated_text,
-                'source_language': source_lang,
-                'source_name': source_name,
-                'target_language': target_lang,
-                'target_name': target_name,
-                'message': message
+                'translated_text': result.translated_text,
+                'source_language': result.source_lang,
+                'source_name': result.source_name,
+                'target_language': result.target_lang,
+                'target_name': result.target_name,
+                'confidence': result.confidence,
+                'backend': result.backend,
+                'cached': result.cached,
+                'message': result.message
             })
         else:
             return jsonify({
                 'success': False,
-                'error': message
+                'error': result.message
             }), 400
             
     except Exception as e:
@@ -81,6 +102,106 @@ def api_translate():
             'error': f'Translation failed: {str(e)}'
         }), 500
 
+@app.route('/api/translate/stream', methods=['POST'])
+def api_translate_stream():
+    """API endpoint streaming translated segments as newline-delimited JSON"""
+    try:
+        data = request.get_json()
+        text = data.get('text', '').strip()
+        target_lang = data.get('target_lang', 'en')
+        source_lang = data.get('source_lang', None)
+        
+        if not text:
+            return jsonify({
+                'success': False,
+                'error': 'Text is required'
+            }), 400
+        
+        def generate():
+            for event in get_translator().translate_stream(text, target_lang, source_lang):
+                yield json.dumps(event) + '\n'
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/x-ndjson',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+            
+    except Exception as e:
+        logger.error(f"Streaming translation error: {e}")
+        return jsonify({
+            'success': False,
+            'error': f'Translation failed: {str(e)}'
+        }), 500
+
+@app.route('/api/translate/batch', methods=['POST'])
+def api_translate_batch():
+    """API endpoint for translating many texts in one request"""
+    try:
+        data = request.get_json()
+        items = data.get('texts')
+        target_lang = data.get('target_lang', 'en')
+        default_source = data.get('source_lang', None)
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                'success': False,
+                'error': 'texts must be a non-empty list'
+            }), 400
+        
+        if len(items) > BATCH_MAX_ITEMS:
+            return jsonify({
+                'success': False,
+                'error': f'At most {BATCH_MAX_ITEMS} texts are allowed per batch'
+            }), 400
+        
+        # Items are plain strings or {"text": ..., "source_lang": ...} objects
+        texts = []
+        source_langs = []
+        for item in items:
+            if isinstance(item, dict):
+                texts.append(str(item.get('text') or '').strip())
+                source_langs.append(item.get('source_lang') or default_source)
+            else:
+                texts.append(str(item or '').strip())
+                source_langs.append(default_source)
+        
+        results = get_translator().translate_batch(texts, target_lang, source_langs)
+        
+        response = []
+        for index, result in enumerate(results):
+            if result.success:
+                response.append({
+                    'index': index,
+                    'success': True,
+                    'translated_text': result.translated_text,
+                    'source_language': result.source_lang,
+                    'source_name': result.source_name,
+                    'target_language': result.target_lang,
+                    'target_name': result.target_name,
+                    'cached': result.cached,
+                    'message': result.message
+                })
+            else:
+                response.append({
+                    'index': index,
+                    'success': False,
+                    'error': result.message
+                })
+        
+        return jsonify({
+            'success': True,
+            'count': len(response),
+            'results': response
+        })
+        
+    except Exception as e:
+        logger.error(f"Batch translation error: {e}")
+        return jsonify({
+            'success': False,
+            'error': f'Batch translation failed: {str(e)}'
+        }), 500
+
 @app.route('/api/detect', methods=['POST'])
 def api_detect():
     """API endpoint for language detection"""
@@ -95,7 +216,7 @@ def api_detect():
             }), 400
         
         # Detect language
-        lang_code, lang_name = translator.detect_language(text)
+        lang_code, lang_name = get_translator().detect_language(text)
         
         if lang_code:
             return jsonify({
@@ -117,6 +238,61 @@ def api_detect():
             'error': f'Language detection failed: {str(e)}'
         }), 500
 
+@app.route('/api/detect/batch', methods=['POST'])
+def api_detect_batch():
+    """API endpoint for detecting the language of many texts in one request"""
+    try:
+        data = request.get_json()
+        texts = data.get('texts')
+        
+        if not isinstance(texts, list) or not texts:
+            return jsonify({
+                'success': False,
+                'error': 'texts must be a non-empty list'
+            }), 400
+        
+        if len(texts) > DETECTION_BATCH_MAX_ITEMS:
+            return jsonify({
+                'success': False,
+                'error': f'At most {DETECTION_BATCH_MAX_ITEMS} texts are allowed per batch'
+            }), 400
+        
+        start = time.perf_counter()
+        detections = get_translator().detect_batch([str(text or '') for text in texts])
+        elapsed = time.perf_counter() - start
+        
+        results = []
+        for index, (lang_code, lang_name, confidence) in enumerate(detections):
+            if lang_code:
+                results.append({
+                    'index': index,
+                    'success': True,
+                    'language_code': lang_code,
+                    'language_name': lang_name,
+                    'confidence': confidence
+                })
+            else:
+                results.append({
+                    'index': index,
+                    'success': False,
+                    'error': lang_name
+                })
+        
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'results': results,
+            'elapsed_seconds': round(elapsed, 4),
+            'texts_per_second': round(len(results) / elapsed, 1) if elapsed else None
+        })
+        
+    except Exception as e:
+        logger.error(f"Batch language detection error: {e}")
+        return jsonify({
+            'success': False,
+            'error': f'Batch language detection failed: {str(e)}'
+        }), 500
+
 @app.route('/api/languages', methods=['GET'])
 def api_languages():
     """API endpoint to get supported languages"""
@@ -125,6 +301,40 @@ def api_languages():
         'languages': SUPPORTED_LANGUAGES
     })
 
+@app.route('/api/stats', methods=['GET'])
+def api_stats():
+    """API endpoint for cache, backend health and connection statistics"""
+    stats = get_translator().get_stats()
+    if telegram_webhook is not None:
+        stats['telegram'] = telegram_webhook.stats()
+    return jsonify({
+        'success': True,
+        'stats': stats
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage, backend, route and bot handler timings in the Prometheus text format"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    """
+    Sample-profile this worker for ?seconds= and return collapsed stacks (needs ADMIN_TOKEN)
+    Blocked threads are left out unless ?idle=1
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    if not profiler.check_admin_token(request.headers.get('Authorization')):
+        return jsonify({'success': False, 'error': 'Invalid admin token'}), 403
+    
+    seconds = request.args.get('seconds', PROFILE_SECONDS, type=float)
+    try:
+        path, stacks = profiler.profile(seconds, include_idle=request.args.get('idle') == '1')
+    except profiler.ProfilerBusy as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    return Response(stacks, content_type='text/plain; charset=utf-8', headers={'X-Profile-Path': path})
+
 @app.route('/telegram')
 def telegram_info():
     """Page with Telegram bot information"""
@@ -132,6 +342,22 @@ def telegram_info():
                          languages=SUPPORTED_LANGUAGES,
                          commands=COMMANDS)
 
+@app.route(WEBHOOK_PATH, methods=['POST'])
+def telegram_webhook_update():
+    """Endpoint Telegram delivers bot updates to in webhook mode"""
+    if telegram_webhook is None:
+        return jsonify({'success': False, 'error': 'Webhook mode is not enabled'}), 404
+    if not telegram_webhook.check_secret(request.headers.get(SECRET_HEADER)):
+        return jsonify({'success': False, 'error': 'Invalid secret token'}), 403
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Update must be a JSON object'}), 400
+    
+    # Queue the update and answer at once; the bot handlers run on the webhook's event loop
+    telegram_webhook.feed(data)
+    return jsonify({'success': True})
+
 @app.route('/about')
 def about():
     """About page"""
@@ -147,7 +373,17 @@ def internal_error(error):
     """Handle 500 errors"""
     return render_template('500.html'), 500
 
+# Tag the route functions in profiles
+profiler.register_handlers(app.view_functions.values(), 'web')
+
 if __name__ == '__main__':
+    if WEB_SERVER == 'production':
+        from run_web import run_production
+        run_production()
+        sys.exit(0)
+    
+    profiler.install_signal_handler()
+    
     # Get port from environment or use default
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Webhook mode for the Telegram bots
+Telegram POSTs each update to the web app (web_app.py or asgi_app.py), which hands
+it to a python-telegram-bot Application running on a background event loop. Every
+web worker can take any update, so the bots scale with the web app behind a load
+balancer instead of being limited to one long-polling process.
+
+Manage the webhook registration with:
+    python webhook.py set       # point Telegram at WEBHOOK_URL
+    python webhook.py delete    # go back to polling
+    python webhook.py info      # show what Telegram has registered
+    python webhook.py send "Hello there"   # POST a fake update to a local web app
+"""
+
+import asyncio
+import atexit
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from telegram import Update
+from telegram.ext import Application
+
+from config import (
+    TELEGRAM_BOT_TOKEN, TELEGRAM_API_URL, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+    WEBHOOK_BOTS, WEBHOOK_MAX_CONNECTIONS, BOT_CONCURRENT_UPDATES
+)
+from reply_scheduler import get_reply_scheduler
+from update_processor import ChatOrderedUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def application_builder():
+    """
+    ApplicationBuilder for the bot token, pointed at TELEGRAM_API_URL when set
+    Updates are processed concurrently across chats and in order within each chat
+    """
+    builder = Application.builder().token(TELEGRAM_BOT_TOKEN)
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(TELEGRAM_API_URL.rstrip('/') + '/bot')
+    if BOT_CONCURRENT_UPDATES > 1:
+        builder = builder.concurrent_updates(ChatOrderedUpdateProcessor(BOT_CONCURRENT_UPDATES))
+    return builder
+
+
+def webhook_secret():
+    """
+    Secret Telegram sends back in every webhook request
+    Defaults to a digest of the bot token so every worker and host agrees on it
+    """
+    if WEBHOOK_SECRET:
+        return WEBHOOK_SECRET
+    return hashlib.sha256(f"webhook:{TELEGRAM_BOT_TOKEN}".encode()).hexdigest()[:64]
+
+
+class TelegramWebhook:
+    """
+    Feeds webhook updates into an Application running on its own event loop thread
+    The loop is started lazily in each process, so it is safe to create this before
+    gunicorn forks its workers
+    """
+
+    def __init__(self, application, allowed_updates, secret_token=None):
+        self.application = application
+        self.allowed_updates = list(allowed_updates)
+        self.secret_token = secret_token or webhook_secret()
+        self.received = 0
+        self.rejected = 0
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def check_secret(self, header_value):
+        """True if the request carries our secret token"""
+        if header_value and hmac.compare_digest(header_value, self.secret_token):
+            return True
+        self.rejected += 1
+        return False
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='telegram-webhook', daemon=True).start()
+                asyncio.run_coroutine_threadsafe(self._start(), loop).result()
+                self._loop = loop
+                self._pid = os.getpid()
+                atexit.register(self.stop)
+        return self._loop
+
+    async def _start(self):
+        await self.application.initialize()
+        await self.application.start()
+        logger.info(f"Webhook update processing started in process {os.getpid()}")
+
+    async def _feed(self, data):
+        await self.application.update_queue.put(Update.de_json(data, self.application.bot))
+
+    def feed(self, data):
+        """Queue one update (the decoded JSON body) from a request thread"""
+        loop = self._ensure_started()
+        asyncio.run_coroutine_threadsafe(self._feed(data), loop).result()
+        self.received += 1
+
+    async def afeed(self, data):
+        """Queue one update from another event loop (the ASGI app's)"""
+        loop = await asyncio.to_thread(self._ensure_started)
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._feed(data), loop))
+        self.received += 1
+
+    def stop(self):
+        """Finish the queued updates and shut the Application down"""
+        if self._pid != os.getpid() or not self.application.running:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._stop(), self._loop)
+        future.result(timeout=30)
+
+    async def _stop(self):
+        await self.application.stop()
+        await self.application.shutdown()
+
+    def stats(self):
+        """Webhook request counters plus the update processor's and reply scheduler's figures"""
+        processor = self.application.update_processor
+        return {
+            'received': self.received,
+            'rejected': self.rejected,
+            'queued': self.application.update_queue.qsize(),
+            'processing': processor.stats() if isinstance(processor, ChatOrderedUpdateProcessor) else None,
+            'replies': get_reply_scheduler().stats()
+        }
+
+
+def _bot_modules(bots):
+    import channel_bot
+    import telegram_bot
+
+    modules = {'private': telegram_bot, 'channel': channel_bot}
+    names = [name.strip() for name in bots.split(',') if name.strip()]
+    for name in names:
+        if name not in modules:
+            raise ValueError(f"Unknown bot '{name}' in WEBHOOK_BOTS, expected one of {', '.join(modules)}")
+    return [modules[name] for name in names]
+
+
+def webhook_allowed_updates(bots=WEBHOOK_BOTS):
+    """Update types the enabled bots handle; Telegram is asked to send only these"""
+    allowed_updates = []
+    for module in _bot_modules(bots):
+        allowed_updates += [kind for kind in module.ALLOWED_UPDATES if kind not in allowed_updates]
+    return allowed_updates
+
+
+def build_webhook_application(bots=WEBHOOK_BOTS, translator=None):
+    """
+    One Application serving the handlers of the bots listed in WEBHOOK_BOTS
+    A token has a single webhook, so the private chat and channel bots share it
+    when both are enabled
+    """
+    application = application_builder().build()
+    for module in _bot_modules(bots):
+        module.build_application(application=application, translator=translator)
+    return application
+
+
+def create_webhook(translator=None):
+    """
+    The webhook receiver for the web app, or None if no bot token is configured
+    Without a translator the bots use the shared one from get_translator(), like the web app
+    """
+    if not TELEGRAM_BOT_TOKEN:
+        logger.warning("BOT_MODE is webhook but TELEGRAM_BOT_TOKEN is not set; webhook disabled")
+        return None
+    return TelegramWebhook(build_webhook_application(translator=translator), webhook_allowed_updates())
+
+
+async def set_webhook(url=None):
+    """Register WEBHOOK_URL + WEBHOOK_PATH with Telegram for the enabled bots' update types"""
+    url = url or WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH
+    allowed_updates = webhook_allowed_updates()
+    application = application_builder().build()
+    async with application.bot:
+        await application.bot.set_webhook(
+            url,
+            allowed_updates=allowed_updates,
+            secret_token=webhook_secret(),
+            max_connections=WEBHOOK_MAX_CONNECTIONS
+        )
+    logger.info(f"Webhook set to {url} for {', '.join(allowed_updates)} updates")
+    return url
+
+
+async def delete_webhook():
+    application = application_builder().build()
+    async with application.bot:
+        await application.bot.delete_webhook()
+
+
+async def webhook_info():
+    application = application_builder().build()
+    async with application.bot:
+        return (await application.bot.get_webhook_info()).to_dict()
+
+
+def send_test_update(text, base_url=None, chat_id=1):
+    """POST a fake private message update to a running web app, as Telegram would"""
+    import requests
+
+    now = int(time.time())
+    update = {
+        'update_id': now,
+        'message': {
+            'message_id': 1,
+            'date': now,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Test'},
+            'text': text
+        }
+    }
+    if text.startswith('/'):
+        # Telegram marks commands with an entity; CommandHandler relies on it
+        update['message']['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    base_url = base_url or f"http://localhost:{os.environ.get('PORT', 5000)}"
+    response = requests.post(
+        base_url.rstrip('/') + WEBHOOK_PATH, json=update, headers={SECRET_HEADER: webhook_secret()}, timeout=10
+    )
+    return response.status_code, response.text
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else 'info'
+    if not TELEGRAM_BOT_TOKEN:
+        print("❌ TELEGRAM_BOT_TOKEN not found in environment variables!")
+        sys.exit(1)
+    if command == 'set':
+        if not WEBHOOK_URL:
+            print("❌ Set WEBHOOK_URL to the public HTTPS address of the web app")
+            sys.exit(1)
+        print(f"✅ Webhook set to {asyncio.run(set_webhook())}")
+    elif command == 'delete':
+        asyncio.run(delete_webhook())
+        print("✅ Webhook deleted; the bots can use polling again")
+    elif command == 'send':
+        status, body = send_test_update(' '.join(sys.argv[2:]) or 'Hello, how are you?')
+        print(f"{status} {body}")
+    else:
+        print(json.dumps(asyncio.run(webhook_info()), indent=2))
+
+
+if __name__ == '__main__':
+    main()